@@ -0,0 +1,99 @@
+"""
+Enrichment join benchmark: OR-join on airframes/model_database vs. the
+materialized airframe_model table.
+
+Builds full-size synthetic reference tables (~500k airframes), loads them
+through the same normalisation as the loader, then enriches a synthetic
+window of aircraft states both ways. Reports the one-off airframe_model
+build time, the per-run join times, and the row counts (the OR-join can
+return several rows per state, the equi-join exactly one).
+
+Usage:
+    python benchmarks/bench_airframe_model.py [--airframes 500000] [--aircraft 20000] [--snapshots 18]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from synthetic import make_aircraft_types_frame, make_airframes_frame
+from src.Db_work.reference_data import REFERENCE_TABLES, _build_from_csv, build_airframe_model
+
+OR_JOIN = """
+    SELECT s.*, af.registration, af.model, af.operator, md.ModelFullName, md.Description, md.WTC
+    FROM aircraft_states s
+    LEFT JOIN airframes af ON s.icao24 = af.icao24
+    LEFT JOIN model_database md ON (
+        af.typecode = md.Designator
+        OR af.icaoaircrafttype = md.Designator
+    )
+"""
+
+EQUI_JOIN = """
+    SELECT s.*, am.registration, am.model, am.operator, am.ModelFullName, am.Description, am.WTC
+    FROM aircraft_states s
+    LEFT JOIN airframe_model am ON s.icao24 = am.icao24
+"""
+
+
+def timed(con, sql, repeat):
+    best = float("inf")
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = con.execute(f"SELECT COUNT(*) FROM ({sql})").fetchone()[0]
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--airframes", type=int, default=500_000)
+    parser.add_argument("--aircraft", type=int, default=20_000)
+    parser.add_argument("--snapshots", type=int, default=18)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    airframes = make_airframes_frame(args.airframes)
+    types = make_aircraft_types_frame()
+
+    with tempfile.TemporaryDirectory() as tmp, duckdb.connect() as con:
+        for table, frame in (("airframes", airframes), ("model_database", types)):
+            path = Path(tmp) / Path(REFERENCE_TABLES[table]["key"]).name
+            frame.to_csv(path, index=False)
+            _build_from_csv(con, table, REFERENCE_TABLES[table], str(path))
+
+        # Most live aircraft are in the database; a few are unknown
+        known = airframes["icao24"].sample(args.aircraft, random_state=1).tolist()
+        known[: args.aircraft // 20] = [f"zz{i:04x}" for i in range(args.aircraft // 20)]
+        states = pd.DataFrame({
+            "icao24": known * args.snapshots,
+            "snapshot": [i for i in range(args.snapshots) for _ in range(args.aircraft)],
+        })
+        con.execute("CREATE TABLE aircraft_states AS SELECT * FROM states")
+
+        start = time.perf_counter()
+        build_airframe_model(con)
+        build_seconds = time.perf_counter() - start
+
+        or_seconds, or_rows = timed(con, OR_JOIN, args.repeat)
+        eq_seconds, eq_rows = timed(con, EQUI_JOIN, args.repeat)
+
+    print(f"{len(airframes):,} airframes, {len(types):,} model rows, {len(states):,} state rows")
+    print(f"airframe_model build (once per reference change): {build_seconds:.3f}s")
+    print(f"{'join':<10}{'seconds':>10}{'rows':>14}")
+    print(f"{'OR-join':<10}{or_seconds:>10.3f}{or_rows:>14,}")
+    print(f"{'equi-join':<10}{eq_seconds:>10.3f}{eq_rows:>14,}")
+    print(f"speedup: {or_seconds / eq_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
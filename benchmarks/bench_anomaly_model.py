@@ -0,0 +1,69 @@
+"""
+Anomaly model benchmark: refit-per-window vs. persisted model scoring.
+
+Fills an in-memory aircraft_states table with synthetic windows, then
+compares the old path (fit IsolationForest on the latest window every run)
+with the new one (train once on the rolling sample, then only score and
+store each new window).
+
+Usage:
+    python benchmarks/bench_anomaly_model.py [--aircraft 20000] [--windows 20]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+from sklearn.ensemble import IsolationForest
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from synthetic import load_synthetic_windows
+from src.Db_work import anomaly_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--aircraft", type=int, default=20_000)
+    parser.add_argument("--windows", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, duckdb.connect() as con:
+        anomaly_model.MODEL_DIR = Path(tmp)
+        latest = load_synthetic_windows(con, args.aircraft, args.windows)
+        df = con.execute("SELECT * FROM aircraft_states WHERE window_end = ?", [latest]).fetchdf()
+
+        start = time.perf_counter()
+        features = df[anomaly_model.FEATURES].dropna()
+        IsolationForest(contamination=0.01, random_state=42).fit_predict(features)
+        refit_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        anomaly_model.current_model(con, retrain=True)
+        train_seconds = time.perf_counter() - start
+
+        anomaly_model.load_model.cache_clear()
+        start = time.perf_counter()
+        version, model = anomaly_model.current_model(con)
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = anomaly_model.score_frame(model, df)
+        anomaly_model.store_scores(con, latest, version, df, scores)
+        score_seconds = time.perf_counter() - start
+
+    print(f"{len(df):,} rows in the latest window, {args.windows} windows in the table")
+    print(f"old: fit_predict on the window every run        {refit_seconds:8.3f}s")
+    print(f"new: train on rolling sample (every {anomaly_model.RETRAIN_MINUTES} min)  {train_seconds:8.3f}s")
+    print(f"new: load persisted model (once per process)    {load_seconds:8.3f}s")
+    print(f"new: score + store the window every run         {score_seconds:8.3f}s")
+    print(f"per-window speedup: {refit_seconds / score_seconds:.1f}x, "
+          f"{int(scores['is_anomaly'].sum())} anomalies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark: per-row iterrows conversion vs. vectorized frame_to_records.
+
+Usage:
+    python benchmarks/bench_opensky_client.py [--rows 20000] [--repeat 3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT / "src" / "ingest"))
+
+from opensky_client import OpenSkyClient, frame_to_records
+from synthetic import make_states_frame
+
+
+def iterrows_records(df):
+    # The original get_states_dict loop
+    client = OpenSkyClient.__new__(OpenSkyClient)
+    return [client._row_to_dict(row) for _, row in df.iterrows()]
+
+
+def best_of(fn, df, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_states_frame(args.rows)
+
+    loop_s, loop_records = best_of(iterrows_records, df, args.repeat)
+    vec_s, vec_records = best_of(frame_to_records, df, args.repeat)
+
+    if loop_records != vec_records:
+        raise SystemExit("Vectorized records differ from the iterrows reference")
+
+    print(f"rows:        {args.rows:,}")
+    print(f"iterrows:    {loop_s * 1000:8.1f} ms")
+    print(f"vectorized:  {vec_s * 1000:8.1f} ms")
+    print(f"speedup:     {loop_s / vec_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
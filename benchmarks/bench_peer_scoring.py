@@ -0,0 +1,61 @@
+"""
+Peer-group scoring benchmark.
+
+Fills an in-memory database with synthetic windows and an airframe_model
+table, then times the baseline refresh (slow cadence) and the per-window
+peer scoring (every run) of src/Db_work/peer_scoring.py.
+
+Usage:
+    python benchmarks/bench_peer_scoring.py [--aircraft 50000] [--windows 20]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import duckdb
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from synthetic import load_synthetic_windows
+from src.Db_work import peer_scoring
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--aircraft", type=int, default=50_000)
+    parser.add_argument("--windows", type=int, default=20)
+    args = parser.parse_args()
+
+    with duckdb.connect() as con:
+        latest = load_synthetic_windows(con, args.aircraft, args.windows)
+        con.execute(
+            """
+            CREATE TABLE airframe_model AS
+            SELECT
+                icao24,
+                ['L2J', 'L1P', 'L2T', 'H1T', 'L4J'][1 + CAST(hash(icao24) % 5 AS INTEGER)] AS Description,
+                ['L', 'M', 'H'][1 + CAST(hash(icao24 || 'w') % 3 AS INTEGER)] AS WTC
+            FROM (SELECT DISTINCT icao24 FROM aircraft_states)
+            """
+        )
+        peer_scoring.ensure_peer_tables(con)
+
+        start = time.perf_counter()
+        groups = peer_scoring.refresh_baselines(con)
+        refresh_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        flagged = peer_scoring.score_peer_window(con, latest)
+        score_seconds = time.perf_counter() - start
+        rows = con.execute("SELECT COUNT(*) FROM peer_scores").fetchone()[0]
+
+    print(f"{args.aircraft:,} aircraft per window, {args.windows} windows, {groups} peer groups")
+    print(f"baseline refresh (every {peer_scoring.BASELINE_REFRESH_MINUTES} min): {refresh_seconds:.3f}s")
+    print(f"score + store one window: {score_seconds:.3f}s ({rows:,} rows, {flagged} flagged)")
+
+
+if __name__ == "__main__":
+    main()
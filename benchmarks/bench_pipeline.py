@@ -0,0 +1,390 @@
+"""
+End-to-end pipeline benchmark on a synthetic OpenSky feed.
+
+Replays synthetic state vectors through the real code paths, one 3-minute
+window at a time:
+
+    client     OpenSkyClient.get_states_dict on the replayed snapshot
+    publish    publish_snapshot + the state serializer (in-process Kafka stand-in)
+    window     decode_state, the consumer's per-aircraft window state, ColumnarWindowStore
+    upload     submit_window (the consumer's write_window_to_s3) to a local
+               directory or to moto S3
+    load       src/Db_work/load.py
+    transform  src/Db_work/transform.py
+    analysis   src/Db_work/analysis.py on the fetched window
+    viz        viz/vizualization.py on the same window and the analysis scores
+
+Each aircraft count runs in its own process (fresh DuckDB file, true peak
+RSS). Per stage it reports records/s, latency percentiles (per snapshot for
+the streaming stages, per window for the rest), and peak RSS, and writes
+everything to a JSON file so runs can be compared across commits.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--aircraft 1000 10000 50000] [--windows 3]
+        [--snapshots 18] [--encoding json|msgpack] [--sink file|moto]
+        [--output results.json] [--baseline earlier.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "src" / "ingest"))
+
+RESULTS_DIR = BENCH_DIR / "results"
+WINDOW_MS = 180_000
+SNAPSHOT_SECONDS = 10
+S3_BUCKET = "bench-windows"
+S3_PREFIX = "processed"
+STAGES = ["client", "publish", "window", "upload", "load", "transform", "analysis", "viz"]
+
+
+class RssSampler:
+    """Samples the resident set size in a background thread to get per-stage peaks."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = self.current()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            # No procfs: fall back to the process-wide peak
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def reset(self):
+        self.peak = self.current()
+
+    def stop(self):
+        self._stop.set()
+
+
+class StageTimer:
+    def __init__(self, sampler: RssSampler):
+        self.sampler = sampler
+        self.stats = {name: {"latencies": [], "records": 0, "peak_rss": 0} for name in STAGES}
+
+    @contextmanager
+    def stage(self, name: str, records: int = 0):
+        stats = self.stats[name]
+        self.sampler.reset()
+        start = time.perf_counter()
+        yield stats
+        stats["latencies"].append(time.perf_counter() - start)
+        stats["records"] += records
+        stats["peak_rss"] = max(stats["peak_rss"], self.sampler.peak, self.sampler.current())
+
+    def summary(self) -> dict:
+        summary = {}
+        for name, stats in self.stats.items():
+            latencies = np.array(stats["latencies"])
+            if not len(latencies):
+                continue
+            total = float(latencies.sum())
+            summary[name] = {
+                "calls": len(latencies),
+                "records": stats["records"],
+                "seconds": total,
+                "records_per_s": stats["records"] / total if total else None,
+                "latency_ms": {
+                    "mean": float(latencies.mean() * 1000),
+                    "p50": float(np.percentile(latencies, 50) * 1000),
+                    "p95": float(np.percentile(latencies, 95) * 1000),
+                    "p99": float(np.percentile(latencies, 99) * 1000),
+                    "max": float(latencies.max() * 1000),
+                },
+                "peak_rss_mb": stats["peak_rss"] / 1024 / 1024,
+            }
+        return summary
+
+
+def pipeline_environment(workdir: Path) -> dict:
+    """Environment that points every pipeline module at the scratch directory."""
+    return {
+        **os.environ,
+        "WINDOW_SOURCE_DIR": str(workdir / "source"),
+        "WINDOW_SPILL_DIR": str(workdir / "spill"),
+        "WINDOW_CACHE_DIR": str(workdir / "window_cache"),
+        "REFERENCE_DATA_DIR": str(workdir.parent / "reference"),
+        "REFERENCE_CACHE_DIR": str(workdir / "reference_cache"),
+        "ANOMALY_MODEL_DIR": str(workdir / "models"),
+        "VIZ_IMAGES_DIR": str(workdir / "images"),
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_DEFAULT_REGION": "us-east-1",
+    }
+
+
+def write_reference_data(directory: Path, airframes: int) -> None:
+    from synthetic import make_aircraft_types_frame, make_airframes_frame
+
+    directory.mkdir(parents=True, exist_ok=True)
+    make_airframes_frame(airframes).to_csv(directory / "aircraftDatabase.csv", index=False)
+    make_aircraft_types_frame().to_csv(directory / "doc8643AircraftTypes.csv", index=False)
+
+
+def run_pipeline(args) -> dict:
+    """One aircraft count, in a process whose environment points at args.workdir."""
+    import logging
+
+    import boto3
+    import pandas as pd
+
+    from kafka_standin import InProcessKafka
+    from opensky_client import OpenSkyClient
+    from producer_opensky import DEFAULT_BATCH_SIZE, DEFAULT_COMPRESSION, TOPIC, publish_snapshot
+    from state_codec import decode_state, encode_state
+    from synthetic import make_states_frame
+    from src.Db_work import analysis, load, session, transform
+    from src.Db_work.window_cache import get_latest_window_table
+    from src.streaming.window_sink import BackgroundUploader, FileSink, S3Sink, submit_window
+    from src.streaming.window_state import init_window_state, update_window_state
+    from src.streaming.window_store import ColumnarWindowStore
+    from viz import vizualization
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    workdir = Path(args.workdir)
+    session.DB_FILE = str(workdir / "air_ops.duckdb")
+    source_dir = Path(os.environ["WINDOW_SOURCE_DIR"])
+
+    # Aircraft are drawn from the synthetic airframe table so enrichment finds them
+    airframe_icao24 = pd.read_csv(Path(os.environ["REFERENCE_DATA_DIR"]) / "aircraftDatabase.csv",
+                                  usecols=["icao24"])["icao24"].to_numpy()
+    rng = np.random.default_rng(42)
+
+    class ReplayClient(OpenSkyClient):
+        """OpenSkyClient whose fetch returns the next synthetic snapshot."""
+
+        def __init__(self):
+            self.frame = None
+
+        def fetch_states(self):
+            return self.frame
+
+    client = ReplayClient()
+    producer = InProcessKafka(
+        key_serializer=lambda k: k.encode("utf-8"),
+        value_serializer=lambda v: encode_state(v, args.encoding),
+        compression_type=DEFAULT_COMPRESSION,
+        batch_size=DEFAULT_BATCH_SIZE,
+        keep_messages=True,
+    )
+    store = ColumnarWindowStore(workdir / "spill", duration_ms=WINDOW_MS)
+
+    if args.sink == "moto":
+        from moto import mock_aws
+
+        mock = mock_aws()
+        mock.start()
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=S3_BUCKET)
+        sink = S3Sink(s3, S3_BUCKET)
+    else:
+        sink = FileSink(source_dir)
+    uploader = BackgroundUploader(sink)
+
+    sampler = RssSampler()
+    timer = StageTimer(sampler)
+    # Windows end at or before now, so the loader's date partitions cover them
+    first_start = (int(time.time() * 1000) // WINDOW_MS - args.windows) * WINDOW_MS
+    # Next offset per partition of the stand-in topic
+    offsets = [0] * producer.partitions
+
+    for w in range(args.windows):
+        start_ms = first_start + w * WINDOW_MS
+        icao24 = rng.choice(airframe_icao24, size=args.aircraft, replace=False)
+        states_by_key = {}
+        for k in range(args.snapshots):
+            snapshot_ts = (start_ms // 1000) + SNAPSHOT_SECONDS * k
+            frame = make_states_frame(args.aircraft, seed=w, now=snapshot_ts)
+            frame["icao24"] = icao24
+            client.frame = frame
+
+            with timer.stage("client", args.aircraft):
+                states = client.get_states_dict()
+
+            with timer.stage("publish", len(states)):
+                publish_snapshot(producer, states, snapshot_ts)
+
+            messages = producer.messages.pop(TOPIC)
+            with timer.stage("window", len(messages)):
+                for partition, key, value in messages:
+                    event = decode_state(value)
+                    offset = offsets[partition]
+                    offsets[partition] += 1
+                    # The consumer's raw-mode window state
+                    state = states_by_key.get(key)
+                    if state is None:
+                        states_by_key[key] = init_window_state(event, offset)
+                    else:
+                        update_window_state(state, event, offset)
+                    store.append(partition, event["snapshot_ts"] * 1000, event)
+
+        rows = args.aircraft * args.snapshots
+        with timer.stage("upload", rows):
+            futures = []
+            for partition in range(producer.partitions):
+                df = store.pop(partition, start_ms, start_ms + WINDOW_MS)
+                if not df.empty:
+                    result = {"value": df, "start": start_ms, "end": start_ms + WINDOW_MS, "partition": partition}
+                    futures.append(submit_window(uploader, S3_PREFIX, result))
+            for future in futures:
+                future.result()
+
+        if args.sink == "moto":
+            # The loader reads the local copy; DuckDB cannot reach moto's in-process S3
+            for page in s3.get_paginator("list_objects_v2").paginate(Bucket=S3_BUCKET):
+                for obj in page.get("Contents", []):
+                    path = source_dir / obj["Key"]
+                    if not path.exists():
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        path.write_bytes(s3.get_object(Bucket=S3_BUCKET, Key=obj["Key"])["Body"].read())
+
+        with timer.stage("load", rows):
+            load.main()
+        with timer.stage("transform", rows):
+            transform.main()
+
+        with session.get_session().reader() as con:
+            window = get_latest_window_table(con)
+        with timer.stage("analysis", rows):
+            scored = analysis.main(window)
+        with timer.stage("viz", rows):
+            vizualization.main(window, scored)
+
+    uploader.close()
+    sampler.stop()
+
+    with session.get_session().reader() as con:
+        loaded = con.execute("SELECT COUNT(*) FROM aircraft_states").fetchone()[0]
+    expected = args.windows * args.aircraft * args.snapshots
+    if loaded != expected:
+        print(f"warning: loaded {loaded:,} rows, expected {expected:,}", file=sys.stderr)
+
+    return {
+        "aircraft": args.aircraft,
+        "rows_loaded": loaded,
+        "process_peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": timer.summary(),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_run(run: dict, baseline: dict = None) -> None:
+    print(f"\n{run['aircraft']:,} aircraft per snapshot ({run['rows_loaded']:,} rows loaded, "
+          f"peak RSS {run['process_peak_rss_mb']:.0f} MB)")
+    header = f"{'stage':>10} {'records/s':>12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}"
+    if baseline:
+        header += f" {'vs baseline':>12}"
+    print(header)
+    for name, stats in run["stages"].items():
+        latency = stats["latency_ms"]
+        line = (f"{name:>10} {stats['records_per_s']:>12,.0f} {latency['p50']:>9.1f} {latency['p95']:>9.1f} "
+                f"{latency['p99']:>9.1f} {stats['peak_rss_mb']:>12.0f}")
+        before = (baseline or {}).get(name)
+        if before and before.get("records_per_s"):
+            line += f" {stats['records_per_s'] / before['records_per_s'] - 1:>+11.0%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--aircraft", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--windows", type=int, default=3)
+    parser.add_argument("--snapshots", type=int, default=WINDOW_MS // 1000 // SNAPSHOT_SECONDS)
+    parser.add_argument("--encoding", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--sink", choices=["file", "moto"], default="file")
+    parser.add_argument("--airframes", type=int, default=200_000, help="rows in the synthetic airframe table")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/pipeline_<time>_<commit>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare throughput against")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's INFO logging")
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.result_file:
+        # Child process: one aircraft count
+        args.aircraft = args.aircraft[0]
+        Path(args.result_file).write_text(json.dumps(run_pipeline(args)))
+        return
+
+    if max(args.aircraft) > args.airframes:
+        parser.error("--airframes must be at least the largest --aircraft count")
+
+    baseline = {}
+    if args.baseline:
+        for run in json.loads(Path(args.baseline).read_text())["runs"]:
+            baseline[run["aircraft"]] = run["stages"]
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("workdir", "result_file", "baseline")},
+        "runs": [],
+    }
+
+    scratch = Path(tempfile.mkdtemp(prefix="bench_pipeline_"))
+    try:
+        write_reference_data(scratch / "reference", args.airframes)
+        for n in args.aircraft:
+            workdir = scratch / f"aircraft_{n}"
+            workdir.mkdir()
+            result_file = workdir / "result.json"
+            command = [
+                sys.executable, __file__, "--aircraft", str(n), "--windows", str(args.windows),
+                "--snapshots", str(args.snapshots), "--encoding", args.encoding, "--sink", args.sink,
+                "--workdir", str(workdir), "--result-file", str(result_file),
+            ] + (["--verbose"] if args.verbose else [])
+            subprocess.run(command, env=pipeline_environment(workdir), check=True)
+            run = json.loads(result_file.read_text())
+            results["runs"].append(run)
+            print_run(run, baseline.get(n))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"pipeline_{datetime.now():%Y%m%dT%H%M%S}_{commit[:8]}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Producer throughput benchmark against an in-process Kafka stand-in.
+
+Compares the original publish loop (json, uncompressed, one INFO log line per
+state) with publish_snapshot under different encodings and compressions.
+
+Usage:
+    python benchmarks/bench_producer.py [--rows 10000] [--snapshots 5]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT / "src" / "ingest"))
+
+from kafka_standin import InProcessKafka
+from opensky_client import frame_to_records
+from synthetic import make_states_frame
+import producer_opensky
+from producer_opensky import TOPIC, publish_snapshot
+from state_codec import encode_state
+
+# Per-record logging goes to /dev/null so terminal speed does not skew results
+devnull_handler = logging.StreamHandler(open(os.devnull, "w"))
+logging.getLogger().handlers = [devnull_handler]
+logger = logging.getLogger("baseline")
+
+
+def original_publish(producer, states, snapshot_ts):
+    # The pre-batching loop from producer_opensky.main
+    for state in states:
+        state['snapshot_ts'] = snapshot_ts
+        producer.send(TOPIC, value=state)
+        logger.info(f"Sent state: {state}")
+    producer.flush()
+
+
+def run(label, states, snapshots, publish, **producer_config):
+    producer = InProcessKafka(**producer_config)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for i in range(snapshots):
+        publish(producer, [dict(s) for s in states], 1_700_000_000 + 10 * i)
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    total = len(states) * snapshots
+    return {
+        "mode": label,
+        "records_per_s": total / wall,
+        "cpu_us_per_record": cpu / total * 1e6,
+        "broker_bytes_per_record": producer.broker_bytes / total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--snapshots", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+    states = frame_to_records(make_states_frame(args.rows))
+
+    results = [
+        run("original (json, none, per-record log)", states, args.snapshots, original_publish,
+            value_serializer=lambda v: json.dumps(v).encode('utf-8')),
+    ]
+    for encoding in ("json", "msgpack"):
+        for compression in (None, "lz4", "zstd"):
+            results.append(run(
+                f"{encoding}, {compression or 'none'}", states, args.snapshots, publish_snapshot,
+                key_serializer=lambda k: k.encode('utf-8'),
+                value_serializer=lambda v, e=encoding: encode_state(v, e),
+                compression_type=compression,
+                linger_ms=producer_opensky.DEFAULT_LINGER_MS,
+                batch_size=producer_opensky.DEFAULT_BATCH_SIZE,
+            ))
+
+    baseline = results[0]
+    print(f"{args.rows:,} states x {args.snapshots} snapshots\n")
+    print(f"{'mode':<40} {'rec/s':>10} {'cpu us/rec':>11} {'bytes/rec':>10} {'bytes vs orig':>14}")
+    for r in results:
+        ratio = baseline["broker_bytes_per_record"] / r["broker_bytes_per_record"]
+        print(f"{r['mode']:<40} {r['records_per_s']:>10,.0f} {r['cpu_us_per_record']:>11.1f} "
+              f"{r['broker_bytes_per_record']:>10.1f} {ratio:>13.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Spatial query benchmark: bbox / radius lookups before and after clustering
+enriched_aircraft_states by grid cell.
+
+Generates `--days` days of synthetic positions (in time order, like the
+incremental transform appends them), times a regional query over the whole
+range, then runs cluster_closed_days and times it again.
+
+Usage:
+    python benchmarks/bench_spatial.py [--days 14] [--rows-per-day 2000000]
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import duckdb
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.Db_work.spatial import grid_cell_sql, query_bbox, query_radius
+from src.Db_work.transform import ENRICHED_TABLE, cluster_closed_days
+
+# Around Ramstein Air Base
+BBOX = (48.5, 6.5, 50.5, 8.5)
+POINT = (49.437, 7.600)
+
+
+def timed(fn, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--rows-per-day", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    first_day = date.today() - timedelta(days=args.days)
+    with duckdb.connect() as con:
+        con.execute(
+            f"""
+            CREATE TABLE {ENRICHED_TABLE} AS
+            SELECT *, {grid_cell_sql()} AS grid_cell
+            FROM (
+                SELECT
+                    printf('%06x', (i * 7919) % 16777216) AS icao24,
+                    CAST(? AS TIMESTAMP) + INTERVAL 3 MINUTE * (i // {args.rows_per_day // 480}) AS window_end,
+                    random() * 130 - 60 AS latitude,
+                    random() * 360 - 180 AS longitude,
+                    random() * 12000 AS baro_altitude
+                FROM range({args.days * args.rows_per_day}) t(i)
+            )
+            ORDER BY window_end
+            """,
+            [first_day],
+        )
+        rows = con.execute(f"SELECT COUNT(*) FROM {ENRICHED_TABLE}").fetchone()[0]
+        print(f"{rows:,} rows over {args.days} days")
+
+        bbox = lambda: query_bbox(con, *BBOX, columns="icao24, window_end, latitude, longitude")
+        radius = lambda: query_radius(con, *POINT, 50, columns="icao24, window_end")
+        before = (timed(bbox), timed(radius))
+
+        start = time.perf_counter()
+        days = cluster_closed_days(con)
+        cluster_seconds = time.perf_counter() - start
+        after = (timed(bbox), timed(radius))
+
+    print(f"clustered {days} days in {cluster_seconds:.2f}s")
+    print(f"{'query':<12}{'rows':>10}{'time-ordered':>14}{'cell-clustered':>16}")
+    for name, (b, a) in zip(("bbox", "radius 50km"), zip(before, after)):
+        print(f"{name:<12}{b[1]:>10,}{b[0]:>13.3f}s{a[0]:>15.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Trajectory stage benchmark.
+
+Builds one synthetic window of straight tracks (some with injected position
+jumps), runs src/Db_work/trajectory.py on it, and reports the run time and
+how many of the injected jumps were flagged.
+
+Usage:
+    python benchmarks/bench_trajectory.py [--aircraft 10000 50000] [--anomalies 50]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import duckdb
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from synthetic import make_trajectory_frame
+from src.Db_work.trajectory import detect_trajectory_anomalies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--aircraft", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--anomalies", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'aircraft':>10}{'rows':>12}{'seconds':>10}{'flagged':>10}{'injected found':>16}")
+    for n in args.aircraft:
+        states = make_trajectory_frame(n, anomalies=args.anomalies)
+        window_end = states["window_end"].iloc[0].to_pydatetime()
+        with duckdb.connect() as con:
+            con.execute("CREATE TABLE aircraft_states AS SELECT * FROM states")
+            start = time.perf_counter()
+            flagged = detect_trajectory_anomalies(con, window_end)
+            seconds = time.perf_counter() - start
+            injected = set(states["icao24"].iloc[:args.anomalies])
+            found = {r[0] for r in con.execute("SELECT DISTINCT icao24 FROM trajectory_anomalies").fetchall()}
+        print(f"{n:>10,}{len(states):>12,}{seconds:>10.3f}{flagged:>10,}{len(found & injected):>10}/{len(injected)}")
+
+
+if __name__ == "__main__":
+    main()
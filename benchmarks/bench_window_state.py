@@ -0,0 +1,84 @@
+"""
+Window state benchmark: list-of-dicts Quix state vs. ColumnarWindowStore.
+
+For a growing number of aircraft, one 3-minute window (18 snapshots) is fed
+through both approaches. Reports peak Python memory held for the window and
+the bytes written to the changelog topic, assuming one changelog write per
+updated key per snapshot.
+
+Usage:
+    python benchmarks/bench_window_state.py [--aircraft 1000 5000 20000]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "src" / "ingest"))
+
+from opensky_client import frame_to_records
+from synthetic import make_states_frame
+from src.streaming.window_store import ColumnarWindowStore
+
+SNAPSHOTS = 18
+DURATION_MS = 180_000
+
+
+def list_state(snapshots):
+    # Original reducer: one list of every event, rewritten to the changelog each update
+    tracemalloc.start()
+    window = []
+    window_bytes = 0
+    changelog = 0
+    for states in snapshots:
+        window.extend(dict(s) for s in states)
+        # Size of json.dumps(window), without re-encoding the whole list each time
+        window_bytes += sum(len(json.dumps(s)) + 2 for s in states)
+        changelog += window_bytes
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, changelog
+
+
+def columnar_state(snapshots, spill_dir):
+    store = ColumnarWindowStore(spill_dir, DURATION_MS, spill_rows=50_000)
+    tracemalloc.start()
+    counters = {}
+    changelog = 0
+    for i, states in enumerate(snapshots):
+        for state in states:
+            store.append(0, i * 10_000, state)
+            counter = counters.setdefault(state["icao24"], {"count": 0, "first_ts": i, "last_ts": i})
+            counter["count"] += 1
+            counter["last_ts"] = i
+        changelog += sum(len(json.dumps(c)) for c in counters.values())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    frame = store.pop(0, 0, DURATION_MS)
+    assert len(frame) == sum(len(s) for s in snapshots)
+    return peak, changelog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--aircraft", type=int, nargs="+", default=[1000, 5000, 20000])
+    args = parser.parse_args()
+
+    print(f"{'aircraft':>9} {'list MB':>9} {'columnar MB':>12} {'list changelog MB':>18} {'columnar changelog MB':>22}")
+    for n in args.aircraft:
+        snapshot = frame_to_records(make_states_frame(n))
+        snapshots = [[{**s, "snapshot_ts": 1_700_000_000 + 10 * i} for s in snapshot] for i in range(SNAPSHOTS)]
+        list_peak, list_log = list_state(snapshots)
+        with tempfile.TemporaryDirectory() as spill_dir:
+            col_peak, col_log = columnar_state(snapshots, spill_dir)
+        mb = 1024 * 1024
+        print(f"{n:>9,} {list_peak / mb:>9.1f} {col_peak / mb:>12.1f} {list_log / mb:>18.1f} {col_log / mb:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
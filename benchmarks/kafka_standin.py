@@ -0,0 +1,87 @@
+"""
+In-process stand-in for kafka-python's KafkaProducer.
+
+Records are serialized, batched, and compressed with kafka-python's own
+record batch builder, so byte counts match what a broker would receive,
+but nothing leaves the process.
+"""
+import time
+import zlib
+from collections import defaultdict
+
+from kafka.future import Future
+from kafka.producer.future import RecordMetadata
+from kafka.record.default_records import DefaultRecordBatchBuilder
+from kafka.record.memory_records import MemoryRecordsBuilder
+
+CODECS = {
+    None: DefaultRecordBatchBuilder.CODEC_NONE,
+    "gzip": DefaultRecordBatchBuilder.CODEC_GZIP,
+    "snappy": DefaultRecordBatchBuilder.CODEC_SNAPPY,
+    "lz4": DefaultRecordBatchBuilder.CODEC_LZ4,
+    "zstd": DefaultRecordBatchBuilder.CODEC_ZSTD,
+}
+
+
+class InProcessKafka:
+    """Accepts the KafkaProducer arguments used by producer_opensky."""
+
+    def __init__(self, value_serializer=None, key_serializer=None, compression_type=None,
+                 batch_size=16384, linger_ms=0, partitions=6, keep_messages=False, **_ignored):
+        self.value_serializer = value_serializer
+        self.key_serializer = key_serializer
+        self.codec = CODECS[compression_type]
+        self.batch_size = batch_size
+        self.partitions = partitions
+        self.keep_messages = keep_messages
+
+        self.broker_bytes = 0
+        self.batches = 0
+        self.records = 0
+        self.messages = defaultdict(list)  # topic -> [(partition, key, value)]
+        self._open = {}  # (topic, partition) -> (builder, [(future, value_size)])
+        self._sticky = 0
+
+    def _partition(self, key_bytes):
+        if key_bytes is None:
+            return self._sticky
+        return zlib.crc32(key_bytes) % self.partitions
+
+    def _close_batch(self, tp):
+        builder, pending = self._open.pop(tp)
+        builder.close()
+        self.broker_bytes += builder.size_in_bytes()
+        self.batches += 1
+        for offset, (future, key_size, value_size) in enumerate(pending):
+            future.success(RecordMetadata(tp[0], tp[1], None, offset, int(time.time() * 1000),
+                                          None, key_size, value_size, 0))
+        if tp[1] == self._sticky:
+            self._sticky = (self._sticky + 1) % self.partitions
+
+    def send(self, topic, value=None, key=None, headers=None, partition=None):
+        value_bytes = self.value_serializer(value) if self.value_serializer else value
+        key_bytes = self.key_serializer(key) if (self.key_serializer and key is not None) else key
+        tp = (topic, self._partition(key_bytes) if partition is None else partition)
+
+        future = Future()
+        timestamp = int(time.time() * 1000)
+        while True:
+            if tp not in self._open:
+                self._open[tp] = (MemoryRecordsBuilder(2, self.codec, self.batch_size), [])
+            builder, pending = self._open[tp]
+            if builder.append(timestamp, key_bytes, value_bytes, headers or []) is not None:
+                break
+            self._close_batch(tp)
+
+        pending.append((future, len(key_bytes or b""), len(value_bytes)))
+        self.records += 1
+        if self.keep_messages:
+            self.messages[topic].append((tp[1], key_bytes, value_bytes))
+        return future
+
+    def flush(self, timeout=None):
+        for tp in list(self._open):
+            self._close_batch(tp)
+
+    def close(self, timeout=None):
+        self.flush()
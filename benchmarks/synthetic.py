@@ -0,0 +1,181 @@
+"""Synthetic OpenSky state vectors for benchmarks (no network access needed)."""
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent / "src" / "ingest"))
+
+from opensky_client import frame_to_records
+
+# Same column order pyopensky's REST.states() returns
+STATE_COLUMNS = [
+    "icao24",
+    "callsign",
+    "origin_country",
+    "last_position",
+    "timestamp",
+    "longitude",
+    "latitude",
+    "altitude",
+    "onground",
+    "groundspeed",
+    "track",
+    "vertical_rate",
+    "sensors",
+    "geoaltitude",
+    "squawk",
+    "spi",
+    "position_source",
+]
+
+COUNTRIES = ["United States", "Germany", "United Kingdom", "France", "China", "Brazil", "Japan"]
+
+
+def make_states_frame(n: int, seed: int = 42, now: int = None) -> pd.DataFrame:
+    """Build a states DataFrame shaped like pyopensky's REST.states() output."""
+    rng = np.random.default_rng(seed)
+    now = int(time.time()) if now is None else now
+
+    icao24 = [f"{i:06x}" for i in rng.choice(0xFFFFFF, size=n, replace=False)]
+    callsign = [f"ABC{i:04d}" for i in rng.integers(0, 10000, size=n)]
+    altitude = rng.uniform(0, 12500, size=n)
+    altitude[rng.random(n) < 0.05] = np.nan
+    vertical_rate = rng.normal(0, 5, size=n)
+    vertical_rate[rng.random(n) < 0.05] = np.nan
+
+    raw = pd.DataFrame(
+        {
+            "icao24": icao24,
+            "callsign": callsign,
+            "origin_country": rng.choice(COUNTRIES, size=n),
+            "last_position": now - rng.integers(0, 15, size=n),
+            "timestamp": now - rng.integers(0, 15, size=n),
+            "longitude": rng.uniform(-180, 180, size=n),
+            "latitude": rng.uniform(-60, 70, size=n),
+            "altitude": altitude,
+            "onground": rng.random(n) < 0.1,
+            "groundspeed": rng.uniform(0, 280, size=n),
+            "track": rng.uniform(0, 360, size=n),
+            "vertical_rate": vertical_rate,
+            "sensors": [None] * n,
+            "geoaltitude": altitude + rng.normal(0, 50, size=n),
+            "squawk": [f"{i:04o}" for i in rng.integers(0, 0o7777, size=n)],
+            "spi": np.zeros(n, dtype=bool),
+            "position_source": np.zeros(n, dtype=int),
+        },
+        columns=STATE_COLUMNS,
+    ).convert_dtypes(dtype_backend="pyarrow")
+    # Aircraft without a position report in the last 15 s have no time_position
+    raw.loc[rng.random(n) < 0.05, "timestamp"] = None
+
+    return raw.assign(
+        timestamp=lambda df: pd.to_datetime(df.timestamp, utc=True, unit="s"),
+        last_position=lambda df: pd.to_datetime(df.last_position, utc=True, unit="s"),
+    )
+
+
+def make_aircraft_types_frame(n_designators: int = 2500, seed: int = 42) -> pd.DataFrame:
+    """doc8643AircraftTypes.csv-shaped frame; several model rows share each Designator."""
+    rng = np.random.default_rng(seed)
+    designators = [f"T{i:03d}" for i in range(n_designators)]
+    per_designator = rng.integers(1, 5, size=n_designators)
+    designator = np.repeat(designators, per_designator)
+    n = len(designator)
+    return pd.DataFrame(
+        {
+            "ModelFullName": [f"Model {d}-{i}" for i, d in enumerate(designator)],
+            "Description": rng.choice(["L2J", "L1P", "L2T", "H1T", "L4J"], size=n),
+            "WTC": rng.choice(["L", "M", "H"], size=n),
+            "WTG": rng.choice(["A", "B", "C", "D", "E", "F"], size=n),
+            "Designator": designator,
+            "ManufacturerCode": rng.choice(["BOEING", "AIRBUS", "CESSNA", "EMBRAER"], size=n),
+            "AircraftDescription": rng.choice(["LandPlane", "Helicopter", "Amphibian"], size=n),
+            "EngineCount": rng.integers(1, 5, size=n).astype(str),
+            "EngineType": rng.choice(["Jet", "Piston", "Turboprop/Turboshaft"], size=n),
+        }
+    )
+
+
+def make_airframes_frame(n: int = 500_000, n_designators: int = 2500, seed: int = 42) -> pd.DataFrame:
+    """aircraftDatabase.csv-shaped frame (the real file has ~500k rows)."""
+    rng = np.random.default_rng(seed)
+    typecode = np.array([f"T{i:03d}" for i in rng.integers(0, n_designators, size=n)], dtype=object)
+    typecode[rng.random(n) < 0.3] = None
+    return pd.DataFrame(
+        {
+            "icao24": [f"{i:06x}" for i in rng.choice(0xFFFFFF, size=n, replace=False)],
+            "registration": [f"N{i:05d}" for i in rng.integers(0, 100_000, size=n)],
+            "manufacturername": rng.choice(["Boeing", "Airbus", "Cessna", "Embraer"], size=n),
+            "model": [f"Model {i}" for i in rng.integers(0, 5000, size=n)],
+            "typecode": typecode,
+            "icaoaircrafttype": [f"T{i:03d}" for i in rng.integers(0, n_designators, size=n)],
+            "operator": rng.choice(["", "Delta", "Lufthansa", "Ryanair"], size=n),
+            "operatoricao": rng.choice(["", "DAL", "DLH", "RYR"], size=n),
+            "owner": rng.choice(["", "Private", "Leasing Co"], size=n),
+            "built": [f"{y}-01-01" for y in rng.integers(1970, 2024, size=n)],
+        }
+    )
+
+
+def load_synthetic_windows(con, aircraft: int, windows: int, start: datetime = datetime(2025, 1, 1)) -> datetime:
+    """Create an aircraft_states table with `windows` 3-minute windows. Returns the last window_end."""
+    for w in range(windows):
+        window_end = start + timedelta(minutes=3 * (w + 1))
+        states = pd.DataFrame(frame_to_records(make_states_frame(aircraft, seed=w)))
+        states["snapshot_ts"] = int(window_end.timestamp())
+        states["window_start"] = window_end - timedelta(minutes=3)
+        states["window_end"] = window_end
+        if w == 0:
+            con.execute("CREATE TABLE aircraft_states AS SELECT * FROM states")
+        else:
+            con.execute("INSERT INTO aircraft_states SELECT * FROM states")
+    return window_end
+
+
+def make_trajectory_frame(aircraft: int, snapshots: int = 18, window_end: datetime = datetime(2025, 1, 1, 0, 3),
+                          anomalies: int = 50, seed: int = 42) -> pd.DataFrame:
+    """
+    One window of aircraft_states rows where each aircraft flies a straight,
+    level track with a 10 s snapshot cadence. `anomalies` aircraft get a
+    position jump halfway through the window.
+    """
+    rng = np.random.default_rng(seed)
+    icao24 = np.array([f"{i:06x}" for i in rng.choice(0xFFFFFF, size=aircraft, replace=False)])
+    lat0 = rng.uniform(-60, 60, size=aircraft)
+    lon0 = rng.uniform(-170, 170, size=aircraft)
+    velocity = rng.uniform(60, 250, size=aircraft)
+    track = rng.uniform(0, 360, size=aircraft)
+    altitude = rng.uniform(1000, 12000, size=aircraft)
+    start = window_end - timedelta(minutes=3)
+
+    frames = []
+    for k in range(snapshots):
+        seconds = 10 * k
+        meters = velocity * seconds
+        lat = lat0 + meters * np.cos(np.radians(track)) / 111_320
+        lon = lon0 + meters * np.sin(np.radians(track)) / (111_320 * np.cos(np.radians(lat0)))
+        if k >= snapshots // 2:
+            lat = lat.copy()
+            lat[:anomalies] += 1.0
+        ts = start + timedelta(seconds=seconds)
+        frames.append(pd.DataFrame({
+            "icao24": icao24,
+            "callsign": [f"ABC{i:04d}" for i in range(aircraft)],
+            "time_position": ts.isoformat() + "+00:00",
+            "latitude": lat,
+            "longitude": lon,
+            "baro_altitude": altitude,
+            "on_ground": False,
+            "velocity": velocity,
+            "true_track": track,
+            "vertical_rate": 0.0,
+            "squawk": "1200",
+            "snapshot_ts": ts.isoformat() + "+00:00",
+            "window_start": start,
+            "window_end": window_end,
+        }))
+    return pd.concat(frames, ignore_index=True)
@@ -17,17 +17,17 @@ mkdir -p logs
 # This will start all the services defined in docker-compose.yml
 docker-compose up -d
 
-# Fix Redpanda topic configuration for large messages
-# This is required because the default topic creation does not inherit the broker-level max message bytes
-# for internal changelog topics created by Quix Streams.
+# Create the raw topic with enough partitions to spread the windowing work.
+# The producer keys records by icao24, so each consumer in the group owns a
+# disjoint set of aircraft. Existing topics are left untouched.
+RAW_TOPIC_PARTITIONS=${RAW_TOPIC_PARTITIONS:-6}
+NUM_CONSUMERS=${NUM_CONSUMERS:-1}
 
-TOPIC_NAME="changelog__aircraft-tumbling-window-v6--aircraft_states_raw--groupby--global_window--tumbling_window_180000_reduce"
-MAX_BYTES=104857600
+echo "Creating topic aircraft_states_raw with $RAW_TOPIC_PARTITIONS partitions"
+docker exec opensky-0 rpk topic create aircraft_states_raw -p "$RAW_TOPIC_PARTITIONS" -r 3 || true
 
-echo "Updating config for topic: $TOPIC_NAME"
-docker exec opensky-0 rpk topic alter-config "$TOPIC_NAME" --set max.message.bytes=$MAX_BYTES
-
-echo "Done."
+# Consumers announce every uploaded window file here
+docker exec opensky-0 rpk topic create aircraft_windows_ready -p 1 -r 3 || true
 
 echo "Starting producer..."
 python src/ingest/producer_opensky.py > logs/producer.log 2>&1 &
@@ -35,9 +35,12 @@ echo "Producer started with PID $!"
 
 sleep 3
 
-echo "Starting consumer..."
-python src/streaming/consumer_tumbling_window.py > logs/consumer.log 2>&1 &
-echo "Consumer started with PID $!"
+# Consumers share one consumer group, so extra instances split the partitions
+for i in $(seq 1 "$NUM_CONSUMERS"); do
+    echo "Starting consumer $i..."
+    WINDOW_SPILL_DIR="window_spill/consumer_$i" python src/streaming/consumer_tumbling_window.py > "logs/consumer_$i.log" 2>&1 &
+    echo "Consumer $i started with PID $!"
+done
 
 sleep 3
 
@@ -47,8 +50,15 @@ echo "Prefect server started with PID $!"
 
 sleep 5
 
-echo "Starting flows..."
-python src/orchestration/flows.py > logs/flows.log 2>&1 &
+# PIPELINE_TRIGGER=event (default) runs the flow as soon as a window is
+# uploaded; PIPELINE_TRIGGER=cron serves it on the 3-minute schedule instead
+PIPELINE_TRIGGER=${PIPELINE_TRIGGER:-event}
+echo "Starting flows ($PIPELINE_TRIGGER trigger)..."
+if [ "$PIPELINE_TRIGGER" = "cron" ]; then
+    python src/orchestration/flows.py > logs/flows.log 2>&1 &
+else
+    python src/orchestration/window_trigger.py > logs/flows.log 2>&1 &
+fi
 echo "Flows started with PID $!"
 
 echo "All services started. Logs are in logs/ directory."
@@ -1,17 +1,22 @@
-import duckdb
 import logging
 import sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from sklearn.ensemble import IsolationForest
-import plotly.express as px
 
 
 # Get absolute paths based on script location
 SCRIPT_DIR = Path(__file__).parent.resolve()
 PROJECT_ROOT = SCRIPT_DIR.parent.parent
 
-DB_FILE = str(PROJECT_ROOT / "air_ops.duckdb")
+# Add project root to sys.path to allow importing from src
+sys.path.append(str(PROJECT_ROOT))
+
+from src.Db_work.anomaly_model import FEATURES, current_model, score_frame, store_scores
+from src.Db_work.peer_scoring import score_peer_window
+from src.Db_work.session import get_session
+from src.Db_work.trajectory import detect_trajectory_anomalies
+from src.Db_work.window_cache import get_window
 
 logging.basicConfig(
     level=logging.INFO,
@@ -31,40 +36,30 @@ def get_latest_window(con):
 
 # 2) Create a DataFrame for a specific window
 def create_df_for_window(con, window_end) -> pd.DataFrame:
-    logger.info(f"Fetching data for window_end: {window_end}")
-    df = con.execute(
-        """
-        SELECT 
-            s.*,
-            md.Description
-        FROM aircraft_states s
-        LEFT JOIN airframes af ON s.icao24 = af.icao24
-        LEFT JOIN model_database md ON (
-            af.typecode = md.Designator 
-            OR af.icaoaircrafttype = md.Designator
-        )
-        WHERE s.window_end = ?
-        """,
-        [window_end],
-    ).fetchdf()
-    return df
-
-# 3) Train Isolation Forest
-def train_isolation_forest(df: pd.DataFrame):
-    features = ["latitude", "longitude", "baro_altitude", "velocity", "vertical_rate"]
-    
-    # Prepare data
-    df_features = df[features].dropna()
-    
-    if df_features.empty:
-        logger.warning("No data available for training after dropping NaNs.")
+    # Cached per window_end, so analysis and viz share one query
+    return get_window(con, window_end).to_pandas()
+
+# 3) Score the window with the persisted Isolation Forest
+def detect_anomalies(con, df: pd.DataFrame, window_end):
+    """
+    Score a window with the current model version and store per-row scores.
+
+    The model is retrained on a rolling multi-window sample only when it is
+    older than RETRAIN_MINUTES, so scores stay comparable between windows.
+    Returns the scored rows (FEATURES plus anomaly: -1 anomaly, 1 normal),
+    or None without scores.
+    """
+    version, model = current_model(con)
+
+    logger.info(f"Scoring {len(df)} records with model version {version}...")
+    scores = score_frame(model, df)
+    if scores.empty:
+        logger.warning("No complete feature rows to score.")
         return
+    store_scores(con, window_end, version, df, scores)
 
-    logger.info(f"Training Isolation Forest on {len(df_features)} records...")
-    
-    # Train Isolation Forest
-    model = IsolationForest(contamination=0.01, random_state=42)
-    df_features["anomaly"] = model.fit_predict(df_features)
+    df_features = df.loc[scores.index, FEATURES].copy()
+    df_features["anomaly"] = np.where(scores["is_anomaly"], -1, 1)
     
     # Filter anomalies (-1 = anomaly, 1 = normal)
     anomalies = df_features[df_features["anomaly"] == -1]
@@ -78,38 +73,49 @@ def train_isolation_forest(df: pd.DataFrame):
         anomalies_with_callsign["anomaly"] = -1
         logger.info(f"\n{anomalies_with_callsign.to_string()}")
         
-    # Visualize with anomalies highlighted
-    logger.info("Generating anomaly plot...")
-    df_features["is_anomaly"] = df_features["anomaly"].map({1: "Normal", -1: "Anomaly"})
-    fig = px.scatter_geo(df_features, lat="latitude", lon="longitude", 
-                        color="is_anomaly", 
-                        color_discrete_map={"Normal": "blue", "Anomaly": "red"},
-                        projection="natural earth",
-                        title="Flight Anomaly Detection")
-    
-    output_file = "images/anomaly_detection.png"
-    fig.write_image(output_file)
-    logger.info(f"Plot saved to {output_file}")
+    return df_features
+
+def main(window=None, raise_errors: bool = False):
+    """
+    Analyze the latest window, or `window` = (window_end, Arrow table) if given.
 
-def main():
+    Returns the forest's scored rows for the anomaly map, or None. Errors are
+    logged, and re-raised with `raise_errors` (so the flow does not cache a
+    failed run as the window's result).
+    """
     try:
-        with duckdb.connect(DB_FILE, read_only=True) as con:
-            latest_window = get_latest_window(con)
-            
-            if latest_window is None:
-                logger.warning("No data found in aircraft_states table.")
-                return
+        # Read-write: scores and new model versions are stored in the database
+        with get_session().writer() as con:
+            if window is None:
+                latest_window = get_latest_window(con)
                 
-            df = create_df_for_window(con, latest_window)
+                if latest_window is None:
+                    logger.warning("No data found in aircraft_states table.")
+                    return
+                    
+                df = create_df_for_window(con, latest_window)
+            else:
+                latest_window, table = window
+                df = table.to_pandas()
             
             if df.empty:
                 logger.warning(f"No data found for window {latest_window}")
                 return
                 
-            train_isolation_forest(df)
+            scored = detect_anomalies(con, df, latest_window)
+
+            # Robust per-type/altitude peer comparison, next to the forest
+            score_peer_window(con, latest_window)
+
+            # Implausible transitions between consecutive fixes of each aircraft
+            detect_trajectory_anomalies(con, latest_window)
+
+            return scored
             
     except Exception as e:
         logger.exception(f"An error occurred: {e}")
+        if raise_errors:
+            raise
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,198 @@
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+# Get absolute paths based on script location
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+
+# Add project root to sys.path to allow importing from src
+sys.path.append(str(PROJECT_ROOT))
+
+from src.Db_work.duckdb_utils import ensure_column_type
+from src.Db_work.session import get_session, transaction
+
+# Fitted models are kept as versioned joblib files
+MODEL_DIR = Path(os.environ.get("ANOMALY_MODEL_DIR", PROJECT_ROOT / "models"))
+
+FEATURES = ["latitude", "longitude", "baro_altitude", "velocity", "vertical_rate"]
+
+# Retrain on a slower cadence than the 3-minute scoring runs
+RETRAIN_MINUTES = int(os.environ.get("ANOMALY_RETRAIN_MINUTES", "60"))
+# Rolling training sample: the newest windows (20 x 3 min = 1 hour)
+TRAINING_WINDOWS = int(os.environ.get("ANOMALY_TRAINING_WINDOWS", "20"))
+TRAINING_SAMPLE_ROWS = 200_000
+
+# Scoring runs in chunks so memory stays flat for large windows
+SCORE_BATCH_ROWS = 50_000
+N_JOBS = -1
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    stream=sys.stdout,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_model_tables(con) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS anomaly_models (
+            version INTEGER PRIMARY KEY,
+            path VARCHAR,
+            trained_at TIMESTAMP,
+            training_rows BIGINT,
+            first_window TIMESTAMP,
+            last_window TIMESTAMP
+        );
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS anomaly_scores (
+            window_end TIMESTAMP,
+            icao24 VARCHAR,
+            snapshot_ts BIGINT,
+            model_version INTEGER,
+            score DOUBLE,
+            is_anomaly BOOLEAN
+        );
+        """
+    )
+    # Tables created before snapshot_ts was typed stored it as text
+    ensure_column_type(con, "anomaly_scores", "snapshot_ts", "BIGINT")
+
+
+def latest_model_info(con):
+    """(version, path, trained_at) of the newest model, or None."""
+    return con.execute(
+        "SELECT version, path, trained_at FROM anomaly_models ORDER BY version DESC LIMIT 1"
+    ).fetchone()
+
+
+def needs_training(info, now: datetime = None) -> bool:
+    if info is None or not Path(info[1]).exists():
+        return True
+    now = datetime.now() if now is None else now
+    return now - info[2] >= timedelta(minutes=RETRAIN_MINUTES)
+
+
+def training_sample(con) -> pd.DataFrame:
+    """Reservoir sample of complete feature rows from the newest windows."""
+    feature_list = ", ".join(FEATURES)
+    not_null = " AND ".join(f"{f} IS NOT NULL" for f in FEATURES)
+    return con.execute(
+        f"""
+        WITH recent AS (
+            SELECT DISTINCT window_end FROM aircraft_states
+            ORDER BY window_end DESC
+            LIMIT {TRAINING_WINDOWS}
+        )
+        SELECT window_end, {feature_list}
+        FROM aircraft_states
+        WHERE window_end IN (SELECT window_end FROM recent) AND {not_null}
+        USING SAMPLE reservoir({TRAINING_SAMPLE_ROWS} ROWS) REPEATABLE (42)
+        """
+    ).fetchdf()
+
+
+def train_model(con) -> int:
+    """Fit a new IsolationForest on the rolling sample and register it. Returns its version."""
+    sample = training_sample(con)
+    if sample.empty:
+        raise ValueError("No complete feature rows to train on")
+
+    logger.info(
+        f"Training Isolation Forest on {len(sample):,} rows from "
+        f"{sample['window_end'].nunique()} windows..."
+    )
+    model = IsolationForest(contamination=0.01, random_state=42, n_jobs=N_JOBS)
+    model.fit(sample[FEATURES].to_numpy(dtype=np.float64))
+
+    version = con.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM anomaly_models").fetchone()[0]
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    path = MODEL_DIR / f"isolation_forest_v{version:04d}.joblib"
+    # Write then rename so a concurrent reader never loads a partial file
+    tmp_path = path.with_suffix(".tmp")
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+
+    con.execute(
+        "INSERT INTO anomaly_models VALUES (?, ?, ?, ?, ?, ?)",
+        [version, str(path), datetime.now(), len(sample),
+         sample["window_end"].min(), sample["window_end"].max()],
+    )
+    logger.info(f"Saved model version {version} to {path}")
+    return version
+
+
+@lru_cache(maxsize=2)
+def load_model(path: str) -> IsolationForest:
+    return joblib.load(path)
+
+
+def current_model(con, retrain: bool = False):
+    """Return (version, model), training a new version first when one is due."""
+    ensure_model_tables(con)
+    info = latest_model_info(con)
+    if retrain or needs_training(info):
+        train_model(con)
+        info = latest_model_info(con)
+    return info[0], load_model(info[1])
+
+
+def score_frame(model: IsolationForest, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Score rows with complete features in batches.
+
+    Returns `score` (decision_function, negative means anomalous) and
+    `is_anomaly` indexed like the scored rows of `df`.
+    """
+    features = df[FEATURES].dropna()
+    values = features.to_numpy(dtype=np.float64)
+    scores = np.empty(len(values))
+    for start in range(0, len(values), SCORE_BATCH_ROWS):
+        batch = values[start:start + SCORE_BATCH_ROWS]
+        scores[start:start + len(batch)] = model.decision_function(batch)
+    return pd.DataFrame({"score": scores, "is_anomaly": scores < 0}, index=features.index)
+
+
+def store_scores(con, window_end, version: int, df: pd.DataFrame, scores: pd.DataFrame) -> None:
+    """Replace the stored scores of one window."""
+    rows = df.loc[scores.index, ["icao24", "snapshot_ts"]].assign(
+        window_end=window_end,
+        model_version=version,
+        score=scores["score"],
+        is_anomaly=scores["is_anomaly"],
+    )
+    with transaction(con):
+        con.execute("DELETE FROM anomaly_scores WHERE window_end = ?", [window_end])
+        con.execute("INSERT INTO anomaly_scores BY NAME SELECT * FROM rows")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train a new anomaly model version.")
+    parser.add_argument("--force", action="store_true", help="train even if the current model is recent")
+    args = parser.parse_args(argv)
+
+    with get_session().writer() as con:
+        ensure_model_tables(con)
+        if args.force or needs_training(latest_model_info(con)):
+            train_model(con)
+        else:
+            logger.info("Current model is recent enough, not retraining")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
-import duckdb
+import sys
 from pathlib import Path
 from typing import List, Optional
 
+# Add project root to sys.path to allow importing from src
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.Db_work.session import get_session
+
 
 def inspect_database(db_path: str, read_only: bool = True) -> None:
     """
@@ -15,7 +20,7 @@ def inspect_database(db_path: str, read_only: bool = True) -> None:
     db_path = str(Path(db_path).resolve())
     
     try:
-        with duckdb.connect(db_path, read_only=read_only) as con:
+        with get_session(db_path, read_only=read_only).reader() as con:
             # Get all tables
             tables = con.execute(
                 "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
@@ -60,7 +65,7 @@ def list_tables(db_path: str) -> List[str]:
     db_path = str(Path(db_path).resolve())
     
     try:
-        with duckdb.connect(db_path, read_only=True) as con:
+        with get_session(db_path, read_only=True).reader() as con:
             tables = con.execute(
                 "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
             ).fetchall()
@@ -85,7 +90,7 @@ def query_table(db_path: str, table_name: str, limit: int = 10) -> Optional[List
     db_path = str(Path(db_path).resolve())
     
     try:
-        with duckdb.connect(db_path, read_only=True) as con:
+        with get_session(db_path, read_only=True).reader() as con:
             result = con.execute(f"SELECT * FROM {table_name} LIMIT {limit}").fetchall()
             return result
     except Exception as e:
@@ -93,6 +98,29 @@ def query_table(db_path: str, table_name: str, limit: int = 10) -> Optional[List
         return None
 
 
+
+def ensure_column_type(con, table_name: str, column: str, column_type: str) -> None:
+    """
+    Convert a column of an existing table to `column_type` if it has another type.
+
+    Values that do not convert become NULL.
+
+    Args:
+        con: Open DuckDB connection (writer)
+        table_name: Name of the table
+        column: Name of the column
+        column_type: DuckDB type the column should have, e.g. BIGINT
+    """
+    current = con.execute(
+        "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = ?",
+        [table_name, column],
+    ).fetchone()
+    if current is not None and current[0] != column_type:
+        con.execute(
+            f"ALTER TABLE {table_name} ALTER {column} TYPE {column_type} "
+            f"USING TRY_CAST({column} AS {column_type})"
+        )
+
 if __name__ == "__main__":
     from pathlib import Path
     PROJECT_ROOT = Path(__file__).parent.parent.parent
@@ -1,17 +1,48 @@
-import duckdb
 import os
 import logging
+import re
 import sys
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
+import boto3
+from botocore import UNSIGNED
+from botocore.config import Config
+
 # Get absolute paths based on script location
 SCRIPT_DIR = Path(__file__).parent.resolve()
 PROJECT_ROOT = SCRIPT_DIR.parent.parent
 SRC_DIR = SCRIPT_DIR.parent
 
+# Add project root to sys.path to allow importing from src
+sys.path.append(str(PROJECT_ROOT))
+
+import duckdb
+
+from src.Db_work.reference_data import REFERENCE_DATA_DIR, refresh_reference_data
+from src.Db_work.session import get_session, transaction
+
 S3_BUCKET = "xxe9ff-dp3"
 S3_PREFIX_DATA = "processed"
-DB_file = str(PROJECT_ROOT / "air_ops.duckdb")
+
+# Read windows from a local directory (the consumer's WINDOW_SINK_DIR)
+# instead of S3 when set. The key layout is the same.
+WINDOW_SOURCE_DIR = os.environ.get("WINDOW_SOURCE_DIR")
+
+# How many days of date partitions to scan when the manifest is empty
+BACKFILL_DAYS = int(os.environ.get("LOAD_BACKFILL_DAYS", "1"))
+
+# A window file that cannot be read is retried on this many runs (or when it
+# is rewritten) before it is left in the manifest as failed
+MAX_LOAD_ATTEMPTS = int(os.environ.get("LOAD_MAX_ATTEMPTS", "3"))
+
+WINDOW_KEY_RE = re.compile(r"window_(raw|summary)_(\d{8}T\d{6})(?:_p\d+)?\.parquet$")
+
+# Destination table for each kind of window file
+WINDOW_TABLES = {
+    "raw": "aircraft_states",
+    "summary": "aircraft_window_summary",
+}
 
 
 logging.basicConfig(
@@ -23,86 +54,237 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def ensure_manifest(con) -> None:
+    """Create the ingest manifest if needed."""
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+            key VARCHAR PRIMARY KEY,
+            etag VARCHAR,
+            kind VARCHAR,
+            row_count BIGINT,
+            window_end TIMESTAMP,
+            loaded_at TIMESTAMP
+        );
+        """
+    )
+    # Files that could not be loaded: the last error and the number of tries
+    con.execute("ALTER TABLE ingest_manifest ADD COLUMN IF NOT EXISTS error VARCHAR")
+    con.execute("ALTER TABLE ingest_manifest ADD COLUMN IF NOT EXISTS attempts INTEGER")
+
+
+def loaded_by_manifest(con, kind: str) -> bool:
+    """
+    True once the manifest has recorded files of this kind, i.e. the table
+    was built by this loader. Until then it may be a table left by the old
+    replace-only loader, whose files are not in the manifest.
+    """
+    return con.execute(
+        "SELECT COUNT(*) FROM ingest_manifest WHERE kind = ? AND error IS NULL", [kind]
+    ).fetchone()[0] > 0
+
+
+def partitions_to_scan(con) -> list:
+    """Date partitions (date=YYYY/MM/DD) that can hold windows not loaded yet."""
+    last_window = con.execute("SELECT MAX(window_end) FROM ingest_manifest").fetchone()[0]
+    today = date.today()
+    if last_window is None:
+        first = today - timedelta(days=BACKFILL_DAYS)
+    else:
+        # The newest loaded day may still receive late partition parts
+        first = last_window.date()
+    days = (today + timedelta(days=1) - first).days
+    return [f"{S3_PREFIX_DATA}/date={(first + timedelta(days=i)).strftime('%Y/%m/%d')}/" for i in range(days + 1)]
+
+
+def s3_client():
+    """S3 client using local credentials, or anonymous access to the public bucket."""
+    if boto3.Session().get_credentials() is None:
+        return boto3.client("s3", region_name="us-east-1", config=Config(signature_version=UNSIGNED))
+    return boto3.client("s3", region_name="us-east-1")
+
+
+def list_window_objects(prefixes: list) -> list:
+    """List window files under the given date prefixes as {key, etag, path} dicts."""
+    objects = []
+    if WINDOW_SOURCE_DIR:
+        root = Path(WINDOW_SOURCE_DIR)
+        for prefix in prefixes:
+            for path in sorted((root / prefix).glob("window_*.parquet")):
+                stat = path.stat()
+                objects.append({
+                    "key": f"{prefix}{path.name}",
+                    "etag": f"{stat.st_mtime_ns}-{stat.st_size}",
+                    "path": str(path),
+                })
+        return objects
+
+    paginator = s3_client().get_paginator("list_objects_v2")
+    for prefix in prefixes:
+        for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                objects.append({
+                    "key": obj["Key"],
+                    "etag": obj["ETag"].strip('"'),
+                    "path": f"s3://{S3_BUCKET}/{obj['Key']}",
+                })
+    return objects
+
+
+def find_new_windows(con, objects: list) -> dict:
+    """Group objects missing from the manifest by kind (raw / summary)."""
+    known = {
+        key: (etag, attempts)
+        for key, etag, attempts in con.execute(
+            "SELECT key, etag, CASE WHEN error IS NULL THEN NULL ELSE attempts END FROM ingest_manifest"
+        ).fetchall()
+    }
+    new = {kind: [] for kind in WINDOW_TABLES}
+    for obj in objects:
+        match = WINDOW_KEY_RE.search(obj["key"])
+        if match is None:
+            continue
+        etag, failed_attempts = known.get(obj["key"], (None, None))
+        if etag is None:
+            new[match.group(1)].append(obj)
+        elif failed_attempts is not None:
+            # Retry a failed file a few times, and whenever it is rewritten
+            if etag != obj["etag"]:
+                new[match.group(1)].append({**obj, "attempts": 0})
+            elif failed_attempts < MAX_LOAD_ATTEMPTS:
+                new[match.group(1)].append({**obj, "attempts": failed_attempts})
+        elif etag != obj["etag"]:
+            # Windows are written once; a rewrite would double count rows
+            logger.warning(f"{obj['key']} changed since it was loaded, skipping")
+    return new
+
+
+def has_new_windows(con) -> bool:
+    """Cheap check whether a load run would find anything (no writes)."""
+    manifest_exists = con.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'ingest_manifest'"
+    ).fetchone()[0] > 0
+    if not manifest_exists:
+        return True
+    new_windows = find_new_windows(con, list_window_objects(partitions_to_scan(con)))
+    return any(new_windows.values())
+
+
+MANIFEST_COLUMNS = "(key, etag, kind, row_count, window_end, loaded_at, error, attempts)"
+
+
+def _append_batch(con, kind: str, objects: list, replace: bool) -> int:
+    """Append window files to their table and record them in the manifest, all or nothing."""
+    table = WINDOW_TABLES[kind]
+    # Table rows and manifest entries must land together or not at all
+    with transaction(con):
+        con.execute(
+            """
+            CREATE OR REPLACE TEMP TABLE new_windows AS
+            SELECT * FROM read_parquet(?, union_by_name=true, filename=true);
+            """,
+            [[obj["path"] for obj in objects]],
+        )
+
+        table_exists = con.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table]
+        ).fetchone()[0] > 0
+        if replace or not table_exists:
+            con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * EXCLUDE (filename) FROM new_windows")
+        else:
+            con.execute(f"INSERT INTO {table} BY NAME SELECT * EXCLUDE (filename) FROM new_windows")
+
+        counts = dict(con.execute(
+            "SELECT filename, COUNT(*) FROM new_windows GROUP BY filename"
+        ).fetchall())
+        window_ends = dict(con.execute(
+            "SELECT filename, MAX(window_end) FROM new_windows GROUP BY filename"
+        ).fetchall())
+        loaded_at = datetime.now()
+        con.executemany(
+            f"INSERT OR REPLACE INTO ingest_manifest {MANIFEST_COLUMNS} VALUES (?, ?, ?, ?, ?, ?, NULL, NULL)",
+            [
+                [obj["key"], obj["etag"], kind, counts.get(obj["path"], 0), window_ends.get(obj["path"]), loaded_at]
+                for obj in objects
+            ],
+        )
+        con.execute("DROP TABLE new_windows")
+    return sum(counts.values())
+
+
+def record_failed(con, kind: str, obj: dict, error: Exception) -> None:
+    """Remember a window file that could not be loaded, so it does not block later loads."""
+    attempts = obj.get("attempts", 0) + 1
+    con.execute(
+        f"INSERT OR REPLACE INTO ingest_manifest {MANIFEST_COLUMNS} VALUES (?, ?, ?, NULL, NULL, ?, ?, ?)",
+        [obj["key"], obj["etag"], kind, datetime.now(), str(error), attempts],
+    )
+    give_up = "" if attempts < MAX_LOAD_ATTEMPTS else ", giving up on it"
+    logger.error(f"Could not load {obj['key']} (attempt {attempts}/{MAX_LOAD_ATTEMPTS}{give_up}): {error}")
+
+
+def append_windows(con, kind: str, objects: list, replace: bool = False) -> int:
+    """
+    Append window files to their table and record them in the manifest.
+
+    The files are read in one batch. If that fails, they are loaded one by
+    one, and a file that cannot be read is recorded in the manifest as failed
+    (retried on the next runs up to MAX_LOAD_ATTEMPTS), so one bad file does
+    not hold back every window after it.
+    """
+    if len(objects) > 1:
+        try:
+            return _append_batch(con, kind, objects, replace)
+        except duckdb.Error as e:
+            logger.warning(f"Could not load {len(objects)} {kind} files in one batch, "
+                           f"loading them one by one: {e}")
+
+    rows = 0
+    for obj in objects:
+        try:
+            rows += _append_batch(con, kind, [obj], replace)
+        except duckdb.Error as e:
+            record_failed(con, kind, obj, e)
+            continue
+        # Only the first loaded file replaces a table from the old loader
+        replace = False
+    return rows
+
+
 def main():
     try:
-        with duckdb.connect(DB_file, read_only=False) as con:
+        # The shared session has httpfs and the S3 region set up already
+        with get_session().writer() as con:
 
             logger.info("connected to duckdb")
 
-            # Enable HTTP/HTTPS access so that we can use s3
-            con.execute("INSTALL httpfs")
-            con.execute("LOAD httpfs")
+            # 1) The manifest remembers every window file already loaded
+            ensure_manifest(con)
 
-            # set s3 region
-            con.execute(
-                """
-                SET s3_region='us-east-1';
-                """
+            # 2) List only the date partitions that can hold new windows
+            prefixes = partitions_to_scan(con)
+            objects = list_window_objects(prefixes)
+            new_windows = find_new_windows(con, objects)
+            logger.info(
+                f"Scanned {len(prefixes)} date partitions: {len(objects)} files, "
+                f"{len(new_windows['raw'])} new raw and {len(new_windows['summary'])} new summary parts"
             )
 
+            # 3) Append the new windows to the persistent tables
+            for kind, objs in new_windows.items():
+                if not objs:
+                    continue
+                # The first files of a kind replace a table left by the old
+                # replace-only loader instead of appending to its rows
+                rows = append_windows(con, kind, objs, replace=not loaded_by_manifest(con, kind))
+                logger.info(f"appended {rows:,} rows from {len(objs)} files to {WINDOW_TABLES[kind]}")
 
-            # 1) Find the most recent parquet file on S3 using DuckDB metadata
-            pattern = (
-                f"s3://{S3_BUCKET}/{S3_PREFIX_DATA}/date=*/*/*/window_raw_*.parquet"
-            )
-
-            # 2) Get the metadata for the most recent parquet file
-            result = con.execute(
-                """
-                SELECT file_name
-                FROM parquet_metadata(?)
-                ORDER BY file_name DESC
-                LIMIT 1;
-                """,
-                [pattern],
-            ).fetchone()
-
-            # 3) Load the most recent parquet file into DuckDB
-            if result is None:
-                logger.warning("No parquet files found matching pattern on S3")
-                return
-
-            latest_path = result[0]
-            logger.info(f"Loading most recent parquet file: {latest_path}")
-
-            # 4) Load the most recent parquet file into DuckDB
-            con.execute(
-                """
-                CREATE OR REPLACE TABLE aircraft_states AS
-                SELECT * FROM read_parquet(?);
-                """,
-                [latest_path],
-            )
-            logger.info("created aircraft_states table")
-            
-            # 5) load in the airframe data files
-            
-            data_file1 = f"s3://{S3_BUCKET}/data/aircraftDatabase.csv"
-            # 6) load the airframe data files into duckdb
-            con.execute(
-                """
-                CREATE OR REPLACE TABLE airframes AS
-                SELECT * FROM read_csv_auto(?, header=True);
-                """,
-                [data_file1],
-            )
-            
-            logger.info("created airframes table")
-
-            # 7) load in the reference data files
-            data_file2 = f"s3://{S3_BUCKET}/data/doc8643AircraftTypes.csv"
-            # 8) load the reference data files into duckdb
-            con.execute(
-                """
-                CREATE OR REPLACE TABLE model_database AS
-                SELECT * FROM read_csv_auto(?, header=True);
-                """,
-                [data_file2],
-            )
+            if not new_windows["raw"]:
+                logger.warning("No new window files found")
 
-            logger.info("created aircraft_model_database table")
-            
-            
+            # 4) Reference data (airframes / aircraft types) changes rarely,
+            # so it is only rebuilt when the source files change
+            refresh_reference_data(con, None if REFERENCE_DATA_DIR else s3_client())
 
             logger.info("load complete")
 
@@ -0,0 +1,211 @@
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Get absolute paths based on script location
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+
+# Add project root to sys.path to allow importing from src
+sys.path.append(str(PROJECT_ROOT))
+
+from src.Db_work.duckdb_utils import ensure_column_type
+from src.Db_work.session import get_session, transaction
+
+# Metrics compared against the aircraft's peer group
+PEER_METRICS = ["velocity", "vertical_rate", "climb_rate_ratio"]
+
+# Altitude bands in meters; peers are the same type at a similar altitude
+ALTITUDE_BAND_METERS = 1500
+
+# Baselines are recomputed from the newest windows on a slow cadence
+BASELINE_WINDOWS = int(os.environ.get("PEER_BASELINE_WINDOWS", "20"))
+BASELINE_REFRESH_MINUTES = int(os.environ.get("PEER_BASELINE_REFRESH_MINUTES", "30"))
+
+# Smallest scale a robust z is divided by, per metric (m/s, m/s, ratio).
+# A peer group whose values are mostly identical has MAD = 0; without a
+# floor its outliers would get no z at all and never be flagged.
+PEER_MIN_SCALE = {"velocity": 1.0, "vertical_rate": 0.5, "climb_rate_ratio": 0.01}
+
+# Groups smaller than this fall back to the altitude-band baseline of all types
+MIN_GROUP_SIZE = 30
+
+# |robust z| above this flags the observation (Iglewicz & Hoaglin)
+PEER_Z_THRESHOLD = 3.5
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    stream=sys.stdout,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _observations(where: str) -> str:
+    """aircraft_states rows with their peer-group keys and metrics."""
+    return f"""
+        SELECT
+            s.window_end,
+            s.icao24,
+            s.snapshot_ts,
+            am.Description,
+            am.WTC,
+            CAST(floor(s.baro_altitude / {ALTITUDE_BAND_METERS}) AS INTEGER) AS altitude_band,
+            s.velocity,
+            s.vertical_rate,
+            CASE
+                WHEN s.velocity > 0 AND s.baro_altitude > 0 THEN abs(s.vertical_rate) / s.velocity
+            END AS climb_rate_ratio
+        FROM aircraft_states s
+        LEFT JOIN airframe_model am ON s.icao24 = am.icao24
+        WHERE s.baro_altitude IS NOT NULL AND NOT s.on_ground AND {where}
+    """
+
+
+def ensure_peer_tables(con) -> None:
+    stats = ", ".join(f"{m}_median DOUBLE, {m}_mad DOUBLE" for m in PEER_METRICS)
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS peer_baselines (
+            Description VARCHAR,
+            WTC VARCHAR,
+            altitude_band INTEGER,
+            is_fallback BOOLEAN,
+            n BIGINT,
+            {stats},
+            computed_at TIMESTAMP
+        );
+        """
+    )
+    z_columns = ", ".join(f"{m}_z DOUBLE" for m in PEER_METRICS)
+    con.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS peer_scores (
+            window_end TIMESTAMP,
+            icao24 VARCHAR,
+            snapshot_ts BIGINT,
+            Description VARCHAR,
+            WTC VARCHAR,
+            altitude_band INTEGER,
+            {z_columns},
+            peer_score DOUBLE,
+            is_peer_anomaly BOOLEAN
+        );
+        """
+    )
+    # Tables created before snapshot_ts was typed stored it as text
+    ensure_column_type(con, "peer_scores", "snapshot_ts", "BIGINT")
+
+
+def baselines_age(con):
+    computed_at = con.execute("SELECT MAX(computed_at) FROM peer_baselines").fetchone()[0]
+    return None if computed_at is None else datetime.now() - computed_at
+
+
+def refresh_baselines(con) -> int:
+    """
+    Recompute median/MAD per (Description, WTC, altitude band) and per band.
+
+    Both levels come from one GROUPING SETS pass over the newest windows;
+    the band-only rows (is_fallback) serve types with too few peers.
+    """
+    stats = ",\n".join(
+        f"median({m}) AS {m}_median, mad({m}) AS {m}_mad" for m in PEER_METRICS
+    )
+    recent = f"""
+        window_end IN (
+            SELECT DISTINCT window_end FROM aircraft_states
+            ORDER BY window_end DESC LIMIT {BASELINE_WINDOWS}
+        )
+    """
+    with transaction(con):
+        con.execute("DELETE FROM peer_baselines")
+        con.execute(
+            f"""
+            INSERT INTO peer_baselines
+            SELECT
+                Description,
+                WTC,
+                altitude_band,
+                grouping(Description, WTC) > 0 AS is_fallback,
+                COUNT(*) AS n,
+                {stats},
+                now() AS computed_at
+            FROM ({_observations(recent)})
+            GROUP BY GROUPING SETS ((Description, WTC, altitude_band), (altitude_band))
+            HAVING grouping(Description, WTC) > 0 OR COUNT(*) >= {MIN_GROUP_SIZE}
+            """
+        )
+    groups = con.execute("SELECT COUNT(*) FROM peer_baselines WHERE NOT is_fallback").fetchone()[0]
+    logger.info(f"Computed peer baselines for {groups} type/altitude groups")
+    return groups
+
+
+def score_peer_window(con, window_end, refresh: bool = False) -> int:
+    """
+    Score every airborne observation of a window against its peer group.
+
+    Robust z = (x - median) / max(1.4826 * MAD, PEER_MIN_SCALE) per metric;
+    peer_score is the largest |z|. Rows are scored and stored in a single
+    DuckDB statement.
+    Returns the number of flagged observations.
+    """
+    ensure_peer_tables(con)
+    age = baselines_age(con)
+    if refresh or age is None or age >= timedelta(minutes=BASELINE_REFRESH_MINUTES):
+        refresh_baselines(con)
+
+    z_columns = ",\n".join(
+        f"(o.{m} - COALESCE(g.{m}_median, f.{m}_median)) "
+        f"/ greatest(1.4826 * COALESCE(g.{m}_mad, f.{m}_mad), {PEER_MIN_SCALE[m]}) AS {m}_z"
+        for m in PEER_METRICS
+    )
+    peer_score = "greatest(" + ", ".join(f"COALESCE(abs({m}_z), 0)" for m in PEER_METRICS) + ")"
+
+    with transaction(con):
+        con.execute("DELETE FROM peer_scores WHERE window_end = ?", [window_end])
+        con.execute(
+            f"""
+            INSERT INTO peer_scores
+            SELECT
+                window_end, icao24, snapshot_ts, Description, WTC, altitude_band,
+                {", ".join(f"{m}_z" for m in PEER_METRICS)},
+                {peer_score} AS peer_score,
+                {peer_score} > {PEER_Z_THRESHOLD} AS is_peer_anomaly
+            FROM (
+                SELECT o.*, {z_columns}
+                FROM ({_observations("s.window_end = $window_end")}) o
+                LEFT JOIN peer_baselines g
+                    ON NOT g.is_fallback
+                    AND g.Description IS NOT DISTINCT FROM o.Description
+                    AND g.WTC IS NOT DISTINCT FROM o.WTC
+                    AND g.altitude_band = o.altitude_band
+                LEFT JOIN peer_baselines f
+                    ON f.is_fallback AND f.altitude_band = o.altitude_band
+            )
+            """,
+            {"window_end": window_end},
+        )
+
+    scored, flagged = con.execute(
+        "SELECT COUNT(*), COUNT(*) FILTER (is_peer_anomaly) FROM peer_scores WHERE window_end = ?",
+        [window_end],
+    ).fetchone()
+    logger.info(f"Peer-group scoring: {flagged} of {scored} observations flagged")
+    return flagged
+
+
+def main():
+    with get_session().writer() as con:
+        window_end = con.execute("SELECT MAX(window_end) FROM aircraft_states").fetchone()[0]
+        if window_end is None:
+            logger.warning("No data found in aircraft_states table.")
+            return
+        score_peer_window(con, window_end, refresh=True)
+
+
+if __name__ == "__main__":
+    main()
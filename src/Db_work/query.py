@@ -0,0 +1,122 @@
+import logging
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+
+# Get absolute paths based on script location
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+
+# Add project root to sys.path to allow importing from src
+sys.path.append(str(PROJECT_ROOT))
+
+from src.Db_work.load import S3_PREFIX_DATA, WINDOW_KEY_RE, list_window_objects
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_ROWS = 100_000
+
+# Columns that come from airframe_model rather than aircraft_states
+MODEL_COLUMNS = {
+    "registration", "model", "typecode", "icaoaircrafttype", "operator", "operatoricao",
+    "Designator", "ModelFullName", "AircraftDescription", "Description", "WTC",
+}
+
+
+def window_files(start: datetime, end: datetime) -> list:
+    """
+    Raw window files whose window_end lies in [start, end].
+
+    Only the date=YYYY/MM/DD partitions of the range are listed, and files
+    are then pruned by the window timestamp in their name.
+    """
+    days = (end.date() - start.date()).days
+    prefixes = [
+        f"{S3_PREFIX_DATA}/date={(start + timedelta(days=i)).strftime('%Y/%m/%d')}/"
+        for i in range(days + 1)
+    ]
+    paths = []
+    for obj in list_window_objects(prefixes):
+        match = WINDOW_KEY_RE.search(obj["key"])
+        if match is None or match.group(1) != "raw":
+            continue
+        window_end = datetime.strptime(match.group(2), "%Y%m%dT%H%M%S")
+        if start <= window_end <= end:
+            paths.append(obj["path"])
+    return paths
+
+
+def build_query(source: str, start: datetime, end: datetime, columns: Optional[Sequence[str]] = None,
+                icao24: Optional[Sequence[str]] = None, countries: Optional[Sequence[str]] = None,
+                types: Optional[Sequence[str]] = None) -> tuple:
+    """
+    SQL and parameters for states in a time range.
+
+    `source` is a table name or a read_parquet(...) expression. Filters are
+    plain predicates on the scan so DuckDB pushes them into the Parquet
+    reader; airframe_model is only joined when a type filter or one of its
+    columns is requested.
+    """
+    columns = list(columns) if columns else None
+    needs_model = bool(types) or bool(columns and MODEL_COLUMNS.intersection(columns))
+
+    if columns is None:
+        select = "s.*" + (", am.* EXCLUDE (icao24)" if needs_model else "")
+    else:
+        select = ", ".join(f"am.{c}" if c in MODEL_COLUMNS else f"s.{c}" for c in columns)
+
+    clauses = ["s.window_end BETWEEN ? AND ?"]
+    params = [start, end]
+    if icao24:
+        clauses.append("s.icao24 IN (SELECT unnest(?))")
+        params.append([i.lower() for i in icao24])
+    if countries:
+        clauses.append("s.origin_country IN (SELECT unnest(?))")
+        params.append(list(countries))
+    if types:
+        # ICAO type designators (B738) or descriptions (L2J)
+        clauses.append("(am.Designator IN (SELECT unnest(?)) OR am.Description IN (SELECT unnest(?)))")
+        params.extend([[t.upper() for t in types]] * 2)
+
+    join = "LEFT JOIN airframe_model am ON s.icao24 = am.icao24" if needs_model else ""
+    sql = f"SELECT {select} FROM {source} s {join} WHERE {' AND '.join(clauses)}"
+    return sql, params
+
+
+def query_batches(con, start: datetime, end: datetime, columns: Optional[Sequence[str]] = None,
+                  icao24: Optional[Sequence[str]] = None, countries: Optional[Sequence[str]] = None,
+                  types: Optional[Sequence[str]] = None, from_parquet: bool = False,
+                  batch_rows: int = DEFAULT_BATCH_ROWS) -> pa.RecordBatchReader:
+    """
+    Stream aircraft states with window_end in [start, end] as Arrow record batches.
+
+    Reads the warehouse `aircraft_states` table, or with `from_parquet` the
+    window files in S3 / WINDOW_SOURCE_DIR directly (the connection needs
+    httpfs loaded for S3). Nothing is materialized beyond one batch.
+    """
+    if from_parquet:
+        paths = window_files(start, end)
+        logger.info(f"Reading {len(paths)} window files between {start} and {end}")
+        if not paths:
+            return pa.RecordBatchReader.from_batches(pa.schema([]), [])
+        source = "read_parquet(?, union_by_name=true)"
+        sql, params = build_query(source, start, end, columns, icao24, countries, types)
+        params = [paths] + params
+    else:
+        sql, params = build_query("aircraft_states", start, end, columns, icao24, countries, types)
+    return con.execute(sql, params).fetch_record_batch(batch_rows)
+
+
+def query_frames(con, start: datetime, end: datetime, **kwargs) -> Iterator[pd.DataFrame]:
+    """Same as query_batches, as a generator of DataFrames."""
+    for batch in query_batches(con, start, end, **kwargs):
+        yield batch.to_pandas()
+
+
+def query_range(con, start: datetime, end: datetime, **kwargs) -> pd.DataFrame:
+    """Same as query_batches, collected into one DataFrame (for small ranges)."""
+    return query_batches(con, start, end, **kwargs).read_pandas()
@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+
+S3_BUCKET = "xxe9ff-dp3"
+
+# Local Parquet copies, used when the DuckDB tables are missing but the
+# source files have not changed (e.g. after deleting air_ops.duckdb)
+CACHE_DIR = Path(os.environ.get("REFERENCE_CACHE_DIR", PROJECT_ROOT / "reference_cache"))
+
+# Read the CSVs from a local directory instead of S3 when set
+REFERENCE_DATA_DIR = os.environ.get("REFERENCE_DATA_DIR")
+
+# Each table has an explicit typed schema, so it never depends on what the
+# CSV sniffer guesses for a given release. Values are read as text and cast
+# (empty or malformed values become NULL); declared columns missing from a
+# release are added as typed NULLs, and undeclared ones are kept as VARCHAR.
+# Join keys are normalised and the tables are stored sorted on them.
+REFERENCE_TABLES = {
+    "airframes": {
+        "key": "data/aircraftDatabase.csv",
+        "columns": {
+            "icao24": "VARCHAR",
+            "registration": "VARCHAR",
+            "manufacturericao": "VARCHAR",
+            "manufacturername": "VARCHAR",
+            "model": "VARCHAR",
+            "typecode": "VARCHAR",
+            "serialnumber": "VARCHAR",
+            "linenumber": "VARCHAR",
+            "icaoaircrafttype": "VARCHAR",
+            "operator": "VARCHAR",
+            "operatorcallsign": "VARCHAR",
+            "operatoricao": "VARCHAR",
+            "operatoriata": "VARCHAR",
+            "owner": "VARCHAR",
+            "testreg": "VARCHAR",
+            "registered": "DATE",
+            "reguntil": "DATE",
+            "status": "VARCHAR",
+            "built": "DATE",
+            "firstflightdate": "DATE",
+            "seatconfiguration": "VARCHAR",
+            "engines": "VARCHAR",
+            "modes": "BOOLEAN",
+            "adsb": "BOOLEAN",
+            "acars": "BOOLEAN",
+            "notes": "VARCHAR",
+            "categoryDescription": "VARCHAR",
+        },
+        "normalize": {
+            "icao24": "lower(trim(icao24))",
+            "typecode": "upper(trim(typecode))",
+            "icaoaircrafttype": "upper(trim(icaoaircrafttype))",
+        },
+        "sort": "icao24",
+    },
+    "model_database": {
+        "key": "data/doc8643AircraftTypes.csv",
+        "columns": {
+            "ModelFullName": "VARCHAR",
+            "Description": "VARCHAR",
+            "WTC": "VARCHAR",
+            "WTG": "VARCHAR",
+            "Designator": "VARCHAR",
+            "ManufacturerCode": "VARCHAR",
+            "AircraftDescription": "VARCHAR",
+            # Mostly 1-8, but "C" (coupled engines) occurs
+            "EngineCount": "VARCHAR",
+            "EngineType": "VARCHAR",
+        },
+        "normalize": {
+            "Designator": "upper(trim(Designator))",
+        },
+        "sort": "Designator",
+    },
+}
+
+# Bump when a schema above changes, so cached tables are rebuilt
+SCHEMA_VERSION = 2
+
+
+def ensure_cache_table(con) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reference_cache (
+            table_name VARCHAR PRIMARY KEY,
+            source VARCHAR,
+            etag VARCHAR,
+            last_modified VARCHAR,
+            row_count BIGINT,
+            loaded_at TIMESTAMP
+        );
+        """
+    )
+    con.execute("ALTER TABLE reference_cache ADD COLUMN IF NOT EXISTS schema_version INTEGER")
+
+
+def source_version(s3, key: str) -> tuple:
+    """(path, etag, last_modified) of a reference file, from S3 HEAD or the local file."""
+    if REFERENCE_DATA_DIR:
+        path = Path(REFERENCE_DATA_DIR) / Path(key).name
+        stat = path.stat()
+        return str(path), f"{stat.st_mtime_ns}-{stat.st_size}", str(stat.st_mtime)
+    head = s3.head_object(Bucket=S3_BUCKET, Key=key)
+    return f"s3://{S3_BUCKET}/{key}", head["ETag"].strip('"'), str(head["LastModified"])
+
+
+def _table_exists(con, table: str) -> bool:
+    return con.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table]
+    ).fetchone()[0] > 0
+
+
+def _build_from_csv(con, table: str, spec: dict, path: str) -> None:
+    source = "read_csv(?, header=true, all_varchar=true)"
+    file_columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}", [path]).fetchall()]
+    select = []
+    missing = [col for col in spec["columns"] if col not in file_columns]
+    if missing:
+        logger.warning(f"{path} has no {', '.join(missing)} column(s); they will be NULL in {table}")
+    for col, col_type in spec["columns"].items():
+        if col in missing:
+            select.append(f'CAST(NULL AS {col_type}) AS "{col}"')
+        elif col in spec["normalize"]:
+            select.append(f'{spec["normalize"][col]} AS "{col}"')
+        elif col_type == "VARCHAR":
+            select.append(f'"{col}"')
+        else:
+            select.append(f'TRY_CAST(NULLIF(trim("{col}"), \'\') AS {col_type}) AS "{col}"')
+    extra = [col for col in file_columns if col not in spec["columns"]]
+    if extra:
+        logger.info(f"Keeping undeclared columns of {path} as VARCHAR: {', '.join(extra)}")
+        select.extend(f'"{col}"' for col in extra)
+
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE {table} AS
+        SELECT {", ".join(select)}
+        FROM {source}
+        ORDER BY {spec['sort']};
+        """,
+        [path],
+    )
+
+
+def build_airframe_model(con) -> None:
+    """
+    Materialize `airframe_model`: exactly one row per icao24 with its model data.
+
+    Precedence, so enrichment can use a single equi-join on icao24:
+      1. one airframes row per icao24, preferring rows that have a typecode
+         (then the smallest registration, for determinism);
+      2. the model row whose Designator equals the airframe's typecode;
+      3. otherwise the model row whose Designator equals icaoaircrafttype;
+      4. ties between model rows sharing a Designator go to the first
+         ModelFullName alphabetically.
+    `model_match` records which rule matched (NULL if none did).
+    """
+    con.execute(
+        """
+        CREATE OR REPLACE TABLE airframe_model AS
+        WITH af AS (
+            SELECT *
+            FROM airframes
+            WHERE icao24 IS NOT NULL
+            QUALIFY row_number() OVER (
+                PARTITION BY icao24
+                ORDER BY typecode IS NULL, registration
+            ) = 1
+        ),
+        candidates AS (
+            SELECT af.icao24, md.*, 1 AS match_rank, 'typecode' AS model_match
+            FROM af JOIN model_database md ON af.typecode = md.Designator
+            UNION ALL
+            SELECT af.icao24, md.*, 2 AS match_rank, 'icaoaircrafttype' AS model_match
+            FROM af JOIN model_database md ON af.icaoaircrafttype = md.Designator
+        ),
+        best AS (
+            SELECT *
+            FROM candidates
+            QUALIFY row_number() OVER (
+                PARTITION BY icao24
+                ORDER BY match_rank, ModelFullName
+            ) = 1
+        )
+        SELECT
+            af.icao24,
+            af.registration,
+            af.model,
+            af.typecode,
+            af.icaoaircrafttype,
+            af.operator,
+            af.operatoricao,
+            best.Designator,
+            best.ModelFullName,
+            best.AircraftDescription,
+            best.Description,
+            best.WTC,
+            best.model_match
+        FROM af
+        LEFT JOIN best ON af.icao24 = best.icao24
+        ORDER BY af.icao24
+        """
+    )
+    row_count, matched = con.execute(
+        "SELECT COUNT(*), COUNT(Designator) FROM airframe_model"
+    ).fetchone()
+    logger.info(f"created airframe_model table: {row_count:,} airframes, {matched:,} with model data")
+
+
+def refresh_reference_data(con, s3) -> dict:
+    """
+    Make sure `airframes` and `model_database` match their source files.
+
+    Tables are only rebuilt from CSV when the source ETag/Last-Modified
+    changed, and `airframe_model` only when either of them was rebuilt.
+    Returns {table: "hit" | "parquet" | "miss" | "stale"}.
+    """
+    ensure_cache_table(con)
+    outcome = {}
+    for table, spec in REFERENCE_TABLES.items():
+        cached = con.execute(
+            "SELECT etag, last_modified, schema_version FROM reference_cache WHERE table_name = ?", [table]
+        ).fetchone()
+        try:
+            path, etag, last_modified = source_version(s3, spec["key"])
+        except Exception as e:
+            if _table_exists(con, table):
+                logger.warning(f"Could not check {spec['key']} ({e}); reusing existing {table} table")
+                outcome[table] = "stale"
+                continue
+            raise
+
+        parquet_copy = CACHE_DIR / f"{table}.parquet"
+        version_file = CACHE_DIR / f"{table}.json"
+        version = (etag, last_modified, SCHEMA_VERSION)
+        if cached == version and _table_exists(con, table):
+            logger.info(f"Reference cache hit: {table} is up to date with {path}")
+            outcome[table] = "hit"
+            continue
+        if parquet_copy.exists() and version_file.exists() and \
+                tuple(json.loads(version_file.read_text())) == version:
+            con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM read_parquet('{parquet_copy}')")
+            logger.info(f"Reference cache hit: restored {table} from {parquet_copy}")
+            outcome[table] = "parquet"
+        else:
+            logger.info(f"Reference cache miss: rebuilding {table} from {path}")
+            _build_from_csv(con, table, spec, path)
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            con.execute(f"COPY {table} TO '{parquet_copy}' (FORMAT parquet, COMPRESSION zstd)")
+            version_file.write_text(json.dumps(list(version)))
+            outcome[table] = "miss"
+
+        row_count = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        con.execute(
+            """
+            INSERT OR REPLACE INTO reference_cache
+                (table_name, source, etag, last_modified, row_count, loaded_at, schema_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [table, path, etag, last_modified, row_count, datetime.now(), SCHEMA_VERSION],
+        )
+        logger.info(f"created {table} table with {row_count:,} rows")
+
+    if any(state in ("miss", "parquet") for state in outcome.values()) or not _table_exists(con, "airframe_model"):
+        build_airframe_model(con)
+    else:
+        logger.info("airframe_model is up to date")
+    return outcome
@@ -0,0 +1,172 @@
+import atexit
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+# Get absolute paths based on script location
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+
+DB_FILE = str(PROJECT_ROOT / "air_ops.duckdb")
+
+# Connection settings, applied once per session
+DUCKDB_THREADS = int(os.environ.get("DUCKDB_THREADS", os.cpu_count() or 4))
+# Unset keeps DuckDB's own default (80% of system memory)
+DUCKDB_MEMORY_LIMIT = os.environ.get("DUCKDB_MEMORY_LIMIT") or None
+S3_REGION = "us-east-1"
+EXTENSIONS = ("httpfs",)
+
+
+class DuckDBSession:
+    """
+    One DuckDB connection per database file, shared by every pipeline stage
+    running in the process.
+
+    Settings, extensions, and the S3 region are applied once when the
+    connection opens. Readers get a cursor per thread (reused across calls,
+    safe to use concurrently); writers go through `writer()`, which holds a
+    lock so only one stage writes at a time.
+    """
+
+    def __init__(self, db_file: str = DB_FILE, read_only: bool = False,
+                 threads: int = DUCKDB_THREADS, memory_limit: Optional[str] = DUCKDB_MEMORY_LIMIT):
+        self.db_file = str(Path(db_file).resolve())
+        self.read_only = read_only
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self._con = None
+        self._open_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> duckdb.DuckDBPyConnection:
+        with self._open_lock:
+            if self._con is None:
+                config = {"threads": self.threads}
+                if self.memory_limit:
+                    config["memory_limit"] = self.memory_limit
+                self._con = duckdb.connect(self.db_file, read_only=self.read_only, config=config)
+                self._load_extensions(self._con)
+                logger.info(
+                    f"Opened {self.db_file} ({'read-only' if self.read_only else 'read-write'}, "
+                    f"threads={self.threads}, memory_limit={self.memory_limit or 'default'})"
+                )
+            return self._con
+
+    def _load_extensions(self, con) -> None:
+        for extension in EXTENSIONS:
+            try:
+                con.execute(f"INSTALL {extension}")
+                con.execute(f"LOAD {extension}")
+            except duckdb.Error as e:
+                # Local sources (WINDOW_SOURCE_DIR / REFERENCE_DATA_DIR) work without it
+                logger.warning(f"Could not load DuckDB extension {extension}: {e}")
+        if "httpfs" in EXTENSIONS:
+            try:
+                con.execute(f"SET s3_region='{S3_REGION}'")
+            except duckdb.Error:
+                pass
+
+    @contextmanager
+    def reader(self):
+        """Cursor for read queries, reused by the calling thread."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self.connection.cursor()
+            self._local.cursor = cursor
+        yield cursor
+
+    @contextmanager
+    def writer(self):
+        """
+        The connection, held exclusively by the caller for writes.
+
+        A transaction the caller left open when it raised is rolled back, so
+        a failed stage does not leave the shared connection aborted.
+        """
+        if self.read_only:
+            raise RuntimeError(f"{self.db_file} was opened read-only")
+        with self._write_lock:
+            con = self.connection
+            try:
+                yield con
+            except BaseException:
+                _rollback_quietly(con)
+                raise
+
+    @contextmanager
+    def transaction(self):
+        """The writer connection inside a transaction, committed on success."""
+        with self.writer() as con, transaction(con):
+            yield con
+
+    def close(self) -> None:
+        with self._open_lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+                self._local = threading.local()
+
+
+def _rollback_quietly(con) -> None:
+    try:
+        con.rollback()
+    except duckdb.Error:
+        # No transaction was open
+        pass
+
+
+@contextmanager
+def transaction(con):
+    """
+    BEGIN on `con`, COMMIT when the block finishes, ROLLBACK if it raises.
+
+    Every stage shares one connection per process, so a transaction left
+    open after an error would abort all later statements on it.
+    """
+    con.begin()
+    try:
+        yield con
+    except BaseException:
+        _rollback_quietly(con)
+        raise
+    con.commit()
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(db_file: str = None, read_only: bool = False) -> DuckDBSession:
+    """
+    The process-wide session for a database file.
+
+    An existing session is reused whatever mode was asked for, except that a
+    read-only session is reopened read-write when a writer needs it.
+    """
+    path = str(Path(db_file or DB_FILE).resolve())
+    with _sessions_lock:
+        session = _sessions.get(path)
+        if session is not None and session.read_only and not read_only:
+            session.close()
+            session = None
+        if session is None:
+            session = DuckDBSession(path, read_only=read_only)
+            _sessions[path] = session
+        return session
+
+
+@atexit.register
+def close_sessions() -> None:
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,133 @@
+import logging
+import math
+from typing import Dict, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Regular lat/lon grid. Cells are numbered row by row from the south-west
+# corner, so one latitude row of a bounding box is one contiguous id range.
+GRID_CELL_DEGREES = 0.5
+GRID_ROWS = int(180 / GRID_CELL_DEGREES)
+GRID_COLUMNS = int(360 / GRID_CELL_DEGREES)
+
+EARTH_RADIUS_KM = 6371.0
+
+SPATIAL_TABLE = "enriched_aircraft_states"
+
+
+def grid_cell_sql(lat: str = "latitude", lon: str = "longitude") -> str:
+    """SQL expression for the grid cell id of a position (NULL without one)."""
+    row = f"least(CAST(floor(({lat} + 90) / {GRID_CELL_DEGREES}) AS INTEGER), {GRID_ROWS - 1})"
+    col = f"least(CAST(floor(({lon} + 180) / {GRID_CELL_DEGREES}) AS INTEGER), {GRID_COLUMNS - 1})"
+    return f"({row} * {GRID_COLUMNS} + {col})"
+
+
+def _row(lat: float) -> int:
+    return min(max(int(math.floor((lat + 90) / GRID_CELL_DEGREES)), 0), GRID_ROWS - 1)
+
+
+def _col(lon: float) -> int:
+    return min(max(int(math.floor((lon + 180) / GRID_CELL_DEGREES)), 0), GRID_COLUMNS - 1)
+
+
+def cell_ranges(min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> list:
+    """
+    Inclusive (first, last) cell id ranges covering a bounding box.
+
+    A box crossing the antimeridian (min_lon > max_lon) yields two ranges
+    per latitude row.
+    """
+    if min_lon <= max_lon:
+        spans = [(_col(min_lon), _col(max_lon))]
+    else:
+        spans = [(_col(min_lon), GRID_COLUMNS - 1), (0, _col(max_lon))]
+    return [
+        (row * GRID_COLUMNS + first, row * GRID_COLUMNS + last)
+        for row in range(_row(min_lat), _row(max_lat) + 1)
+        for first, last in spans
+    ]
+
+
+def bbox_for_radius(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) of a circle."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(lat))))
+    if dlon >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    min_lon, max_lon = lon - dlon, lon + dlon
+    # Wrap around the antimeridian
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def _haversine_km_sql(lat1: str, lon1: str, lat2: str, lon2: str) -> str:
+    return (
+        f"2 * {EARTH_RADIUS_KM} * asin(sqrt("
+        f"pow(sin(radians({lat2} - {lat1}) / 2), 2) + "
+        f"cos(radians({lat1})) * cos(radians({lat2})) * pow(sin(radians({lon2} - {lon1}) / 2), 2)))"
+    )
+
+
+def _where(min_lat, min_lon, max_lat, max_lon, start, end) -> Tuple[str, list]:
+    """Cell-range filter for pruning, then the exact bounding box and time range."""
+    ranges = cell_ranges(min_lat, min_lon, max_lat, max_lon)
+    cells = " OR ".join(f"grid_cell BETWEEN {first} AND {last}" for first, last in ranges)
+    lon_filter = "longitude BETWEEN ? AND ?" if min_lon <= max_lon else "(longitude >= ? OR longitude <= ?)"
+    clauses = [f"({cells})", "latitude BETWEEN ? AND ?", lon_filter]
+    params = [min_lat, max_lat, min_lon, max_lon]
+    if start is not None:
+        clauses.append("window_end >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("window_end <= ?")
+        params.append(end)
+    return " AND ".join(clauses), params
+
+
+def query_bbox(con, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+               start=None, end=None, columns: str = "*", table: str = SPATIAL_TABLE) -> pd.DataFrame:
+    """Rows inside a bounding box, optionally limited to windows ending in [start, end]."""
+    where, params = _where(min_lat, min_lon, max_lat, max_lon, start, end)
+    return con.execute(f"SELECT {columns} FROM {table} WHERE {where}", params).fetchdf()
+
+
+def query_radius(con, lat: float, lon: float, radius_km: float, start=None, end=None,
+                 columns: str = "*", table: str = SPATIAL_TABLE) -> pd.DataFrame:
+    """Rows within `radius_km` of a point, with their `distance_km`."""
+    where, params = _where(*bbox_for_radius(lat, lon, radius_km), start, end)
+    distance = _haversine_km_sql(repr(float(lat)), repr(float(lon)), "latitude", "longitude")
+    return con.execute(
+        f"""
+        SELECT * FROM (
+            SELECT {columns}, {distance} AS distance_km
+            FROM {table}
+            WHERE {where}
+        )
+        WHERE distance_km <= ?
+        ORDER BY distance_km
+        """,
+        [*params, radius_km],
+    ).fetchdf()
+
+
+def query_near_points(con, points: Dict[str, Tuple[float, float]], radius_km: float, start=None, end=None,
+                      columns: str = "*", table: str = SPATIAL_TABLE) -> pd.DataFrame:
+    """
+    Rows within `radius_km` of any named point of interest, e.g.
+    {"Ramstein AB": (49.437, 7.600)}. Adds `poi` and `distance_km` columns.
+    """
+    frames = []
+    for name, (lat, lon) in points.items():
+        df = query_radius(con, lat, lon, radius_km, start, end, columns, table)
+        frames.append(df.assign(poi=name))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,127 @@
+import logging
+import sys
+from pathlib import Path
+
+# Get absolute paths based on script location
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+
+# Add project root to sys.path to allow importing from src
+sys.path.append(str(PROJECT_ROOT))
+
+from src.Db_work.session import get_session, transaction
+
+# Limits for physically implausible transitions between two position reports
+MAX_IMPLIED_SPEED_MS = 350.0        # faster than any civil aircraft
+MAX_SPEED_MISMATCH_MS = 150.0       # implied vs reported ground speed
+MAX_VERTICAL_SPEED_MS = 100.0       # ~20,000 ft/min
+MAX_TURN_RATE_DEG_S = 20.0          # standard rate turn is 3 deg/s
+EMERGENCY_SQUAWKS = ("7500", "7600", "7700")
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    stream=sys.stdout,
+)
+
+logger = logging.getLogger(__name__)
+
+# Consecutive position reports per aircraft, via window functions over
+# (icao24, snapshot_ts). Repeated reports of the same position fix are
+# dropped first, so dt is always the time between two distinct fixes.
+TRAJECTORY_SQL = f"""
+    WITH fixes AS (
+        SELECT
+            icao24, callsign, snapshot_ts, squawk,
+            epoch(CAST(time_position AS TIMESTAMPTZ)) AS t,
+            latitude, longitude, baro_altitude, velocity, true_track
+        FROM aircraft_states
+        WHERE window_end = $window_end
+          AND time_position IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+        QUALIFY row_number() OVER (PARTITION BY icao24, time_position ORDER BY snapshot_ts) = 1
+    ),
+    steps AS (
+        SELECT
+            *,
+            t - lag(t) OVER w AS dt,
+            lag(latitude) OVER w AS prev_latitude,
+            lag(longitude) OVER w AS prev_longitude,
+            lag(baro_altitude) OVER w AS prev_altitude,
+            lag(velocity) OVER w AS prev_velocity,
+            lag(true_track) OVER w AS prev_track,
+            lag(squawk) OVER w AS prev_squawk
+        FROM fixes
+        WINDOW w AS (PARTITION BY icao24 ORDER BY t, snapshot_ts)
+    ),
+    deltas AS (
+        SELECT
+            icao24, callsign, snapshot_ts, dt, squawk, prev_squawk,
+            2 * 6371000 * asin(sqrt(
+                pow(sin(radians(latitude - prev_latitude) / 2), 2)
+                + cos(radians(prev_latitude)) * cos(radians(latitude))
+                * pow(sin(radians(longitude - prev_longitude) / 2), 2)
+            )) / dt AS implied_speed,
+            (velocity + prev_velocity) / 2 AS reported_speed,
+            (baro_altitude - prev_altitude) / dt AS vertical_speed,
+            ((true_track - prev_track + 540) % 360 - 180) / dt AS turn_rate
+        FROM steps
+        WHERE dt > 0
+    )
+    SELECT
+        $window_end AS window_end,
+        *,
+        implied_speed > {MAX_IMPLIED_SPEED_MS} AS impossible_speed,
+        abs(implied_speed - reported_speed) > {MAX_SPEED_MISMATCH_MS} AS speed_mismatch,
+        abs(vertical_speed) > {MAX_VERTICAL_SPEED_MS} AS altitude_jump,
+        abs(turn_rate) > {MAX_TURN_RATE_DEG_S} AS sharp_turn,
+        squawk IS DISTINCT FROM prev_squawk AND squawk IN {EMERGENCY_SQUAWKS} AS emergency_squawk
+    FROM deltas
+"""
+
+FLAG_COLUMNS = ["impossible_speed", "speed_mismatch", "altitude_jump", "sharp_turn", "emergency_squawk"]
+
+
+def detect_trajectory_anomalies(con, window_end) -> int:
+    """
+    Flag implausible transitions between consecutive fixes of each aircraft.
+
+    Everything runs in DuckDB window functions over the sorted window; only
+    flagged steps are stored in `trajectory_anomalies` (replacing the
+    window's previous results). Returns the number of flagged steps.
+    """
+    any_flag = " OR ".join(f"COALESCE({c}, false)" for c in FLAG_COLUMNS)
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS trajectory_anomalies AS "
+        f"SELECT * FROM ({TRAJECTORY_SQL}) WHERE false",
+        {"window_end": window_end},
+    )
+    with transaction(con):
+        con.execute("DELETE FROM trajectory_anomalies WHERE window_end = ?", [window_end])
+        con.execute(
+            f"INSERT INTO trajectory_anomalies SELECT * FROM ({TRAJECTORY_SQL}) WHERE {any_flag}",
+            {"window_end": window_end},
+        )
+
+    counts = con.execute(
+        f"""
+        SELECT COUNT(*), {", ".join(f"COUNT(*) FILTER ({c})" for c in FLAG_COLUMNS)}
+        FROM trajectory_anomalies WHERE window_end = ?
+        """,
+        [window_end],
+    ).fetchone()
+    breakdown = ", ".join(f"{name}: {n}" for name, n in zip(FLAG_COLUMNS, counts[1:]))
+    logger.info(f"Trajectory check flagged {counts[0]} transitions ({breakdown})")
+    return counts[0]
+
+
+def main():
+    with get_session().writer() as con:
+        window_end = con.execute("SELECT MAX(window_end) FROM aircraft_states").fetchone()[0]
+        if window_end is None:
+            logger.warning("No data found in aircraft_states table.")
+            return
+        detect_trajectory_anomalies(con, window_end)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,11 @@ from pathlib import Path
 SCRIPT_DIR = Path(__file__).parent.resolve()
 PROJECT_ROOT = SCRIPT_DIR.parent.parent
 
-DB_FILE = str(PROJECT_ROOT / "air_ops.duckdb")
+# Add project root to sys.path to allow importing from src
+sys.path.append(str(PROJECT_ROOT))
+
+from src.Db_work.session import get_session, transaction
+from src.Db_work.spatial import grid_cell_sql
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,91 +22,265 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def create_enriched_aircraft_table(con: duckdb.DuckDBPyConnection):
+ENRICHED_TABLE = "enriched_aircraft_states"
+
+# Enrichment of aircraft_states; {where} limits it to the windows being (re)built.
+# airframe_icao24 / Designator only feed the join statistics and are not stored.
+ENRICH_SELECT = f"""
+    SELECT 
+        -- Operational data from aircraft_states
+        s.icao24,
+        s.origin_country,
+        s.time_position,
+        s.last_contact,
+        s.longitude,
+        s.latitude,
+        s.baro_altitude,
+        s.geo_altitude,
+        s.on_ground,
+        s.velocity,
+        s.true_track,
+        s.vertical_rate,
+        s.squawk,
+        s.spi,
+        s.snapshot_ts,
+        s.date,
+        s.window_start,
+        s.window_end,
+        
+        -- Aircraft metadata and type details, resolved once per icao24
+        am.registration,
+        am.model,
+        am.icaoaircrafttype,
+        am.operator,
+        am.operatoricao,
+        am.ModelFullName,
+        am.AircraftDescription,
+        am.Description,
+        am.WTC,
+        
+        -- Derived fields for anomaly detection
+        CASE 
+            WHEN s.velocity > 0 AND s.baro_altitude > 0 THEN 
+                ABS(s.vertical_rate) / NULLIF(s.velocity, 0) 
+            ELSE NULL 
+        END AS climb_rate_ratio,
+        
+        CASE 
+            WHEN s.baro_altitude IS NOT NULL AND s.baro_altitude > 0 THEN 
+                s.baro_altitude / 1000.0  -- Convert to km for easier analysis
+            ELSE NULL 
+        END AS altitude_km,
+
+        -- Spatial grid cell, see spatial.py
+        {grid_cell_sql("s.latitude", "s.longitude")} AS grid_cell,
+
+        am.icao24 AS airframe_icao24,
+        am.Designator
+        
+    FROM aircraft_states s
+    LEFT JOIN airframe_model am ON s.icao24 = am.icao24
+    {{where}}
+    ORDER BY s.window_end, grid_cell
+"""
+
+
+def ensure_transform_state(con: duckdb.DuckDBPyConnection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transform_state (
+            table_name VARCHAR PRIMARY KEY,
+            manifest_loaded_at TIMESTAMP,
+            reference_loaded_at TIMESTAMP,
+            updated_at TIMESTAMP
+        );
+        """
+    )
+
+
+def _has_column(con, table: str, column: str) -> bool:
+    return con.execute(
+        "SELECT COUNT(*) FROM information_schema.columns WHERE table_name = ? AND column_name = ?",
+        [table, column],
+    ).fetchone()[0] > 0
+
+
+def _last_loaded_at(con, table: str, where: str = ""):
+    """MAX(loaded_at) of a bookkeeping table, or None if it does not exist yet."""
+    if not _has_column(con, table, "loaded_at"):
+        return None
+    return con.execute(f"SELECT MAX(loaded_at) FROM {table} {where}").fetchone()[0]
+
+
+def plan_enrichment(con: duckdb.DuckDBPyConnection) -> dict:
     """
-    create table with all relevant information by joining the tables 
+    Decide what the transform has to do.
+
+    Windows are enriched incrementally: every raw window file loaded since the
+    last run (per ingest_manifest.loaded_at) marks its window_end for
+    (re)enrichment, which also picks up partition parts that arrived late.
+    Everything is rebuilt when there is no previous run, the table predates
+    the window / grid_cell columns, or the reference data (airframe_model)
+    was rebuilt.
     """
-    logger.info("Creating enriched aircraft states table...")
-    
-    con.execute("""
-        CREATE OR REPLACE TABLE enriched_aircraft_states AS
-        SELECT 
-            -- Operational data from aircraft_states
-            s.icao24,
-            s.origin_country,
-            s.time_position,
-            s.last_contact,
-            s.longitude,
-            s.latitude,
-            s.baro_altitude,
-            s.geo_altitude,
-            s.on_ground,
-            s.velocity,
-            s.true_track,
-            s.vertical_rate,
-            s.squawk,
-            s.spi,
-            s.snapshot_ts,
-            s.date,
-            
-            -- Aircraft metadata from airframes
-            af.registration,
-            af.model,
-            af.icaoaircrafttype,
-            af.operator,
-            af.operatoricao,
-            
-            -- Aircraft type details from model_database
-            md.ModelFullName,
-            md.AircraftDescription,
-            md.Description,
-            md.WTC,
-            
-            -- Derived fields for anomaly detection
-            CASE 
-                WHEN s.velocity > 0 AND s.baro_altitude > 0 THEN 
-                    ABS(s.vertical_rate) / NULLIF(s.velocity, 0) 
-                ELSE NULL 
-            END AS climb_rate_ratio,
-            
-            CASE 
-                WHEN s.baro_altitude IS NOT NULL AND s.baro_altitude > 0 THEN 
-                    s.baro_altitude / 1000.0  -- Convert to km for easier analysis
-                ELSE NULL 
-            END AS altitude_km
-            
-        FROM aircraft_states s
-        LEFT JOIN airframes af ON s.icao24 = af.icao24
-        LEFT JOIN model_database md ON (
-            af.typecode = md.Designator 
-            OR af.icaoaircrafttype = md.Designator
+    manifest_mark = _last_loaded_at(con, "ingest_manifest", "WHERE kind = 'raw'")
+    reference_mark = _last_loaded_at(con, "reference_cache")
+    state = con.execute(
+        "SELECT manifest_loaded_at, reference_loaded_at FROM transform_state WHERE table_name = ?",
+        [ENRICHED_TABLE],
+    ).fetchone()
+
+    if state is None or manifest_mark is None or not _has_column(con, ENRICHED_TABLE, "grid_cell"):
+        reason = "no previous transform"
+    elif state[1] != reference_mark:
+        reason = "reference data changed"
+    else:
+        reason = None
+    return {
+        "full": reason is not None,
+        "reason": reason,
+        "since": None if state is None else state[0],
+        "manifest_mark": manifest_mark,
+        "reference_mark": reference_mark,
+    }
+
+
+def create_enriched_aircraft_table(con: duckdb.DuckDBPyConnection) -> int:
+    """
+    Enrich new windows of aircraft_states and append them to enriched_aircraft_states.
+
+    New rows are appended ordered by (window_end, grid_cell) so per-window
+    reads only touch a few row groups; cluster_closed_days later reorders
+    finished days by cell. Join statistics are computed from the freshly enriched rows
+    in the same pass. Returns the number of rows written.
+    """
+    ensure_transform_state(con)
+    ensure_spatial_clustering(con)
+    plan = plan_enrichment(con)
+
+    if plan["full"]:
+        logger.info(f"Rebuilding {ENRICHED_TABLE} ({plan['reason']})...")
+    else:
+        con.execute(
+            """
+            CREATE OR REPLACE TEMP TABLE affected_windows AS
+            SELECT DISTINCT window_end FROM ingest_manifest
+            WHERE kind = 'raw' AND loaded_at > ? AND window_end IS NOT NULL
+            """,
+            [plan["since"]],
         )
-    """)
-    
-    result = con.execute("SELECT COUNT(*) FROM enriched_aircraft_states").fetchone()
-    logger.info(f"Created enriched_aircraft_states table with {result[0]:,} rows")
-    
-    # Log join statistics
-    stats = con.execute("""
-        SELECT 
-            COUNT(*) as total_rows,
-            COUNT(DISTINCT enriched_aircraft_states.icao24) as unique_aircraft,
-            COUNT(af.icao24) as rows_with_airframe_data,
-            COUNT(md.Designator) as rows_with_model_data
-        FROM enriched_aircraft_states
-        LEFT JOIN airframes af ON enriched_aircraft_states.icao24 = af.icao24
-        LEFT JOIN model_database md ON (
-            af.typecode = md.Designator 
-            OR af.icaoaircrafttype = md.Designator
+        window_count = con.execute("SELECT COUNT(*) FROM affected_windows").fetchone()[0]
+        if window_count == 0:
+            logger.info(f"{ENRICHED_TABLE} is up to date, no new windows")
+            return 0
+        logger.info(f"Enriching {window_count} new windows...")
+
+    # The enriched rows, the clustering marks and transform_state change together
+    with transaction(con):
+        if plan["full"]:
+            con.execute(f"CREATE OR REPLACE TEMP TABLE new_enriched AS {ENRICH_SELECT.format(where='')}")
+        else:
+            con.execute(
+                f"""
+                CREATE OR REPLACE TEMP TABLE new_enriched AS
+                {ENRICH_SELECT.format(where='WHERE s.window_end IN (SELECT window_end FROM affected_windows)')}
+                """
+            )
+
+        stats = con.execute("""
+            SELECT 
+                COUNT(*) as total_rows,
+                COUNT(DISTINCT icao24) as unique_aircraft,
+                COUNT(airframe_icao24) as rows_with_airframe_data,
+                COUNT(Designator) as rows_with_model_data
+            FROM new_enriched
+        """).fetchone()
+
+        if plan["full"]:
+            con.execute(
+                f"CREATE OR REPLACE TABLE {ENRICHED_TABLE} AS "
+                "SELECT * EXCLUDE (airframe_icao24, Designator) FROM new_enriched"
+            )
+            con.execute("DELETE FROM spatial_clustering")
+        else:
+            # Windows that got late partition parts are replaced as a whole
+            con.execute(f"DELETE FROM {ENRICHED_TABLE} WHERE window_end IN (SELECT window_end FROM affected_windows)")
+            con.execute(
+                f"INSERT INTO {ENRICHED_TABLE} BY NAME "
+                "SELECT * EXCLUDE (airframe_icao24, Designator) FROM new_enriched"
+            )
+            # Late windows of an already clustered day need that day reclustered
+            con.execute(
+                "DELETE FROM spatial_clustering "
+                "WHERE day IN (SELECT CAST(window_end AS DATE) FROM affected_windows)"
+            )
+        con.execute(
+            "INSERT OR REPLACE INTO transform_state VALUES (?, ?, ?, now())",
+            [ENRICHED_TABLE, plan["manifest_mark"], plan["reference_mark"]],
         )
-    """).fetchone()
-    
-    logger.info(f"Join statistics:")
-    logger.info(f"  - Total rows: {stats[0]:,}")
-    logger.info(f"  - Unique aircraft: {stats[1]:,}")
-    logger.info(f"  - Rows with airframe data: {stats[2]:,} ({stats[2]/stats[0]*100:.1f}%)")
-    logger.info(f"  - Rows with model data: {stats[3]:,} ({stats[3]/stats[0]*100:.1f}%)")
+        con.execute("DROP TABLE new_enriched")
+
+    logger.info(f"Wrote {stats[0]:,} rows to {ENRICHED_TABLE}")
+    if stats[0]:
+        logger.info(f"Join statistics:")
+        logger.info(f"  - Total rows: {stats[0]:,}")
+        logger.info(f"  - Unique aircraft: {stats[1]:,}")
+        logger.info(f"  - Rows with airframe data: {stats[2]:,} ({stats[2]/stats[0]*100:.1f}%)")
+        logger.info(f"  - Rows with model data: {stats[3]:,} ({stats[3]/stats[0]*100:.1f}%)")
+    return stats[0]
+
 
+def ensure_spatial_clustering(con: duckdb.DuckDBPyConnection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS spatial_clustering (
+            day DATE PRIMARY KEY,
+            row_count BIGINT,
+            clustered_at TIMESTAMP
+        );
+        """
+    )
+
+
+def cluster_closed_days(con: duckdb.DuckDBPyConnection) -> int:
+    """
+    Rewrite each finished day of enriched_aircraft_states ordered by (grid_cell, window_end).
+
+    Every day then occupies its own row groups sorted by cell, so regional
+    queries over long time ranges skip row groups on both window_end and
+    grid_cell zone maps. Returns the number of days rewritten.
+    """
+    ensure_spatial_clustering(con)
+    days = [row[0] for row in con.execute(
+        f"""
+        SELECT DISTINCT CAST(window_end AS DATE) AS day
+        FROM {ENRICHED_TABLE}
+        WHERE window_end < current_date
+          AND CAST(window_end AS DATE) NOT IN (SELECT day FROM spatial_clustering)
+        ORDER BY day
+        """
+    ).fetchall()]
+    for day in days:
+        with transaction(con):
+            con.execute(
+                f"""
+                CREATE OR REPLACE TEMP TABLE day_rows AS
+                SELECT * FROM {ENRICHED_TABLE}
+                WHERE window_end >= ? AND window_end < ? + INTERVAL 1 DAY
+                ORDER BY grid_cell, window_end
+                """,
+                [day, day],
+            )
+            con.execute(
+                f"DELETE FROM {ENRICHED_TABLE} WHERE window_end >= ? AND window_end < ? + INTERVAL 1 DAY",
+                [day, day],
+            )
+            con.execute(f"INSERT INTO {ENRICHED_TABLE} SELECT * FROM day_rows")
+            row_count = con.execute("SELECT COUNT(*) FROM day_rows").fetchone()[0]
+            con.execute("INSERT OR REPLACE INTO spatial_clustering VALUES (?, ?, now())", [day, row_count])
+            con.execute("DROP TABLE day_rows")
+        logger.info(f"Clustered {row_count:,} rows of {day} by grid cell")
+    return len(days)
 
 
 def main():
@@ -110,11 +288,14 @@ def main():
     Main function to create enriched tables.
     """
     try:
-        with duckdb.connect(DB_FILE, read_only=False) as con:
+        with get_session().writer() as con:
             logger.info("Connected to DuckDB")
             
-            # Step 1: Create enriched table with all joins
+            # Step 1: Enrich the windows loaded since the last run
             create_enriched_aircraft_table(con)
+
+            # Step 2: Order finished days by grid cell for regional queries
+            cluster_closed_days(con)
             
             logger.info("Transform complete!")
             
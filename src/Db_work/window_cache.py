@@ -0,0 +1,91 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Get absolute paths based on script location
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent.parent
+
+# Arrow IPC copies of recent windows, so a new process (e.g. the next flow
+# run) can memory-map a window instead of re-running the join
+CACHE_DIR = Path(os.environ.get("WINDOW_CACHE_DIR", PROJECT_ROOT / "window_cache"))
+KEEP_WINDOWS = 3
+
+# The window query shared by analysis and visualization
+WINDOW_QUERY = """
+    SELECT
+        s.*,
+        am.Description
+    FROM aircraft_states s
+    LEFT JOIN airframe_model am ON s.icao24 = am.icao24
+    WHERE s.window_end = ?
+"""
+
+_memory: "OrderedDict[tuple, pa.Table]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cache_key(con, window_end) -> tuple:
+    # The row count changes when a late partition part of the window is loaded
+    rows = con.execute("SELECT COUNT(*) FROM aircraft_states WHERE window_end = ?", [window_end]).fetchone()[0]
+    return window_end, rows
+
+
+def _cache_path(key: tuple) -> Path:
+    window_end, rows = key
+    return CACHE_DIR / f"window_{window_end:%Y%m%dT%H%M%S}_{rows}.arrow"
+
+
+def _write(path: Path, table: pa.Table) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    # Keep only the newest few windows on disk
+    for old in sorted(CACHE_DIR.glob("window_*.arrow"))[:-KEEP_WINDOWS]:
+        old.unlink(missing_ok=True)
+
+
+def get_window(con, window_end) -> pa.Table:
+    """
+    Arrow table of one window (states + aircraft Description).
+
+    Served from memory, then from the memory-mapped IPC file, and only
+    queried from DuckDB when neither holds the current version of the window.
+    """
+    key = _cache_key(con, window_end)
+    with _lock:
+        table = _memory.get(key)
+        if table is not None:
+            _memory.move_to_end(key)
+            logger.info(f"Window cache hit (memory): {window_end}")
+            return table
+
+        path = _cache_path(key)
+        if path.exists():
+            table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+            logger.info(f"Window cache hit (disk): {window_end}")
+        else:
+            logger.info(f"Fetching data for window_end: {window_end}")
+            table = con.execute(WINDOW_QUERY, [window_end]).fetch_arrow_table()
+            _write(path, table)
+
+        _memory[key] = table
+        while len(_memory) > KEEP_WINDOWS:
+            _memory.popitem(last=False)
+        return table
+
+
+def get_latest_window_table(con) -> tuple:
+    """(window_end, table) of the newest window, or (None, None) without data."""
+    window_end = con.execute("SELECT MAX(window_end) FROM aircraft_states").fetchone()[0]
+    if window_end is None:
+        return None, None
+    return window_end, get_window(con, window_end)
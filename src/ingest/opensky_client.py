@@ -2,6 +2,7 @@ import logging
 from typing import Dict, List, Optional
 import os
 
+import numpy as np
 import pandas as pd
 from pyopensky.rest import REST
 
@@ -22,15 +23,89 @@ def _sanitize(value):
         return value
 
 
+# Output field name -> pyopensky column name. Shared by the per-row and the
+# vectorized conversion paths so both emit the same records.
+FIELD_MAP = {
+    "icao24": "icao24",
+    "callsign": "callsign",
+    "origin_country": "origin_country",
+    "time_position": "timestamp",
+    "last_contact": "last_position",
+    "longitude": "longitude",
+    "latitude": "latitude",
+    "baro_altitude": "altitude",
+    "on_ground": "onground",
+    "velocity": "groundspeed",
+    "true_track": "track",
+    "vertical_rate": "vertical_rate",
+    "sensors": "sensors",
+    "geo_altitude": "geoaltitude",
+    "squawk": "squawk",
+    "spi": "spi",
+    "position_source": "position_source",
+}
+
+
+def _sanitize_column(series: pd.Series) -> list:
+    """Vectorized equivalent of applying _sanitize to every value of a column."""
+    valid = series.notna()
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        # An object array keeps None for missing values (a pandas object
+        # Series would turn them into NaN on assignment)
+        out = np.full(len(series), None, dtype=object)
+        if not valid.any():
+            return out.tolist()
+        stamps = series[valid]
+        tz = stamps.dt.tz
+        whole_seconds = ((stamps.dt.microsecond == 0) & (stamps.dt.nanosecond == 0)).all()
+        if whole_seconds and (tz is None or str(tz) == "UTC"):
+            # Same text as Timestamp.isoformat(), formatted by NumPy in C
+            if tz is not None:
+                stamps = stamps.dt.tz_localize(None)
+            text = np.datetime_as_string(stamps.to_numpy("datetime64[s]"), unit="s").astype(object)
+            if tz is not None:
+                text = text + "+00:00"
+        else:
+            text = stamps.map(lambda ts: ts.isoformat()).to_numpy(dtype=object)
+        out[valid.to_numpy(dtype=bool)] = text
+        return out.tolist()
+    return series.astype(object).where(valid, None).tolist()
+
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict]:
+    """Convert a pyopensky states DataFrame into producer records in one batch."""
+    missing = [None] * len(df)
+    columns = [
+        _sanitize_column(df[source]) if source in df.columns else missing
+        for source in FIELD_MAP.values()
+    ]
+    fields = list(FIELD_MAP)
+    return [dict(zip(fields, values)) for values in zip(*columns)]
+
+
+def _raise_rate_limit(response) -> None:
+    """httpx response hook: raise 429s before pyopensky's REST.get sees them."""
+    if response.status_code == 429:
+        response.raise_for_status()
+
+
 class OpenSkyClient:
     def __init__(self):
         # Initialize OpenSky client
         self.client = REST()
+        # REST.get sleeps for X-Rate-Limit-Retry-After-Seconds and retries a
+        # 429 without limit; raise it instead so the caller (PollScheduler)
+        # backs off and keeps its own cadence. Other errors keep pyopensky's retries.
+        self.client.client.event_hooks["response"].append(_raise_rate_limit)
+
+    def fetch(self, bounds=None) -> pd.DataFrame:
+        # Fetch aircraft states (optionally a (west, south, east, north) box); errors propagate
+        return self.client.states(bounds=bounds)
 
     def fetch_states(self):
         # Fetch aircraft states from OpenSky API
         try:
-            return self.client.states()
+            return self.fetch()
         except Exception as e:
             logger.error(f"Error fetching states: {e}")
             return None
@@ -40,31 +115,9 @@ class OpenSkyClient:
         df = self.fetch_states()
         if df is None:
             return []
-        # normalize rows into dicts
-        records = []
-        for _, row in df.iterrows():
-            rec = self._row_to_dict(row)
-            records.append(rec)
-        return records
+        # normalize the whole frame at once instead of row by row
+        return frame_to_records(df)
 
     def _row_to_dict(self, row) -> Dict:
-        # Convert row to dictionary
-        return {
-            "icao24": _sanitize(row.get("icao24")),
-            "callsign": _sanitize(row.get("callsign")),
-            "origin_country": _sanitize(row.get("origin_country")),
-            "time_position": _sanitize(row.get("timestamp")),
-            "last_contact": _sanitize(row.get("last_position")),
-            "longitude": _sanitize(row.get("longitude")),
-            "latitude": _sanitize(row.get("latitude")),
-            "baro_altitude": _sanitize(row.get("altitude")),
-            "on_ground": _sanitize(row.get("onground")),
-            "velocity": _sanitize(row.get("groundspeed")),
-            "true_track": _sanitize(row.get("track")),  
-            "vertical_rate": _sanitize(row.get("vertical_rate")),
-            "sensors": _sanitize(row.get("sensors")),
-            "geo_altitude": _sanitize(row.get("geoaltitude")),
-            "squawk": _sanitize(row.get("squawk")),
-            "spi": _sanitize(row.get("spi")),
-            "position_source": _sanitize(row.get("position_source")),
-        }
+        # Convert a single row to dictionary (reference path for frame_to_records)
+        return {field: _sanitize(row.get(source)) for field, source in FIELD_MAP.items()}
@@ -0,0 +1,222 @@
+"""
+Record OpenSky snapshots to segment files and replay them later.
+
+Each polled states frame is appended as one zstd-compressed Arrow record
+batch to an append-only IPC stream segment (a new segment every
+SEGMENT_SNAPSHOTS snapshots). ReplayClient reads the segments back in
+capture order and stands in for OpenSkyClient in the producer, paced in
+real time, accelerated, or as fast as possible.
+
+Usage:
+    python src/ingest/opensky_replay.py record recordings/ [--interval 10]
+    python src/ingest/opensky_replay.py info recordings/
+"""
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from opensky_client import OpenSkyClient
+
+logger = logging.getLogger(__name__)
+
+# 360 snapshots = one hour at the 10 s polling interval
+SEGMENT_SNAPSHOTS = 360
+SEGMENT_COMPRESSION = "zstd"
+
+# The columns of pyopensky's REST.states() frame, plus the poll time.
+# "sensors" is always empty for REST snapshots and is not recorded.
+SNAPSHOT_SCHEMA = pa.schema([
+    ("capture_ts", pa.int64()),
+    ("icao24", pa.string()),
+    ("callsign", pa.string()),
+    ("origin_country", pa.string()),
+    ("last_position", pa.timestamp("ns", tz="UTC")),
+    ("timestamp", pa.timestamp("ns", tz="UTC")),
+    ("longitude", pa.float64()),
+    ("latitude", pa.float64()),
+    ("altitude", pa.float64()),
+    ("onground", pa.bool_()),
+    ("groundspeed", pa.float64()),
+    ("track", pa.float64()),
+    ("vertical_rate", pa.float64()),
+    ("geoaltitude", pa.float64()),
+    ("squawk", pa.string()),
+    ("spi", pa.bool_()),
+    ("position_source", pa.int64()),
+])
+TIME_COLUMNS = ["last_position", "timestamp"]
+
+
+def snapshot_to_batch(df: pd.DataFrame, capture_ts: int) -> pa.RecordBatch:
+    """One states frame as a record batch in SNAPSHOT_SCHEMA."""
+    columns = []
+    for field in SNAPSHOT_SCHEMA:
+        if field.name == "capture_ts":
+            columns.append(pa.array([capture_ts] * len(df), pa.int64()))
+        elif field.name in df.columns:
+            columns.append(pa.array(df[field.name], from_pandas=True).cast(field.type))
+        else:
+            columns.append(pa.nulls(len(df), field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=SNAPSHOT_SCHEMA)
+
+
+class SnapshotRecorder:
+    """Append polled snapshots to compressed, columnar segment files."""
+
+    def __init__(self, directory, segment_snapshots: int = SEGMENT_SNAPSHOTS,
+                 compression: str = SEGMENT_COMPRESSION):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_snapshots = segment_snapshots
+        self.options = pa.ipc.IpcWriteOptions(compression=compression)
+        self._sink = None
+        self._writer = None
+        self._snapshots = 0
+
+    def _open_segment(self, capture_ts: int) -> None:
+        name = datetime.fromtimestamp(capture_ts, tz=timezone.utc).strftime("states_%Y%m%dT%H%M%S.arrows")
+        path = self.directory / name
+        self._sink = pa.OSFile(str(path), "wb")
+        self._writer = pa.ipc.new_stream(self._sink, SNAPSHOT_SCHEMA, options=self.options)
+        self._snapshots = 0
+        logger.info(f"Recording snapshots to {path}")
+
+    def append(self, df: pd.DataFrame, capture_ts: int) -> None:
+        if self._writer is None or self._snapshots >= self.segment_snapshots:
+            self.close()
+            self._open_segment(capture_ts)
+        self._writer.write_batch(snapshot_to_batch(df, capture_ts))
+        # Each snapshot is on disk before the next poll; a crash loses at most one
+        self._sink.flush()
+        self._snapshots += 1
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+            self._sink = None
+
+
+def read_snapshots(directory) -> Iterator[Tuple[int, pa.RecordBatch]]:
+    """Yield (capture_ts, batch) for every recorded snapshot, in capture order."""
+    for path in sorted(Path(directory).glob("states_*.arrows")):
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_stream(source)
+            while True:
+                try:
+                    batch = reader.read_next_batch()
+                except StopIteration:
+                    break
+                except (pa.ArrowInvalid, OSError) as e:
+                    # Segment cut short by a crash while recording
+                    logger.warning(f"Stopping at truncated snapshot in {path}: {e}")
+                    break
+                yield batch.column(0)[0].as_py(), batch
+
+
+class ReplayClient(OpenSkyClient):
+    """
+    Serves recorded snapshots through the OpenSkyClient interface.
+
+    `speed` sets the clock: 1 replays at the recorded pace, 10 ten times
+    faster, 0 as fast as possible. With `rebase` (the default), all times are
+    shifted so the first snapshot happens now and the replayed windows sit
+    next to live ones; without it, the recorded times (and windows) are kept.
+    """
+
+    def __init__(self, directory, speed: float = 1.0, rebase: bool = True):
+        self.directory = Path(directory)
+        self.speed = speed
+        self.rebase = rebase
+        self.snapshot_ts = None
+        self.exhausted = False
+        self._snapshots = read_snapshots(self.directory)
+        self._first_capture = None
+        self._start = None
+        self._offset = 0
+
+    def fetch_states(self):
+        try:
+            capture_ts, batch = next(self._snapshots)
+        except StopIteration:
+            self.exhausted = True
+            return None
+
+        if self._first_capture is None:
+            self._first_capture = capture_ts
+            self._start = time.time()
+            if self.rebase:
+                self._offset = int(self._start) - capture_ts
+        if self.speed:
+            due = self._start + (capture_ts - self._first_capture) / self.speed
+            time.sleep(max(0.0, due - time.time()))
+
+        self.snapshot_ts = capture_ts + self._offset
+        df = batch.to_pandas().drop(columns=["capture_ts"])
+        if self._offset:
+            for column in TIME_COLUMNS:
+                df[column] = df[column] + pd.Timedelta(seconds=self._offset)
+        return df
+
+
+def record(directory, interval: float) -> None:
+    """Poll OpenSky and record every snapshot until interrupted."""
+    client = OpenSkyClient()
+    recorder = SnapshotRecorder(directory)
+    try:
+        while True:
+            df = client.fetch_states()
+            if df is not None:
+                recorder.append(df, int(time.time()))
+                logger.info(f"Recorded {len(df)} states")
+            time.sleep(interval)
+    finally:
+        recorder.close()
+
+
+def info(directory) -> None:
+    snapshots, rows, first, last = 0, 0, None, None
+    for capture_ts, batch in read_snapshots(directory):
+        snapshots += 1
+        rows += batch.num_rows
+        first = capture_ts if first is None else first
+        last = capture_ts
+    if not snapshots:
+        print(f"No snapshots in {directory}")
+        return
+    size = sum(p.stat().st_size for p in Path(directory).glob("states_*.arrows"))
+    print(f"{snapshots} snapshots, {rows:,} states, {size / 1024 / 1024:.1f} MB")
+    print(f"{datetime.fromtimestamp(first, tz=timezone.utc)} to {datetime.fromtimestamp(last, tz=timezone.utc)}")
+
+
+def main(argv=None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        stream=sys.stdout)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="poll OpenSky and record snapshots")
+    record_parser.add_argument("directory")
+    record_parser.add_argument("--interval", type=float, default=10.0, help="seconds between polls (default: 10)")
+    info_parser = commands.add_parser("info", help="summarize a recording")
+    info_parser.add_argument("directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.directory, args.interval)
+    else:
+        info(args.directory)
+
+
+if __name__ == "__main__":
+    main()
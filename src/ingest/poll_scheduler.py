@@ -0,0 +1,173 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import httpx
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Anonymous OpenSky data has a 10 s resolution (5 s for registered users)
+DEFAULT_INTERVAL_SECONDS = 10.0
+# After a 429 the interval grows up to this, and shrinks back after a run of
+# successful polls
+MAX_INTERVAL_SECONDS = 120.0
+RECOVER_AFTER_POLLS = 30
+MAX_BACKOFF_SECONDS = 600.0
+
+RATE_LIMIT_HEADERS = ("X-Rate-Limit-Retry-After-Seconds", "Retry-After")
+
+
+def rate_limit_delay(exc: Exception) -> Optional[float]:
+    """Seconds to wait if `exc` is an OpenSky 429/quota response (0 if unspecified), else None."""
+    if not isinstance(exc, httpx.HTTPStatusError) or exc.response.status_code != 429:
+        return None
+    for header in RATE_LIMIT_HEADERS:
+        value = exc.response.headers.get(header)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return 0.0
+
+
+def merge_regions(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """One snapshot from per-region frames; aircraft on a shared edge are kept once."""
+    frames = [df for df in frames if df is not None and not df.empty]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    merged = pd.concat(frames, ignore_index=True)
+    return (
+        merged.sort_values("last_position", na_position="first")
+        .drop_duplicates("icao24", keep="last")
+        .reset_index(drop=True)
+    )
+
+
+class PollScheduler:
+    """
+    Fixed-rate OpenSky polling, pipelined with publishing.
+
+    A fetch thread wakes on a fixed clock (start, start + interval, ...) and
+    hands each snapshot to `snapshots()` through a small queue, so snapshot
+    N is published while N+1 is being fetched and the cadence does not drift
+    by the fetch and publish times. Ticks missed because a fetch, a backoff,
+    or a full queue ran long are skipped rather than bunched up.
+
+    `fetch(bounds)` must raise on errors. With `regions` (a list of
+    (west, south, east, north) boxes) every region is fetched concurrently
+    and the results are merged. A 429/quota response backs off (honoring the
+    Retry-After header) and doubles the interval, which recovers step by step
+    after RECOVER_AFTER_POLLS clean polls.
+    """
+
+    def __init__(self, fetch: Callable, interval: float = DEFAULT_INTERVAL_SECONDS, regions: list = None,
+                 max_interval: float = MAX_INTERVAL_SECONDS, queue_size: int = 2):
+        self.fetch = fetch
+        self.base_interval = interval
+        self.interval = interval
+        self.max_interval = max(max_interval, interval)
+        self.regions = regions or [None]
+        self.stats = {"polls": 0, "failed": 0, "rate_limited": 0, "skipped_ticks": 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._clean_polls = 0
+        self._backoff = 0.0
+        self._pool = ThreadPoolExecutor(max_workers=len(self.regions), thread_name_prefix="opensky-fetch")
+        self._thread = threading.Thread(target=self._run, name="opensky-poll", daemon=True)
+
+    def _fetch_snapshot(self) -> Tuple[Optional[pd.DataFrame], Optional[float]]:
+        """Fetch every region; returns (merged frame, rate-limit delay or None)."""
+        futures = [self._pool.submit(self.fetch, bounds) for bounds in self.regions]
+        frames, delay = [], None
+        for bounds, future in zip(self.regions, futures):
+            try:
+                frames.append(future.result())
+            except Exception as e:
+                region_delay = rate_limit_delay(e)
+                if region_delay is not None:
+                    delay = max(delay or 0.0, region_delay)
+                label = "" if bounds is None else f" for region {bounds}"
+                logger.error(f"Error fetching states{label}: {e}")
+        return merge_regions(frames), delay
+
+    def _on_rate_limit(self, delay: float) -> float:
+        self.stats["rate_limited"] += 1
+        self._clean_polls = 0
+        self.interval = min(self.interval * 2, self.max_interval)
+        self._backoff = min(max(self._backoff * 2, self.interval), MAX_BACKOFF_SECONDS)
+        wait = max(delay, self._backoff)
+        logger.warning(f"Rate limited by OpenSky, waiting {wait:.0f}s; polling every {self.interval:.0f}s")
+        return wait
+
+    def _on_success(self) -> None:
+        self._backoff = 0.0
+        self._clean_polls += 1
+        if self.interval > self.base_interval and self._clean_polls >= RECOVER_AFTER_POLLS:
+            self.interval = max(self.interval / 2, self.base_interval)
+            self._clean_polls = 0
+            logger.info(f"No rate limiting for a while, polling every {self.interval:.0f}s")
+
+    def _run(self) -> None:
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            snapshot_ts = int(time.time())
+            df, delay = self._fetch_snapshot()
+            self.stats["polls"] += 1
+
+            wait = 0.0
+            if delay is not None:
+                wait = self._on_rate_limit(delay)
+            elif df is None:
+                self.stats["failed"] += 1
+            else:
+                self._on_success()
+
+            if df is not None:
+                # Blocks while the publisher is behind; the missed ticks are skipped below
+                while not self._stop.is_set():
+                    try:
+                        self._queue.put((snapshot_ts, df), timeout=1.0)
+                        break
+                    except queue.Full:
+                        continue
+
+            # Next tick on the fixed clock, skipping ticks already in the past
+            now = time.monotonic()
+            next_tick += self.interval
+            earliest = now + wait
+            if next_tick < earliest:
+                missed = int((earliest - next_tick) // self.interval) + 1
+                next_tick += missed * self.interval
+                if not wait:
+                    self.stats["skipped_ticks"] += missed
+            self._stop.wait(next_tick - time.monotonic())
+
+        self._queue.put(None)
+
+    def snapshots(self) -> Iterator[Tuple[int, pd.DataFrame]]:
+        """Yield (snapshot_ts, states frame) as snapshots arrive, until stop()."""
+        if not self._thread.is_alive():
+            self._thread.start()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            yield item
+
+    def stop(self) -> None:
+        self._stop.set()
+        # Unblock a fetch thread waiting on a full queue
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._thread.join(timeout=30)
+        self._pool.shutdown(wait=False)
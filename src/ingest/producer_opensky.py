@@ -1,10 +1,13 @@
-import json
+import argparse
 import time
 import kafka
 from kafka import KafkaProducer
 import logging
 import sys
-from opensky_client import OpenSkyClient
+from opensky_client import OpenSkyClient, frame_to_records
+from opensky_replay import ReplayClient, SnapshotRecorder
+from poll_scheduler import PollScheduler
+from state_codec import ENCODINGS, KEYFRAME_SNAPSHOTS, DeltaEncoder, encode_state
 
 logging.basicConfig(
     level=logging.INFO,
@@ -12,31 +15,172 @@ logging.basicConfig(
     stream=sys.stdout)
 logger = logging.getLogger(__name__)
 
+TOPIC = "aircraft_states_raw"
+POLL_INTERVAL_SECONDS = 10
 
 # Use the externally exposed Redpanda listener ports from docker-compose.
 # Each broker exposes a different port on localhost.
-producer = KafkaProducer(
-    bootstrap_servers=[
-        "localhost:19092",
-        "localhost:29092",
-        "localhost:39092",
-    ],
-    value_serializer=lambda v: json.dumps(v).encode('utf-8')
-)
+BOOTSTRAP_SERVERS = [
+    "localhost:19092",
+    "localhost:29092",
+    "localhost:39092",
+]
+
+# Batching defaults: a whole snapshot (~10k states) goes out in a handful of
+# compressed batches instead of thousands of tiny requests.
+DEFAULT_LINGER_MS = 50
+DEFAULT_BATCH_SIZE = 1024 * 1024  # 1 MB
+DEFAULT_COMPRESSION = "lz4"
+
+
+def create_producer(encoding="json", compression=DEFAULT_COMPRESSION,
+                    linger_ms=DEFAULT_LINGER_MS, batch_size=DEFAULT_BATCH_SIZE):
+    """Create a KafkaProducer configured for batched, compressed publishing."""
+    return KafkaProducer(
+        bootstrap_servers=BOOTSTRAP_SERVERS,
+        key_serializer=lambda k: k.encode('utf-8') if k is not None else None,
+        value_serializer=lambda v: encode_state(v, encoding),
+        compression_type=compression,
+        linger_ms=linger_ms,
+        batch_size=batch_size,
+    )
+
+
+def publish_snapshot(producer, states, snapshot_ts, delta: DeltaEncoder = None) -> dict:
+    """
+    Send every state of one snapshot, flush, and return delivery statistics.
+
+    Records are keyed by icao24 so an aircraft always maps to the same
+    partition and consumers can window it independently. Delivery is tracked
+    with callbacks and summarised once per snapshot rather than logging each
+    record. With a DeltaEncoder, each record is sent as a keyframe or as the
+    fields that changed since the aircraft's previous record; an aircraft
+    whose record fails to send gets a keyframe next.
+    """
+    stats = {"sent": 0, "failed": 0, "bytes": 0, "error": None}
+
+    def on_success(metadata):
+        stats["sent"] += 1
+        stats["bytes"] += max(metadata.serialized_value_size, 0)
+
+    def on_error(exc):
+        stats["failed"] += 1
+        stats["error"] = exc
+
+    for state in states:
+        state['snapshot_ts'] = snapshot_ts
+        key = state.get('icao24')
+        value = state if delta is None else delta.encode(state)
+        try:
+            future = producer.send(TOPIC, key=key, value=value)
+        except Exception:
+            if delta is not None:
+                delta.invalidate(key)
+            raise
+        future.add_callback(on_success).add_errback(on_error)
+        if delta is not None:
+            future.add_errback(lambda exc, key=key: delta.invalidate(key))
+    producer.flush()
+    return stats
 
-# Fetches aircraft states from OpenSky API and sends them to Kafka
 
-def main():
-    client = OpenSkyClient()
+def parse_region(text):
+    """'west,south,east,north' -> bounds tuple for REST.states()."""
+    try:
+        west, south, east, north = (float(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected west,south,east,north, got '{text}'")
+    return west, south, east, north
+
+
+def replay_snapshots(client):
+    """(snapshot_ts, frame) pairs from a ReplayClient, which paces itself."""
     while True:
-        states = client.get_states_dict()
-        logger.info(f"Fetched {len(states)} states from OpenSky API")
-        snapshot_ts = int(time.time())
-        for state in states:
-            state['snapshot_ts'] = snapshot_ts
-            producer.send("aircraft_states_raw", value=state)
-            logger.info(f"Sent state: {state}")
-        time.sleep(10)
+        df = client.fetch_states()
+        if client.exhausted:
+            logger.info("Replay finished")
+            return
+        yield client.snapshot_ts, df
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Publish OpenSky state vectors to Kafka")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="json",
+                        help="wire encoding for each state record (default: json)")
+    parser.add_argument("--compression", choices=["none", "gzip", "snappy", "lz4", "zstd"],
+                        default=DEFAULT_COMPRESSION,
+                        help=f"producer batch compression (default: {DEFAULT_COMPRESSION})")
+    parser.add_argument("--linger-ms", type=int, default=DEFAULT_LINGER_MS,
+                        help=f"time to wait for a batch to fill (default: {DEFAULT_LINGER_MS})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"maximum producer batch size in bytes (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--delta", action="store_true",
+                        help="send only changed fields per aircraft, with periodic full keyframes")
+    parser.add_argument("--keyframe-every", type=int, default=KEYFRAME_SNAPSHOTS,
+                        help=f"snapshots between full records of an aircraft in --delta mode (default: {KEYFRAME_SNAPSHOTS})")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL_SECONDS,
+                        help=f"seconds between polls on a fixed-rate clock (default: {POLL_INTERVAL_SECONDS})")
+    parser.add_argument("--region", type=parse_region, action="append", metavar="W,S,E,N",
+                        help="poll this bounding box (repeat to poll several regions concurrently and merge them)")
+    parser.add_argument("--record", metavar="DIR",
+                        help="also append every fetched snapshot to segment files in DIR")
+    parser.add_argument("--replay", metavar="DIR",
+                        help="publish snapshots recorded in DIR instead of polling OpenSky")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay clock: 1 = recorded pace, 10 = ten times faster, 0 = as fast as possible")
+    parser.add_argument("--keep-timestamps", action="store_true",
+                        help="replay with the recorded times instead of shifting them to now")
+    return parser.parse_args(argv)
+
+# Fetches aircraft states from OpenSky API and sends them to Kafka
+
+def main(argv=None):
+    args = parse_args(argv)
+    producer = create_producer(
+        encoding=args.encoding,
+        compression=None if args.compression == "none" else args.compression,
+        linger_ms=args.linger_ms,
+        batch_size=args.batch_size,
+    )
+    logger.info(f"Publishing to {TOPIC} with encoding={args.encoding}, compression={args.compression}, "
+                f"linger_ms={args.linger_ms}, batch_size={args.batch_size}, delta={args.delta}")
+
+    scheduler = None
+    if args.replay:
+        client = ReplayClient(args.replay, speed=args.speed, rebase=not args.keep_timestamps)
+        logger.info(f"Replaying snapshots from {args.replay} at speed {args.speed or 'max'}")
+        snapshots = replay_snapshots(client)
+    else:
+        # Fetches run on a fixed clock in the background while we publish
+        scheduler = PollScheduler(OpenSkyClient().fetch, interval=args.interval, regions=args.region)
+        logger.info(f"Polling OpenSky every {args.interval}s"
+                    + (f" in {len(args.region)} regions" if args.region else ""))
+        snapshots = scheduler.snapshots()
+    recorder = SnapshotRecorder(args.record) if args.record else None
+    delta = DeltaEncoder(args.keyframe_every) if args.delta else None
+
+    try:
+        for snapshot_ts, df in snapshots:
+            if recorder is not None and df is not None:
+                recorder.append(df, snapshot_ts)
+
+            # normalize the whole frame at once instead of row by row
+            states = frame_to_records(df) if df is not None else []
+            logger.info(f"Fetched {len(states)} states from OpenSky API")
+            start = time.perf_counter()
+            stats = publish_snapshot(producer, states, snapshot_ts, delta)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Published {stats['sent']}/{len(states)} states for snapshot {snapshot_ts} "
+                        f"({stats['bytes']} value bytes) in {elapsed:.2f}s")
+            if stats["failed"]:
+                logger.error(f"{stats['failed']} states failed to send, last error: {stats['error']}")
+    finally:
+        if scheduler is not None:
+            scheduler.stop()
+            logger.info(f"Polling stats: {scheduler.stats}")
+        if recorder is not None:
+            recorder.close()
+        producer.flush()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,130 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+try:
+    import msgpack
+except ImportError:  # msgpack is only needed for --encoding msgpack
+    msgpack = None
+
+# Wire encodings for aircraft_states_raw values.
+# json is the original format; msgpack is a compact binary map of the same fields.
+ENCODINGS = ("json", "msgpack")
+
+# Delta mode: each aircraft gets a full record (keyframe) every
+# KEYFRAME_SNAPSHOTS records, and in between only the fields that changed.
+# A delta carries the snapshot_ts of the record it applies to under BASE_FIELD.
+KEYFRAME_SNAPSHOTS = 18
+BASE_FIELD = "_base"
+# Per-aircraft state kept on either side; the global fleet is ~15k aircraft
+MAX_TRACKED_AIRCRAFT = 200_000
+
+
+def _require_msgpack():
+    if msgpack is None:
+        raise RuntimeError("msgpack encoding requested but the msgpack package is not installed")
+
+
+def encode_state(state: Dict, encoding: str = "json") -> bytes:
+    """Serialize one state record with the given wire encoding."""
+    if encoding == "json":
+        return json.dumps(state).encode("utf-8")
+    if encoding == "msgpack":
+        _require_msgpack()
+        return msgpack.packb(state, use_bin_type=True)
+    raise ValueError(f"Unknown encoding '{encoding}', expected one of {ENCODINGS}")
+
+
+def decode_state(data: bytes) -> Dict:
+    """
+    Deserialize one state record, detecting the encoding from the first byte.
+
+    JSON records always start with '{'; msgpack maps never do, so producers
+    can switch encodings without coordinating with the consumer.
+    """
+    if data[:1] == b"{":
+        return json.loads(data)
+    _require_msgpack()
+    return msgpack.unpackb(data, raw=False)
+
+
+class DeltaEncoder:
+    """
+    Producer side of delta mode: remembers the last record sent per icao24
+    and turns each new record into a keyframe or a change-only delta.
+
+    A record becomes the base of the next delta as soon as it is encoded, so
+    the producer must call `invalidate` when its send fails; the aircraft's
+    next record is then a keyframe instead of a delta against a base the
+    consumer never received. `invalidate` may be called from the Kafka
+    client's callback thread.
+    """
+
+    def __init__(self, keyframe_snapshots: int = KEYFRAME_SNAPSHOTS, max_aircraft: int = MAX_TRACKED_AIRCRAFT):
+        self.keyframe_snapshots = keyframe_snapshots
+        self.max_aircraft = max_aircraft
+        self._last = OrderedDict()  # icao24 -> (last record, records since keyframe)
+        self._lock = threading.Lock()
+
+    def encode(self, state: Dict) -> Dict:
+        key = state.get("icao24")
+        with self._lock:
+            previous = self._last.get(key)
+            if previous is None or previous[1] + 1 >= self.keyframe_snapshots:
+                message, since_keyframe = state, 0
+            else:
+                last, since_keyframe = previous
+                message = {name: value for name, value in state.items() if name not in last or last[name] != value}
+                message["icao24"] = key
+                message[BASE_FIELD] = last.get("snapshot_ts")
+                since_keyframe += 1
+            self._last[key] = (dict(state), since_keyframe)
+            self._last.move_to_end(key)
+            if len(self._last) > self.max_aircraft:
+                self._last.popitem(last=False)
+        return message
+
+    def invalidate(self, key) -> None:
+        """Forget the aircraft's last record (its send failed): the next one is a keyframe."""
+        with self._lock:
+            self._last.pop(key, None)
+
+
+class DeltaDecoder:
+    """
+    Consumer side of delta mode: rebuilds full records from keyframes and
+    deltas. Records without BASE_FIELD (keyframes, or a producer not in
+    delta mode) pass through unchanged. A delta whose base was never seen,
+    e.g. right after a restart or rebalance, is dropped and counted in
+    `missing_base` until the aircraft's next keyframe.
+
+    `position` (e.g. the Kafka offset) is remembered for each keyframe, so
+    `keyframe_position` tells from where an aircraft's records can be
+    decoded again.
+    """
+
+    def __init__(self, max_aircraft: int = MAX_TRACKED_AIRCRAFT):
+        self.max_aircraft = max_aircraft
+        self.missing_base = 0
+        self._last = OrderedDict()  # icao24 -> (last record, position of its keyframe)
+
+    def decode(self, record: Dict, position=None) -> Optional[Dict]:
+        key = record.get("icao24")
+        base_ts = record.pop(BASE_FIELD, None)
+        keyframe_at = position
+        if base_ts is not None:
+            base, keyframe_at = self._last.get(key, (None, None))
+            if base is None or base.get("snapshot_ts") != base_ts:
+                self.missing_base += 1
+                return None
+            record = {**base, **record}
+        self._last[key] = (record, keyframe_at)
+        self._last.move_to_end(key)
+        if len(self._last) > self.max_aircraft:
+            self._last.popitem(last=False)
+        return record
+
+    def keyframe_position(self, key):
+        """Position of the keyframe the aircraft's latest record was decoded from."""
+        return self._last.get(key, (None, None))[1]
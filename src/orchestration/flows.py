@@ -1,16 +1,39 @@
 import os
 import sys
+from datetime import timedelta
 from pathlib import Path
 from prefect import flow, task
+from prefect.cache_policies import NONE
+from prefect.client.schemas.objects import ConcurrencyLimitConfig, ConcurrencyLimitStrategy
+from prefect.futures import wait
+from prefect.task_runners import ThreadPoolTaskRunner
 
 # Add project root to sys.path to allow importing from src
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
 # Import functions from other modules
-from src.Db_work.load import main as load_main
+from src.Db_work.load import has_new_windows, main as load_main
+from src.Db_work.transform import main as transform_main
 from src.Db_work.analysis import main as analysis_main
-from viz.vizualization import main as visualize_main
+from src.Db_work.session import get_session
+from src.Db_work.window_cache import get_latest_window_table
+from viz.vizualization import main as visualize_main, render_anomaly_map
+
+# Results of analysis/viz for a window are reused for this long
+WINDOW_CACHE_EXPIRATION = timedelta(hours=1)
+
+
+def window_cache_key(context, parameters):
+    """Cache key for per-window tasks: task name + window_end + row count."""
+    window_end, table = parameters["window"]
+    return f"{context.task.name}-{window_end:%Y%m%dT%H%M%S}-{table.num_rows}"
+
+# Check for new window files before doing any work
+@task(name="Check for New Windows", cache_policy=NONE)
+def new_windows_task():
+    with get_session().reader() as con:
+        return has_new_windows(con)
 
 # Load Data from S3
 @task(name="Load Data from S3")
@@ -19,33 +42,82 @@ def load_data_task():
     load_main()
     print("Data load complete.")
 
+# Enrich the newly loaded windows
+@task(name="Transform Data")
+def transform_data_task():
+    print("Starting transform...")
+    transform_main()
+    print("Transform complete.")
+
+# Fetch the latest window once for analysis and visualization
+@task(name="Fetch Latest Window", cache_policy=NONE)
+def fetch_window_task():
+    with get_session().reader() as con:
+        window_end, table = get_latest_window_table(con)
+    if window_end is None:
+        print("No data found in aircraft_states table.")
+        return None
+    print(f"Fetched window {window_end} ({table.num_rows} rows).")
+    return window_end, table
+
 # Analyze Data
-@task(name="Analyze Data")
-def analyze_data_task():
+# Cached by window, so a window is never analyzed twice. Errors are raised so
+# a failed run is not cached; the next trigger analyzes the window again.
+@task(name="Analyze Data", cache_key_fn=window_cache_key,
+      cache_expiration=WINDOW_CACHE_EXPIRATION, persist_result=True)
+def analyze_data_task(window):
     print("Starting analysis...")
-    analysis_main()
+    scored = analysis_main(window, raise_errors=True)
     print("Analysis complete.")
+    return scored
 
 # Visualize Data
-@task(name="Visualize Data")
-def visualize_data_task():
+# Cached like analysis, and raises for the same reason
+@task(name="Visualize Data", cache_key_fn=window_cache_key,
+      cache_expiration=WINDOW_CACHE_EXPIRATION, persist_result=True)
+def visualize_data_task(window):
     print("Starting visualization...")
-    visualize_main()
+    visualize_main(window, raise_errors=True)
     print("Visualization complete.")
 
+# Draw the anomaly map from the analysis results
+@task(name="Render Anomaly Map", cache_policy=NONE)
+def anomaly_map_task(scored):
+    render_anomaly_map(scored)
+
 # Air Ops Pipeline
-@flow(name="Air Ops Pipeline")
+@flow(name="Air Ops Pipeline", task_runner=ThreadPoolTaskRunner(max_workers=4))
 def air_ops_pipeline():
-    # Run tasks
+    # Open the shared DuckDB session once; every task in this process
+    # reuses its connection, settings, and extensions
+    get_session().connection
+
+    # Idle ticks stop here: listing a few date partitions is all they cost
+    if not new_windows_task():
+        print("No new windows, nothing to do.")
+        return
+
     load_data_task()
-    analyze_data_task()
-    visualize_data_task()
+
+    # Enrichment, analysis, and visualization only depend on the load.
+    # Writers (transform, analysis) take turns on the session's writer lock.
+    transform = transform_data_task.submit()
+    window = fetch_window_task()
+    if window is None:
+        transform.wait()
+        return
+    analysis = analyze_data_task.submit(window)
+    visualization = visualize_data_task.submit(window)
+    anomaly_map = anomaly_map_task.submit(analysis)
+    wait([transform, analysis, visualization, anomaly_map])
 
 if __name__ == "__main__":
-    # Serve the flow with a schedule
+    # Serve the flow with a schedule. A tick that fires while the previous
+    # run is still going is cancelled; the next run picks up its windows.
     air_ops_pipeline.serve(
         name="air-ops-deployment",
         cron="*/3 * * * *", # Run every 3 minutes
+        global_limit=ConcurrencyLimitConfig(limit=1, collision_strategy=ConcurrencyLimitStrategy.CANCEL_NEW),
         tags=["air-ops", "etl"],
         description="Pipeline to load aircraft data and detect anomalies."
     )
@@ -0,0 +1,124 @@
+"""
+Run the Air Ops pipeline as soon as the consumer announces a new window.
+
+The consumer publishes a "window ready" event after each window file is
+completely uploaded (see src/streaming/window_events.py). This script waits
+for those events and starts a flow run right away, instead of waiting for the
+next cron tick in flows.py. Events that arrive while a run is going are
+batched into the next run.
+
+Usage:
+    python src/orchestration/window_trigger.py                 # aircraft_windows_ready topic
+    python src/orchestration/window_trigger.py --source file   # WINDOW_EVENTS_FILE
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add project root to sys.path to allow importing from src
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.orchestration.flows import air_ops_pipeline
+from src.streaming.window_events import WINDOW_EVENTS_TOPIC, read_file_events
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_SERVERS = [
+    "localhost:19092",
+    "localhost:29092",
+    "localhost:39092",
+]
+WINDOW_EVENTS_FILE = os.environ.get("WINDOW_EVENTS_FILE", PROJECT_ROOT / "window_events.jsonl")
+
+# A window is written as one part per partition (and per consumer); wait this
+# long after the first event so the parts of one window share a single run
+SETTLE_SECONDS = float(os.environ.get("WINDOW_TRIGGER_SETTLE_SECONDS", "2"))
+POLL_SECONDS = 1.0
+
+
+def kafka_event_source(bootstrap_servers=BOOTSTRAP_SERVERS, topic=WINDOW_EVENTS_TOPIC):
+    """Yield the list of events received in each poll of the window-ready topic."""
+    from kafka import KafkaConsumer
+
+    consumer = KafkaConsumer(
+        topic,
+        bootstrap_servers=bootstrap_servers,
+        group_id="air-ops-window-trigger",
+        auto_offset_reset="latest",
+        value_deserializer=lambda v: json.loads(v.decode("utf-8")),
+    )
+    try:
+        while True:
+            records = consumer.poll(timeout_ms=int(POLL_SECONDS * 1000))
+            yield [record.value for batch in records.values() for record in batch]
+    finally:
+        consumer.close()
+
+
+def file_event_source(path=WINDOW_EVENTS_FILE):
+    """Yield the events appended to the notification file since the last check."""
+    # Only react to events written after startup
+    position = Path(path).stat().st_size if Path(path).exists() else 0
+    while True:
+        events, position = read_file_events(path, position)
+        yield events
+        if not events:
+            time.sleep(POLL_SECONDS)
+
+
+def run_on_events(source, settle_seconds: float = SETTLE_SECONDS, max_runs: int = None) -> int:
+    """Start a flow run for every batch of window-ready events. Returns the number of runs."""
+    runs = 0
+    pending = []
+    first_seen = None
+    for events in source:
+        if events:
+            if not pending:
+                first_seen = time.monotonic()
+            pending.extend(events)
+        if not pending or time.monotonic() - first_seen < settle_seconds:
+            continue
+
+        rows = sum(event.get("rows", 0) for event in pending)
+        lag = time.time() - min(event.get("published_at", time.time()) for event in pending)
+        logger.info(f"{len(pending)} window file(s) ready ({rows} rows), first announced {lag:.1f}s ago")
+        for event in pending:
+            logger.info(f"  {event.get('uri', event.get('key'))}")
+        pending = []
+
+        air_ops_pipeline()
+        runs += 1
+        if max_runs is not None and runs >= max_runs:
+            break
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trigger the Air Ops pipeline on window-ready events.")
+    parser.add_argument("--source", choices=["kafka", "file"], default="kafka",
+                        help="where the consumer publishes window-ready events (default: kafka)")
+    parser.add_argument("--events-file", default=WINDOW_EVENTS_FILE,
+                        help="notification file for --source file")
+    args = parser.parse_args(argv)
+
+    if args.source == "kafka":
+        logger.info(f"Waiting for window-ready events on {WINDOW_EVENTS_TOPIC}...")
+        source = kafka_event_source()
+    else:
+        logger.info(f"Waiting for window-ready events in {args.events_file}...")
+        source = file_event_source(args.events_file)
+    run_on_events(source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import math
+from datetime import datetime
+from typing import Optional
+
+EARTH_RADIUS_M = 6_371_000.0
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in meters between two lat/lon points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def _update_range(summary: dict, name: str, value: Optional[float]) -> None:
+    if value is None:
+        return
+    summary[f"{name}_count"] += 1
+    summary[f"{name}_sum"] += value
+    low, high = summary[f"{name}_min"], summary[f"{name}_max"]
+    summary[f"{name}_min"] = value if low is None else min(low, value)
+    summary[f"{name}_max"] = value if high is None else max(high, value)
+
+
+def init_summary(event: dict) -> dict:
+    """Running per-aircraft window state, seeded with the first event."""
+    ts = event.get('snapshot_ts')
+    summary = {
+        "icao24": event.get('icao24'),
+        "callsign": event.get('callsign'),
+        "origin_country": event.get('origin_country'),
+        "count": 0,
+        "first_ts": ts,
+        "last_ts": ts,
+        "altitude_count": 0, "altitude_sum": 0.0, "altitude_min": None, "altitude_max": None,
+        "velocity_count": 0, "velocity_sum": 0.0, "velocity_min": None, "velocity_max": None,
+        "max_abs_vertical_rate": None,
+        "first_latitude": None, "first_longitude": None,
+        "last_latitude": None, "last_longitude": None,
+        "distance_m": 0.0,
+    }
+    return update_summary(summary, event)
+
+
+def update_summary(summary: dict, event: dict) -> dict:
+    """Fold one event into the running summary in O(1)."""
+    summary["count"] += 1
+    ts = event.get('snapshot_ts')
+    if ts is not None:
+        summary["last_ts"] = ts
+    if event.get('callsign'):
+        summary["callsign"] = event['callsign']
+
+    _update_range(summary, "altitude", event.get('baro_altitude'))
+    _update_range(summary, "velocity", event.get('velocity'))
+
+    vertical_rate = event.get('vertical_rate')
+    if vertical_rate is not None:
+        current = summary["max_abs_vertical_rate"]
+        summary["max_abs_vertical_rate"] = abs(vertical_rate) if current is None else max(current, abs(vertical_rate))
+
+    lat, lon = event.get('latitude'), event.get('longitude')
+    if lat is not None and lon is not None:
+        if summary["first_latitude"] is None:
+            summary["first_latitude"], summary["first_longitude"] = lat, lon
+        else:
+            summary["distance_m"] += haversine_m(summary["last_latitude"], summary["last_longitude"], lat, lon)
+        summary["last_latitude"], summary["last_longitude"] = lat, lon
+    return summary
+
+
+def summary_row(summary: dict, start_ms: int, end_ms: int) -> dict:
+    """Flatten a closed window's summary into one output row."""
+    row = {k: v for k, v in summary.items() if not k.endswith(("_count", "_sum"))}
+    for name in ("altitude", "velocity"):
+        n = summary[f"{name}_count"]
+        row[f"{name}_mean"] = summary[f"{name}_sum"] / n if n else None
+    row["window_start"] = datetime.fromtimestamp(start_ms / 1000)
+    row["window_end"] = datetime.fromtimestamp(end_ms / 1000)
+    return row
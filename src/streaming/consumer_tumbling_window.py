@@ -1,12 +1,28 @@
-from quixstreams import Application
+from quixstreams import Application, message_context
+from quixstreams.models.serializers import Deserializer
 from datetime import timedelta, datetime
+from pathlib import Path
 import logging
 import sys
-import time
 import boto3
 import pandas as pd
 import os
 
+# Add project root to sys.path to allow importing from src
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.ingest.state_codec import DeltaDecoder, decode_state
+from src.streaming.event_time import PartitionWatermark, snapshot_timestamp
+from src.streaming.state_dedup import StaleStateFilter
+from src.streaming.window_merge import WindowMerger
+from src.streaming.window_replay import replay_window
+from src.streaming.window_state import init_window_state, strip_offsets, update_window_state
+from src.streaming.window_store import ColumnarWindowStore
+from src.streaming.aircraft_summary import summary_row
+from src.streaming.window_sink import BackgroundUploader, FileSink, S3Sink, submit_window
+from src.streaming.window_events import FileWindowEvents, KafkaWindowEvents, make_window_event
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -14,125 +30,185 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Configuration: Maximum age of data to process (in minutes)
-MAX_DATA_AGE_MINUTES = 9
-
 S3_BUCKET = "xxe9ff-dp3"
 S3_PREFIX = "processed"
 
-s3 = boto3.client("s3", region_name="us-east-1")
+WINDOW_DURATION = timedelta(minutes=3)
+
+# Windows are assigned by each state's snapshot_ts (event time), not by when
+# the message reached Kafka. A partition's watermark trails the newest
+# snapshot_ts seen on it by the allowed lateness; a window closes once the
+# watermark passes its end, and later states for it are dropped. A backlog is
+# therefore windowed exactly like live data, however far behind it is.
+WINDOW_ALLOWED_LATENESS = timedelta(seconds=float(os.environ.get("WINDOW_ALLOWED_LATENESS_SECONDS", "10")))
+
+# What each closed window produces:
+#   raw     - every event (window_raw_*.parquet), the original behaviour
+#   summary - one row of running aggregates per aircraft (window_summary_*.parquet)
+#   both    - both files
+WINDOW_OUTPUT = os.environ.get("WINDOW_OUTPUT", "raw")
+if WINDOW_OUTPUT not in ("raw", "summary", "both"):
+    raise ValueError(f"WINDOW_OUTPUT must be raw, summary or both, got '{WINDOW_OUTPUT}'")
+WRITE_RAW = WINDOW_OUTPUT in ("raw", "both")
+WRITE_SUMMARY = WINDOW_OUTPUT in ("summary", "both")
+
+# Drop states that repeat an aircraft's previous time_position/last_contact
+# in the same window (no new message since the last poll) before they reach
+# the windows; the first state of each aircraft in a window is always kept
+DEDUP_STATES = os.environ.get("DEDUP_STATES", "1") != "0"
+
+# Raw events live in local columnar buffers/segments instead of Quix state.
+# Window state records the Kafka offsets the window was read from, so a window
+# the local store does not fully hold (after a crash or when a rebalance moved
+# the partition here) is rebuilt by re-reading those offsets.
+SPILL_DIR = Path(os.environ.get("WINDOW_SPILL_DIR", PROJECT_ROOT / "window_spill"))
+store = ColumnarWindowStore(SPILL_DIR, duration_ms=int(WINDOW_DURATION.total_seconds() * 1000))
+
+# Closed windows go to S3, or to a local directory when WINDOW_SINK_DIR is set
+# (handy for running without AWS credentials). Uploads run in the background
+# so the stream keeps consuming while a window is written.
+WINDOW_SINK_DIR = os.environ.get("WINDOW_SINK_DIR")
+if WINDOW_SINK_DIR:
+    sink = FileSink(WINDOW_SINK_DIR)
+else:
+    sink = S3Sink(boto3.client("s3", region_name="us-east-1"), S3_BUCKET)
+
+BROKER_ADDRESS = '127.0.0.1:19092'
+RAW_TOPIC = 'aircraft_states_raw'
+
+# Every finished upload is announced so the Prefect side can run on it instead
+# of polling: on the aircraft_windows_ready topic (default), as JSON lines in
+# WINDOW_EVENTS_FILE (WINDOW_EVENTS=file), or not at all (WINDOW_EVENTS=none)
+WINDOW_EVENTS = os.environ.get("WINDOW_EVENTS", "kafka")
+WINDOW_EVENTS_FILE = os.environ.get("WINDOW_EVENTS_FILE", PROJECT_ROOT / "window_events.jsonl")
+if WINDOW_EVENTS == "kafka":
+    window_events = KafkaWindowEvents(BROKER_ADDRESS)
+elif WINDOW_EVENTS == "file":
+    window_events = FileWindowEvents(WINDOW_EVENTS_FILE)
+elif WINDOW_EVENTS == "none":
+    window_events = None
+else:
+    raise ValueError(f"WINDOW_EVENTS must be kafka, file or none, got '{WINDOW_EVENTS}'")
+
+
+def publish_window_ready(key: str, rows: int, size: int):
+    """Announce a completely written window file (runs on the upload thread)."""
+    window_events.publish(make_window_event(key, sink.describe(key), rows, size))
+
+
+# Windows that cannot be uploaded are kept here (same key layout) for a later upload
+WINDOW_FAILED_DIR = Path(os.environ.get("WINDOW_FAILED_DIR", PROJECT_ROOT / "window_failed"))
+
+uploader = BackgroundUploader(
+    sink,
+    on_uploaded=publish_window_ready if window_events else None,
+    fallback=FileSink(WINDOW_FAILED_DIR),
+)
+
+
+def flush_merged_windows(topic: str, partition: int, offset: int):
+    """Emit the windows closed by this message before its offset can be committed."""
+    merger.flush(partition)
 
 # Create the Quix Application (connects to Kafka/Redpanda)
 app = Application(
-    broker_address='127.0.0.1:19092',
-    consumer_group='aircraft-tumbling-window-v6',
+    broker_address=BROKER_ADDRESS,
+    consumer_group='aircraft-tumbling-window-v9',
     auto_offset_reset='earliest',
-    producer_extra_config={
-        'message.max.bytes': 104857600,  # 100 MB
-    }
+    on_message_processed=flush_merged_windows,
 )
 
+class StateDeserializer(Deserializer):
+    """Decode aircraft states published as either JSON or msgpack."""
+
+    def __call__(self, value, ctx):
+        return decode_state(value)
+
 # Define the input topic
-aircraft_topic = app.topic('aircraft_states_raw', value_deserializer='json')
+# Messages are keyed by icao24, so each aircraft always lands in the same partition
+aircraft_topic = app.topic(
+    RAW_TOPIC,
+    key_deserializer='str',
+    value_deserializer=StateDeserializer(),
+    timestamp_extractor=snapshot_timestamp,
+)
 
 # Create a streaming dataframe
 sdf = app.dataframe(aircraft_topic)
 
-# Filter out events older than MAX_DATA_AGE_MINUTES
-# Uses snapshot_ts if available, otherwise current time
-def is_recent_enough(event):
-    """Check if event is recent enough to process."""
-    current_time = int(time.time())
-    
-    # Use snapshot_ts if available (set by producer), otherwise use current time
-    event_time = event.get('snapshot_ts', current_time)
-    
-    # Calculate age in seconds
-    age_seconds = current_time - event_time
-    age_minutes = age_seconds / 60
-    
-    # Only process if data is less than MAX_DATA_AGE_MINUTES old
-    is_recent = age_minutes < MAX_DATA_AGE_MINUTES
-    
-    # if not is_recent:
-    #     logger.warning(f"Filtering out old event: {age_minutes:.2f} minutes old")
-    
-    return is_recent
 
-sdf = sdf.filter(is_recent_enough)
+# Producers in --delta mode send only changed fields between keyframes;
+# rebuild full records here (messages of one aircraft arrive in order on its
+# partition). Deltas whose base record was missed are dropped until the next keyframe.
+delta_decoder = DeltaDecoder()
+_reported_missing = 0
+
+def expand_delta(event):
+    global _reported_missing
+    event = delta_decoder.decode(event, message_context().offset)
+    if delta_decoder.missing_base >= _reported_missing + 1000:
+        _reported_missing = delta_decoder.missing_base
+        logger.warning(f"Dropped {_reported_missing} delta records without a base so far")
+    return event
+
+sdf = sdf.apply(expand_delta).filter(lambda event: event is not None)
+
+stale_filter = StaleStateFilter(window_ms=int(WINDOW_DURATION.total_seconds() * 1000))
+
+if DEDUP_STATES:
+    sdf = sdf.filter(stale_filter.is_new)
+
+watermark = PartitionWatermark(
+    duration_ms=int(WINDOW_DURATION.total_seconds() * 1000),
+    allowed_lateness_ms=int(WINDOW_ALLOWED_LATENESS.total_seconds() * 1000),
+)
+
+def is_on_time(event, key, timestamp, headers):
+    """Advance the partition watermark and drop states whose window already closed."""
+    return watermark.accept(message_context().partition, timestamp)
+
+sdf = sdf.filter(is_on_time, metadata=True)
+
+def buffer_event(event, key, timestamp, headers):
+    """Store the raw event in the columnar window store."""
+    store.append(message_context().partition, timestamp, event)
+
+if WRITE_RAW:
+    sdf = sdf.update(buffer_event, metadata=True)
 
+# Window state only tracks small per-aircraft values, so changelog messages
+# stay tiny no matter how many events a window holds. In summary mode the
+# state is the running aggregate itself. Either way it carries the offsets
+# needed to replay the window (see src/streaming/window_state.py).
 def initializer(event):
-    return [event]
+    return init_window_state(event, message_context().offset,
+                             delta_decoder.keyframe_position(event.get('icao24')), summary=WRITE_SUMMARY)
 
 def reducer(aggregated, event):
-    # Handle legacy state (dict) from previous version
-    if isinstance(aggregated, dict):
-        logger.warning("Found legacy state (dict), resetting to list for raw events.")
-        return [event]
-    
-    # Handle corrupted state (e.g. string) or other non-list types
-    if not isinstance(aggregated, list):
-        logger.warning(f"Found invalid state type {type(aggregated)}, resetting to list.")
-        return [event]
-        
-    aggregated.append(event)
-    if len(aggregated) % 1000 == 0:
-        ts = event.get('snapshot_ts', 'unknown')
-        logger.info(f"Window currently has {len(aggregated)} events. Last event ts: {ts}")
-    return aggregated
-
-# Group by constant key to create a single global window
-# grace_ms controls how long to keep window state after it closes (for late-arriving data)
-# Set to MAX_DATA_AGE_MINUTES to ensure old windows are cleaned up
+    return update_window_state(aggregated, event, message_context().offset,
+                               delta_decoder.keyframe_position(event.get('icao24')), summary=WRITE_SUMMARY)
+
+# Window on the message key (icao24) so the work is spread across partitions
+# and consumer instances. closing_strategy="partition" closes every aircraft's
+# window in a partition at once; WindowMerger stitches them back together.
+# grace_ms is the allowed lateness, so windows close on the event-time watermark
 sdf = (
-    sdf.group_by(lambda event: "global", name="global_window")
-    .tumbling_window(
-        duration_ms=timedelta(minutes=3),
-        grace_ms=timedelta(seconds=10)  # Reduced grace period for faster results
+    sdf.tumbling_window(
+        duration_ms=WINDOW_DURATION,
+        grace_ms=WINDOW_ALLOWED_LATENESS,
     )
     .reduce(initializer=initializer, reducer=reducer)
-    .final()
+    .final(closing_strategy="partition")
 )
 
 
-def make_s3_key(window_end_ms: int) -> str:
-    """Generate S3 key based on window end time."""
-    end_dt = datetime.fromtimestamp(window_end_ms / 1000)
-    date_path = end_dt.strftime("%Y/%m/%d")
-    timestamp = end_dt.strftime("%Y%m%dT%H%M%S")
-    return f"{S3_PREFIX}/date={date_path}/window_raw_{timestamp}.parquet"
-
-def write_window_to_s3(result):
-    """Write window result to S3 as parquet."""
+def write_window_to_s3(result, kind: str = "raw"):
+    """Queue window result (value = DataFrame of events or summaries) for upload as parquet."""
     try:
-        events = result['value']
-        start_ms = result['start']
-        end_ms = result['end']
-        
-        # Prepare data for DataFrame
-        # Convert list of dicts (events) to DataFrame
-        df = pd.DataFrame(events)
-        
-        # Add window metadata
-        df['window_start'] = datetime.fromtimestamp(start_ms / 1000)
-        df['window_end'] = datetime.fromtimestamp(end_ms / 1000)
-        
-        s3_key = make_s3_key(end_ms)
-        tmp_path = f"/tmp/{os.path.basename(s3_key)}"
-        
-        logger.info(f"Writing {len(df)} events to {tmp_path}...")
-        df.to_parquet(tmp_path, index=False)
-        
-        logger.info(f"Uploading {tmp_path} to s3://{S3_BUCKET}/{s3_key}...")
-        s3.upload_file(tmp_path, S3_BUCKET, s3_key)
-        logger.info(f"Uploaded window result to s3://{S3_BUCKET}/{s3_key}")
-        
-        # Clean up
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
-            
+        return submit_window(uploader, S3_PREFIX, result, kind)
+
     except Exception as e:
-        logger.error(f"Failed to write window to S3: {e}")
+        logger.error(f"Failed to queue window for upload: {e}")
 
 # Print results when windows close
 def print_window_result(result):
@@ -140,29 +216,78 @@ def print_window_result(result):
     start_time = datetime.fromtimestamp(result['start'] / 1000).strftime('%Y-%m-%d %H:%M:%S')
     end_time = datetime.fromtimestamp(result['end'] / 1000).strftime('%Y-%m-%d %H:%M:%S')
     
-    events = result['value']
-    if not isinstance(events, list):
-        logger.error(f"Expected list of events, got {type(events)}. Value: {events}")
-        return
-
-    count = len(events)
-    unique_aircraft = len(set(e.get('icao24') for e in events if e.get('icao24')))
+    # Each merged value is one aircraft's window state
+    count = sum(state.get('count', 0) for state in result['value'])
+    unique_aircraft = len(result['value'])
     
     print(f"{'='*60}")
-    print(f"Window:           {start_time} to {end_time}")
+    print(f"Window:           {start_time} to {end_time} (partition {result.get('partition')})")
     print(f"Total Observations: {count}")
     print(f"Unique Aircraft:  {unique_aircraft}")
     print(f"{'='*60}\n")
     
     logger.info(f"Window closed: {count} observations, {unique_aircraft} unique aircraft")
+    if DEDUP_STATES:
+        logger.info(f"Deduplication: {stale_filter.describe()}")
+    if watermark.late:
+        logger.info(f"Dropped {watermark.late} states that arrived after their window closed")
     
-    # Write to S3
-    write_window_to_s3(result)
+    if WRITE_SUMMARY:
+        summaries = pd.DataFrame([
+            summary_row(strip_offsets(state), result['start'], result['end'])
+            for state in result['value']
+        ])
+        write_window_to_s3({**result, 'value': summaries}, kind="summary")
+
+    if WRITE_RAW:
+        write_window_to_s3({**result, 'value': raw_window_events(result, count)})
+
+
+def raw_window_events(result, count: int) -> pd.DataFrame:
+    """The window's raw events from the local store, or replayed from Kafka if it is incomplete."""
+    partition, start, end = result['partition'], result['start'], result['end']
+    df = store.pop(partition, start, end)
+    if len(df) == count:
+        return df
+
+    # Rows lost in a crash, or the window started on another consumer before
+    # a rebalance: read it back from the partition. A failure here stops the
+    # consumer before the closing offset is committed, so the window is
+    # closed again after a restart rather than dropped.
+    states = result['value']
+    from_offset = min(state.get('replay_from', state.get('first_offset')) for state in states)
+    to_offset = max(state.get('last_offset') for state in states)
+    logger.warning(f"Local store holds {len(df)} of {count} events for window {start}-{end} "
+                   f"on partition {partition}; replaying offsets {from_offset}-{to_offset}")
+    df = replay_window(BROKER_ADDRESS, RAW_TOPIC, partition, start, end, from_offset, to_offset,
+                       dedup=DEDUP_STATES)
+    if len(df) != count:
+        logger.error(f"Replayed {len(df)} events for window {start}-{end} on partition {partition}, "
+                     f"expected {count}")
+    return df
+
+merger = WindowMerger(on_window=print_window_result)
+
+
+def merge_aircraft_window(result):
+    """Hand one aircraft's closed window counters to the per-partition merger."""
+    ctx = message_context()
+    merger.add(ctx.partition, result['start'], result['end'], result['value'])
 
-sdf.update(print_window_result)
+sdf.update(merge_aircraft_window)
 
 if __name__ == '__main__':
     logger.info("Starting aircraft state counter with 3-minute tumbling windows...")
-    logger.info(f"Filtering out data older than {MAX_DATA_AGE_MINUTES} minutes")
+    logger.info(f"Windowing on snapshot_ts with {WINDOW_ALLOWED_LATENESS.total_seconds():.0f}s allowed lateness")
+    logger.info(f"Window output mode: {WINDOW_OUTPUT}")
+    logger.info(f"Window ready events: {WINDOW_EVENTS}")
+    logger.info(f"Repeated state suppression: {'on' if DEDUP_STATES else 'off'}")
     logger.info("Press Ctrl+C to stop\n")
-    app.run()
\ No newline at end of file
+    app.run()
+    # Write out anything the merger is still holding on shutdown
+    merger.flush()
+    if DEDUP_STATES:
+        logger.info(f"Deduplication: {stale_filter.describe()}")
+    uploader.close()
+    if window_events is not None:
+        window_events.close()
\ No newline at end of file
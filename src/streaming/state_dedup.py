@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from typing import Dict
+
+from src.streaming.event_time import EVENT_TIME_FIELD
+
+# Last-seen timestamps kept per aircraft; the global fleet is ~15k aircraft
+MAX_TRACKED_AIRCRAFT = 200_000
+
+# OpenSky only updates these when a new ADS-B/Mode S message arrives
+TIMESTAMP_FIELDS = ("time_position", "last_contact")
+
+
+class StaleStateFilter:
+    """
+    Drop aircraft states that repeat the previous state of the same aircraft
+    within a window.
+
+    Between two polls without a new message from an aircraft, OpenSky returns
+    the same time_position and last_contact (and the same values), so the
+    record adds nothing to a window. Records are compared against the last
+    seen timestamps per icao24 in the same `window_ms` tumbling window (by
+    snapshot_ts), held in an LRU of at most `max_aircraft` entries. The first
+    state of an aircraft in every window is kept, so a parked aircraft still
+    shows up in each window; an aircraft that fell out of the LRU is simply
+    passed through once. Records without icao24 or timestamps are always kept.
+    """
+
+    def __init__(self, window_ms: int, max_aircraft: int = MAX_TRACKED_AIRCRAFT):
+        self.window_ms = window_ms
+        self.max_aircraft = max_aircraft
+        self.seen = 0
+        self.suppressed = 0
+        self._last = OrderedDict()  # icao24 -> (window start, time_position, last_contact)
+
+    def _window_start(self, event: Dict):
+        ts = event.get(EVENT_TIME_FIELD)
+        if ts is None:
+            return None
+        ts_ms = int(ts * 1000)
+        return ts_ms - ts_ms % self.window_ms
+
+    def is_new(self, event: Dict) -> bool:
+        self.seen += 1
+        key = event.get("icao24")
+        stamps = tuple(event.get(field) for field in TIMESTAMP_FIELDS)
+        if key is None or stamps == (None, None):
+            return True
+        last = (self._window_start(event),) + stamps
+        if self._last.get(key) == last:
+            self._last.move_to_end(key)
+            self.suppressed += 1
+            return False
+        self._last[key] = last
+        self._last.move_to_end(key)
+        if len(self._last) > self.max_aircraft:
+            self._last.popitem(last=False)
+        return True
+
+    def describe(self) -> str:
+        share = self.suppressed / self.seen if self.seen else 0.0
+        return f"{self.suppressed}/{self.seen} repeated states suppressed ({share:.0%})"
@@ -0,0 +1,81 @@
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Topic the consumer announces finished window files on
+WINDOW_EVENTS_TOPIC = "aircraft_windows_ready"
+
+
+def make_window_event(key: str, uri: str, rows: int, size: int) -> dict:
+    """The "window ready" event published once a window file is fully written."""
+    return {
+        "key": key,
+        "uri": uri,
+        "rows": rows,
+        "bytes": size,
+        "published_at": time.time(),
+    }
+
+
+class KafkaWindowEvents:
+    """Publish window-ready events as JSON on a Kafka topic."""
+
+    def __init__(self, bootstrap_servers, topic: str = WINDOW_EVENTS_TOPIC):
+        from kafka import KafkaProducer
+
+        self.topic = topic
+        self.producer = KafkaProducer(
+            bootstrap_servers=bootstrap_servers,
+            key_serializer=lambda k: k.encode("utf-8"),
+            value_serializer=lambda v: json.dumps(v).encode("utf-8"),
+        )
+
+    def publish(self, event: dict) -> None:
+        self.producer.send(self.topic, key=event["key"], value=event)
+        # Events are rare (one per window part), so send each one right away
+        self.producer.flush(timeout=10)
+
+    def close(self) -> None:
+        self.producer.close()
+
+
+class FileWindowEvents:
+    """Append window-ready events as JSON lines to a local notification file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def publish(self, event: dict) -> None:
+        line = json.dumps(event) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+    def close(self) -> None:
+        pass
+
+
+def read_file_events(path, position: int = 0) -> tuple:
+    """
+    Complete events appended to a notification file after `position`.
+
+    Returns (events, new_position); a trailing line still being written is
+    left for the next call.
+    """
+    path = Path(path)
+    if not path.exists():
+        return [], 0
+    if path.stat().st_size < position:
+        # The file was truncated or replaced, start over
+        position = 0
+    with open(path, "rb") as f:
+        f.seek(position)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    events = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return events, position + end
@@ -0,0 +1,37 @@
+import logging
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WindowMerger:
+    """
+    Merge per-aircraft window results into one batch per partition and window.
+
+    Windows are keyed by icao24 and closed per partition, so every aircraft
+    window of a partition expires while Quix processes a single message.
+    Results are buffered while that message runs through the dataframe and
+    handed to `on_window` by `flush`, which the consumer calls from the
+    application's on_message_processed hook: still within the processing of
+    the closing message, before its offset can be committed.
+    """
+
+    def __init__(self, on_window: Callable[[dict], None]):
+        self._on_window = on_window
+        # partition -> {(start, end): [values]}
+        self._pending: Dict[int, dict] = {}
+
+    def add(self, partition: int, start: int, end: int, value) -> None:
+        """Buffer the closed window value of one aircraft."""
+        self._pending.setdefault(partition, {}).setdefault((start, end), []).append(value)
+
+    def flush(self, partition: Optional[int] = None) -> None:
+        """Emit buffered windows for one partition, or all of them."""
+        partitions = list(self._pending) if partition is None else [partition]
+        for p in partitions:
+            windows = self._pending.pop(p, None)
+            if not windows:
+                continue
+            for (start, end), values in sorted(windows.items()):
+                logger.info(f"Merged partition {p} window ending {end}: {len(values)} aircraft")
+                self._on_window({"start": start, "end": end, "partition": p, "value": values})
@@ -0,0 +1,74 @@
+import logging
+import time
+
+import pandas as pd
+
+from src.ingest.state_codec import DeltaDecoder, decode_state
+from src.streaming.event_time import snapshot_timestamp
+from src.streaming.state_dedup import StaleStateFilter
+from src.streaming.window_store import ColumnBuffer
+
+logger = logging.getLogger(__name__)
+
+# Give up when the topic returns nothing for this long before reaching to_offset
+REPLAY_IDLE_TIMEOUT_SECONDS = 30.0
+
+
+class WindowReplayError(RuntimeError):
+    """A window could not be read back from Kafka."""
+
+
+def replay_window(bootstrap_servers, topic: str, partition: int, start: int, end: int,
+                  from_offset: int, to_offset: int, dedup: bool = True) -> pd.DataFrame:
+    """
+    Rebuild the raw events of one window by re-reading its partition.
+
+    Reads offsets from_offset..to_offset (inclusive) and runs every message
+    through the same steps as the consumer before the window (decoding,
+    delta expansion, repeated state suppression), keeping the events whose
+    snapshot time falls in [start, end). Used when the local window store
+    does not hold the whole window, e.g. after a crash or a rebalance.
+    """
+    from kafka import KafkaConsumer, TopicPartition
+
+    consumer = KafkaConsumer(
+        bootstrap_servers=bootstrap_servers,
+        group_id=None,
+        enable_auto_commit=False,
+        auto_offset_reset="earliest",
+    )
+    topic_partition = TopicPartition(topic, partition)
+    consumer.assign([topic_partition])
+    consumer.seek(topic_partition, from_offset)
+
+    decoder = DeltaDecoder()
+    stale_filter = StaleStateFilter(window_ms=end - start)
+    buffer = ColumnBuffer()
+    offset = from_offset - 1
+    idle_since = time.monotonic()
+    try:
+        while offset < to_offset:
+            batch = consumer.poll(timeout_ms=1000).get(topic_partition, [])
+            if not batch:
+                if time.monotonic() - idle_since > REPLAY_IDLE_TIMEOUT_SECONDS:
+                    raise WindowReplayError(
+                        f"Partition {partition} of {topic} stopped at offset {offset} "
+                        f"before reaching {to_offset}")
+                continue
+            idle_since = time.monotonic()
+            for message in batch:
+                offset = message.offset
+                if offset > to_offset:
+                    break
+                event = decoder.decode(decode_state(message.value), offset)
+                if event is None or (dedup and not stale_filter.is_new(event)):
+                    continue
+                timestamp = snapshot_timestamp(event, message.headers, message.timestamp, None)
+                if start <= timestamp < end:
+                    buffer.append(event)
+    finally:
+        consumer.close()
+
+    logger.info(f"Replayed {buffer.rows} events of window {start}-{end} on partition {partition} "
+                f"from offsets {from_offset}-{to_offset}")
+    return buffer.to_frame()
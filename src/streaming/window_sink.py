@@ -0,0 +1,199 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+PARQUET_COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 64_000
+
+# S3 multipart parts must be at least 5 MB (except the last one)
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def frame_to_parquet_bytes(df: pd.DataFrame, compression: str = PARQUET_COMPRESSION,
+                           row_group_size: int = ROW_GROUP_SIZE) -> pa.Buffer:
+    """Encode a DataFrame as Parquet into an in-memory Arrow buffer."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression=compression, row_group_size=row_group_size)
+    return sink.getvalue()
+
+
+def make_window_key(prefix: str, window_end_ms: int, partition=None, kind: str = "raw") -> str:
+    """Object key of a window file, by window end time (one part file per partition)."""
+    end_dt = datetime.fromtimestamp(window_end_ms / 1000)
+    date_path = end_dt.strftime("%Y/%m/%d")
+    timestamp = end_dt.strftime("%Y%m%dT%H%M%S")
+    suffix = "" if partition is None else f"_p{partition}"
+    return f"{prefix}/date={date_path}/window_{kind}_{timestamp}{suffix}.parquet"
+
+
+def submit_window(uploader, prefix: str, result: dict, kind: str = "raw") -> Future:
+    """Add the window bounds to a closed window's frame and queue it for upload."""
+    df = result['value']
+    df['window_start'] = datetime.fromtimestamp(result['start'] / 1000)
+    df['window_end'] = datetime.fromtimestamp(result['end'] / 1000)
+
+    key = make_window_key(prefix, result['end'], result.get('partition'), kind)
+    logger.info(f"Queueing {len(df)} rows for {uploader.sink.describe(key)}...")
+    return uploader.submit(key, df)
+
+
+class S3Sink:
+    """Upload in-memory Parquet buffers to S3, using multipart for large objects."""
+
+    def __init__(self, client, bucket: str, multipart_threshold: int = MULTIPART_THRESHOLD,
+                 chunk_size: int = MULTIPART_CHUNK_SIZE):
+        self.client = client
+        self.bucket = bucket
+        self.multipart_threshold = multipart_threshold
+        self.chunk_size = chunk_size
+
+    def put(self, key: str, data: pa.Buffer) -> None:
+        view = memoryview(data)
+        if len(view) < self.multipart_threshold:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=view.tobytes())
+            return
+
+        upload = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)
+        upload_id = upload["UploadId"]
+        try:
+            parts = []
+            for number, offset in enumerate(range(0, len(view), self.chunk_size), start=1):
+                part = self.client.upload_part(
+                    Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number,
+                    Body=view[offset:offset + self.chunk_size].tobytes(),
+                )
+                parts.append({"ETag": part["ETag"], "PartNumber": number})
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    def describe(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+
+class FileSink:
+    """Write Parquet buffers under a local directory, mirroring the S3 key layout."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def put(self, key: str, data: pa.Buffer) -> None:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.write(path, data)
+
+    @staticmethod
+    def write(path: Path, data: pa.Buffer) -> None:
+        # Write then rename so readers never see a half-written file
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(memoryview(data))
+        os.replace(tmp_path, path)
+
+    def describe(self, key: str) -> str:
+        return str(self.root / key)
+
+
+class BackgroundUploader:
+    """
+    Encode and upload window frames on a small thread pool.
+
+    At most `max_pending` uploads are queued or running; `submit` blocks when
+    that limit is reached so a slow sink applies backpressure instead of
+    growing memory. Failed uploads are retried with exponential backoff.
+
+    A window that cannot be written (its offsets are usually committed by
+    then) is logged and, with `fallback`, kept in that sink instead: the
+    Parquet file under the same key if the upload gave up, or a pickle of
+    the frame if it could not be encoded. `failed` counts those windows.
+
+    `on_uploaded(key, rows, size)` is called from the upload thread once an
+    object is completely written, e.g. to announce the window downstream.
+    """
+
+    def __init__(self, sink, workers: int = 2, max_pending: int = 8, retries: int = 3,
+                 backoff_seconds: float = 1.0, on_uploaded=None, fallback=None):
+        self.sink = sink
+        self.on_uploaded = on_uploaded
+        self.fallback = fallback
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.failed = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="window-upload")
+
+    def submit(self, key: str, df: pd.DataFrame) -> Future:
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self._upload, key, df)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _upload(self, key: str, df: pd.DataFrame) -> bool:
+        """Returns True once the window is written to the sink."""
+        start = time.perf_counter()
+        try:
+            data = frame_to_parquet_bytes(df)
+        except Exception as e:
+            logger.exception(f"Could not encode {len(df)} rows for {self.sink.describe(key)}: {e}")
+            self._keep_failed(key + ".pkl", lambda path: df.to_pickle(path))
+            return False
+
+        for attempt in range(self.retries + 1):
+            try:
+                self.sink.put(key, data)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    logger.error(f"Giving up on {self.sink.describe(key)} after {attempt + 1} attempts: {e}")
+                    self._keep_failed(key, lambda path: FileSink.write(path, data))
+                    return False
+                delay = self.backoff_seconds * 2 ** attempt
+                logger.warning(f"Upload of {self.sink.describe(key)} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Uploaded {len(df)} rows ({data.size} bytes) to {self.sink.describe(key)} in {elapsed:.2f}s")
+        if self.on_uploaded is not None:
+            try:
+                self.on_uploaded(key, len(df), data.size)
+            except Exception as e:
+                logger.error(f"Upload callback failed for {self.sink.describe(key)}: {e}")
+        return True
+
+    def _keep_failed(self, key: str, write) -> None:
+        self.failed += 1
+        if self.fallback is None:
+            logger.error(f"Window {key} is lost (no fallback sink configured)")
+            return
+        try:
+            path = self.fallback.root / key
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write(path)
+            logger.error(f"Kept failed window at {path}")
+        except Exception as e:
+            logger.exception(f"Could not keep failed window {key} in {self.fallback.root}: {e}")
+
+    def close(self) -> None:
+        """Wait for queued uploads to finish."""
+        self._pool.shutdown(wait=True)
+        if self.failed:
+            logger.error(f"{self.failed} window(s) could not be uploaded"
+                         + (f", kept under {self.fallback.root}" if self.fallback is not None else ""))
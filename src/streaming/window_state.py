@@ -0,0 +1,61 @@
+import logging
+from typing import Optional
+
+from src.streaming.aircraft_summary import init_summary, update_summary
+
+logger = logging.getLogger(__name__)
+
+# Offsets a window state carries so the window can be replayed from Kafka:
+# its first and last offset, and the offset of the keyframe the first event
+# was decoded from (the event itself unless the producer runs in --delta mode)
+OFFSET_FIELDS = ("first_offset", "last_offset", "replay_from")
+
+# Per-aircraft state in raw mode; summary mode keeps the running aggregate
+COUNTER_FIELDS = ("count", "first_ts", "last_ts")
+
+# Keys the window state of each mode must have (summary -> fields)
+STATE_FIELDS = {
+    False: COUNTER_FIELDS + OFFSET_FIELDS,
+    True: tuple(init_summary({})) + OFFSET_FIELDS,
+}
+
+
+def init_window_state(event: dict, offset: int, keyframe_offset: Optional[int] = None,
+                      summary: bool = False) -> dict:
+    """Window state of one aircraft, seeded with its first event at `offset`."""
+    if summary:
+        state = init_summary(event)
+    else:
+        ts = event.get('snapshot_ts')
+        state = {"count": 1, "first_ts": ts, "last_ts": ts}
+    state["first_offset"] = offset
+    state["last_offset"] = offset
+    state["replay_from"] = offset if keyframe_offset is None else min(offset, keyframe_offset)
+    return state
+
+
+def update_window_state(state, event: dict, offset: int, keyframe_offset: Optional[int] = None,
+                        summary: bool = False) -> dict:
+    """
+    Fold one event into the window state.
+
+    State that does not match the mode (list state from the raw-event
+    versions, counters from before WINDOW_OUTPUT was switched to summary, or
+    otherwise invalid state) is reset to a state seeded with this event.
+    """
+    if not isinstance(state, dict) or any(field not in state for field in STATE_FIELDS[summary]):
+        logger.warning(f"Found window state that does not match the {'summary' if summary else 'raw'} "
+                       f"window output, resetting it.")
+        return init_window_state(event, offset, keyframe_offset, summary)
+
+    state["last_offset"] = offset
+    if summary:
+        return update_summary(state, event)
+    state["count"] += 1
+    state["last_ts"] = event.get('snapshot_ts', state["last_ts"])
+    return state
+
+
+def strip_offsets(state: dict) -> dict:
+    """The window state without its replay offsets."""
+    return {k: v for k, v in state.items() if k not in OFFSET_FIELDS}
@@ -0,0 +1,173 @@
+import logging
+import math
+import shutil
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Typed layout of a state record. Anything else (e.g. sensors) is kept as a
+# plain Python list column.
+FLOAT_COLUMNS = (
+    "longitude",
+    "latitude",
+    "baro_altitude",
+    "velocity",
+    "true_track",
+    "vertical_rate",
+    "geo_altitude",
+)
+INT_COLUMNS = ("position_source", "snapshot_ts")
+BOOL_COLUMNS = ("on_ground", "spi")
+STRING_COLUMNS = ("icao24", "callsign", "origin_country", "time_position", "last_contact", "squawk")
+
+INT_NULL = -(2 ** 63)
+BOOL_NULL = -1
+
+
+class ColumnBuffer:
+    """Append-only typed column arrays for the events of one window."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = time.monotonic()
+        self.floats = {name: array("d") for name in FLOAT_COLUMNS}
+        self.ints = {name: array("q") for name in INT_COLUMNS}
+        self.bools = {name: array("b") for name in BOOL_COLUMNS}
+        self.objects: Dict[str, list] = {name: [] for name in STRING_COLUMNS}
+
+    def append(self, event: dict) -> None:
+        for name, column in self.floats.items():
+            value = event.get(name)
+            column.append(math.nan if value is None else value)
+        for name, column in self.ints.items():
+            value = event.get(name)
+            column.append(INT_NULL if value is None else int(value))
+        for name, column in self.bools.items():
+            value = event.get(name)
+            column.append(BOOL_NULL if value is None else bool(value))
+        for name in event.keys() - self.floats.keys() - self.ints.keys() - self.bools.keys():
+            if name not in self.objects:
+                # Backfill a column that first shows up part-way through the window
+                self.objects[name] = [None] * self.rows
+        for name, column in self.objects.items():
+            column.append(event.get(name))
+        self.rows += 1
+
+    def to_frame(self) -> pd.DataFrame:
+        """Build a DataFrame, viewing the numeric arrays without copying them."""
+        columns = {}
+        for name in STRING_COLUMNS:
+            columns[name] = self.objects[name]
+        for name, column in self.floats.items():
+            columns[name] = np.frombuffer(column, dtype=np.float64)
+        for name, column in self.ints.items():
+            values = np.frombuffer(column, dtype=np.int64)
+            columns[name] = pd.arrays.IntegerArray(values, values == INT_NULL)
+        for name, column in self.bools.items():
+            values = np.frombuffer(column, dtype=np.int8)
+            columns[name] = pd.arrays.BooleanArray(values == 1, values == BOOL_NULL)
+        for name, column in self.objects.items():
+            if name not in columns:
+                columns[name] = column
+        return pd.DataFrame(columns)
+
+
+class ColumnarWindowStore:
+    """
+    Local window storage for raw events, so Quix state only holds counters.
+
+    Events are buffered per (partition, window) in typed column arrays and
+    spilled to Parquet segments under `spill_dir` once a buffer reaches
+    `spill_rows` rows or `spill_seconds` age. `pop` returns the whole window
+    as one DataFrame and deletes its segments.
+
+    Rows still in memory are lost if the process dies; spilled segments are
+    picked up again on restart. Lower `spill_seconds` to narrow that gap.
+    """
+
+    def __init__(self, spill_dir, duration_ms: int, spill_rows: int = 50_000, spill_seconds: float = 30.0):
+        self.spill_dir = Path(spill_dir)
+        self.duration_ms = duration_ms
+        self.spill_rows = spill_rows
+        self.spill_seconds = spill_seconds
+        self._buffers: Dict[Tuple[int, int, int], ColumnBuffer] = {}
+        self._segments: Dict[Tuple[int, int, int], List[Path]] = {}
+        self._closed_until: Dict[int, int] = {}
+        self._discover_segments()
+
+    def window_for(self, timestamp_ms: int) -> Tuple[int, int]:
+        """Tumbling window bounds for a timestamp, matching Quix's assignment."""
+        start = timestamp_ms - (timestamp_ms % self.duration_ms)
+        return start, start + self.duration_ms
+
+    def append(self, partition: int, timestamp_ms: int, event: dict) -> bool:
+        """Buffer one event. Returns False if its window was already emitted."""
+        start, end = self.window_for(timestamp_ms)
+        if end <= self._closed_until.get(partition, -1):
+            return False
+        key = (partition, start, end)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = ColumnBuffer()
+        buffer.append(event)
+        if buffer.rows >= self.spill_rows or time.monotonic() - buffer.created >= self.spill_seconds:
+            self._spill(key)
+        return True
+
+    def pop(self, partition: int, start: int, end: int) -> pd.DataFrame:
+        """Return every buffered and spilled event of a window and release it."""
+        key = (partition, start, end)
+        frames = [pd.read_parquet(path) for path in self._segments.get(key, [])]
+        buffer = self._buffers.pop(key, None)
+        if buffer is not None and buffer.rows:
+            frames.append(buffer.to_frame())
+        self._release(key)
+
+        # Anything older on this partition can no longer be emitted
+        self._closed_until[partition] = max(end, self._closed_until.get(partition, -1))
+        for stale in [k for k in {**self._buffers, **self._segments} if k[0] == partition and k[2] < end]:
+            logger.warning(f"Dropping unemitted window state {stale}")
+            self._buffers.pop(stale, None)
+            self._release(stale)
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def buffered_rows(self) -> int:
+        return sum(buffer.rows for buffer in self._buffers.values())
+
+    def _window_dir(self, key: Tuple[int, int, int]) -> Path:
+        partition, start, end = key
+        return self.spill_dir / f"p{partition}" / f"{start}_{end}"
+
+    def _spill(self, key: Tuple[int, int, int]) -> None:
+        buffer = self._buffers.pop(key)
+        segments = self._segments.setdefault(key, [])
+        path = self._window_dir(key) / f"segment_{len(segments):05d}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        buffer.to_frame().to_parquet(path, index=False)
+        segments.append(path)
+        logger.debug(f"Spilled {buffer.rows} events to {path}")
+
+    def _release(self, key: Tuple[int, int, int]) -> None:
+        if self._segments.pop(key, None) is not None:
+            shutil.rmtree(self._window_dir(key), ignore_errors=True)
+
+    def _discover_segments(self) -> None:
+        # Re-attach segments written before a restart
+        for path in sorted(self.spill_dir.glob("p*/*_*/segment_*.parquet")):
+            try:
+                partition = int(path.parent.parent.name[1:])
+                start, end = (int(part) for part in path.parent.name.split("_"))
+            except ValueError:
+                continue
+            self._segments.setdefault((partition, start, end), []).append(path)
+        if self._segments:
+            logger.info(f"Recovered spilled segments for {len(self._segments)} windows from {self.spill_dir}")
@@ -0,0 +1,91 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to sys.path to allow importing from src
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.streaming.event_time import PartitionWatermark, snapshot_timestamp
+
+WINDOW_MS = 180_000
+LATENESS_MS = 10_000
+
+
+def test_snapshot_timestamp_uses_event_time():
+    assert snapshot_timestamp({"snapshot_ts": 1_760_000_000}, None, 1, None) == 1_760_000_000_000
+    # Records without snapshot_ts keep the Kafka message time
+    assert snapshot_timestamp({"icao24": "4b1814"}, None, 1234, None) == 1234
+    assert snapshot_timestamp(None, None, 1234, None) == 1234
+
+
+def test_late_event_for_closed_window_is_dropped():
+    watermark = PartitionWatermark(WINDOW_MS, LATENESS_MS)
+
+    assert watermark.accept(0, 170_000)
+    # The watermark (195s - 10s) passed the end of [0, 180s)
+    assert watermark.accept(0, 195_000)
+    assert not watermark.accept(0, 179_000)
+    assert watermark.late == 1
+
+
+def test_event_within_allowed_lateness_is_accepted():
+    watermark = PartitionWatermark(WINDOW_MS, LATENESS_MS)
+
+    assert watermark.accept(0, 189_000)
+    # Watermark 179s has not reached the window end yet
+    assert watermark.accept(0, 175_000)
+    assert watermark.accept(0, 190_000)
+    # Now it has
+    assert not watermark.accept(0, 175_000)
+    assert watermark.late == 1
+
+
+def test_zero_lateness_closes_window_at_its_end():
+    watermark = PartitionWatermark(WINDOW_MS, 0)
+
+    assert watermark.accept(0, 180_000)
+    assert not watermark.accept(0, 179_999)
+
+
+def test_watermarks_are_per_partition():
+    watermark = PartitionWatermark(WINDOW_MS, LATENESS_MS)
+
+    assert watermark.accept(0, 400_000)
+    # Partition 1 lags behind partition 0 without being late
+    assert watermark.accept(1, 100_000)
+    assert watermark.watermark(0) == 390_000
+    assert watermark.watermark(1) == 90_000
+    assert watermark.watermark(2) == -1
+    assert watermark.late == 0
+
+
+def quix_is_late(latest_expired_end: int, timestamp_ms: int, grace_ms: int) -> bool:
+    """Quix's check for tumbling windows closed per partition (TimeWindow.process_window)."""
+    start = timestamp_ms - timestamp_ms % WINDOW_MS
+    max_expired_window_end = max(timestamp_ms, latest_expired_end) - grace_ms
+    return start <= max_expired_window_end - WINDOW_MS
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_never_looser_than_quix_window_closing(seed):
+    # Out-of-order event times on a few partitions; every event the watermark
+    # lets through must still land in a window Quix has not closed
+    rng = random.Random(seed)
+    watermark = PartitionWatermark(WINDOW_MS, LATENESS_MS)
+    latest_expired_end = {}
+    clock = 0
+    for _ in range(2000):
+        clock += rng.randint(0, 5_000)
+        partition = rng.randrange(3)
+        timestamp_ms = max(0, clock - rng.choice([0, 0, 0, 5_000, 15_000, 200_000]))
+
+        if not watermark.accept(partition, timestamp_ms):
+            continue
+        assert not quix_is_late(latest_expired_end.get(partition, 0), timestamp_ms, LATENESS_MS)
+        # Quix then expires every window ending at or before latest - grace
+        latest = max(timestamp_ms, latest_expired_end.get(partition, 0))
+        latest_expired_end[partition] = max(latest_expired_end.get(partition, 0), latest - LATENESS_MS)
+    assert watermark.late > 0
@@ -0,0 +1,64 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+# Add project root to sys.path to allow importing from src
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.Db_work import load
+
+PREFIX = "processed/date=2026/01/01/"
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    load.ensure_manifest(con)
+    yield con
+    con.close()
+
+
+def window_file(root: Path, name: str, rows: int = 2) -> dict:
+    path = root / name
+    if rows:
+        pd.DataFrame({
+            "icao24": [f"{i:06x}" for i in range(rows)],
+            "window_end": [datetime(2026, 1, 1, 0, 3)] * rows,
+        }).to_parquet(path)
+    else:
+        path.write_bytes(b"PAR1 truncated")
+    return {"key": PREFIX + name, "etag": name, "path": str(path)}
+
+
+def test_bad_file_is_recorded_and_the_rest_is_loaded(con, tmp_path):
+    good = window_file(tmp_path, "window_raw_20260101T000300_p0.parquet")
+    bad = window_file(tmp_path, "window_raw_20260101T000300_p1.parquet", rows=0)
+    other = window_file(tmp_path, "window_raw_20260101T000300_p2.parquet")
+
+    rows = load.append_windows(con, "raw", [good, bad, other])
+
+    assert rows == 4
+    assert con.execute("SELECT COUNT(*) FROM aircraft_states").fetchone()[0] == 4
+    failed = con.execute("SELECT key, attempts FROM ingest_manifest WHERE error IS NOT NULL").fetchall()
+    assert failed == [(bad["key"], 1)]
+    # The connection is not left in an aborted transaction
+    assert con.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_failed_file_is_retried_until_max_attempts(con, tmp_path):
+    bad = window_file(tmp_path, "window_raw_20260101T000300_p0.parquet", rows=0)
+    objects = [bad]
+
+    for attempt in range(load.MAX_LOAD_ATTEMPTS):
+        new = load.find_new_windows(con, objects)["raw"]
+        assert [obj["key"] for obj in new] == [bad["key"]]
+        load.append_windows(con, "raw", new)
+
+    assert load.find_new_windows(con, objects)["raw"] == []
+    # Until the file is rewritten
+    assert load.find_new_windows(con, [{**bad, "etag": "rewritten"}])["raw"][0]["attempts"] == 0
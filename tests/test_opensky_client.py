@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+import httpx
+import pandas as pd
+import pytest
+
+# Add src/ingest to sys.path; the ingest modules import each other flat
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT / "src" / "ingest"))
+
+from opensky_client import OpenSkyClient, _sanitize, _sanitize_column
+from poll_scheduler import rate_limit_delay
+
+STATE = ["4b1814", "SWR123 ", "Switzerland", 1760000000, 1760000001, 8.5, 47.4, 10000.0,
+         False, 230.0, 90.0, 0.0, None, 10100.0, "1000", False, 0]
+
+
+def make_client(handler) -> OpenSkyClient:
+    client = OpenSkyClient()
+    client.client.client._transport = httpx.MockTransport(handler)
+    return client
+
+
+def test_fetch_raises_rate_limit_without_retrying():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(429, headers={"X-Rate-Limit-Retry-After-Seconds": "37"})
+
+    with pytest.raises(httpx.HTTPStatusError) as excinfo:
+        make_client(handler).fetch()
+
+    assert len(requests) == 1
+    assert rate_limit_delay(excinfo.value) == 37.0
+
+
+def test_fetch_returns_states():
+    client = make_client(lambda request: httpx.Response(200, json={"time": 1760000000, "states": [STATE]}))
+
+    df = client.fetch()
+
+    assert df["icao24"].tolist() == ["4b1814"]
+    assert df["callsign"].tolist() == ["SWR123"]
+
+
+def test_missing_timestamps_become_none():
+    stamps = pd.Series(pd.to_datetime([1760000000, None], unit="s", utc=True))
+
+    assert _sanitize_column(stamps) == ["2025-10-09T08:53:20+00:00", None]
+    assert _sanitize_column(stamps) == [_sanitize(value) for value in stamps]
@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+
+import duckdb
+import pytest
+
+# Add project root to sys.path to allow importing from src
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.Db_work.session import DuckDBSession, transaction
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = DuckDBSession(tmp_path / "test.duckdb")
+    with session.writer() as con:
+        con.execute("CREATE TABLE t (a INTEGER)")
+    yield session
+    session.close()
+
+
+def rows(session):
+    with session.writer() as con:
+        return [a for (a,) in con.execute("SELECT a FROM t ORDER BY a").fetchall()]
+
+
+def test_transaction_commits(session):
+    with session.transaction() as con:
+        con.execute("INSERT INTO t VALUES (1)")
+
+    assert rows(session) == [1]
+
+
+def test_failed_transaction_rolls_back_and_leaves_connection_usable(session):
+    with pytest.raises(duckdb.CatalogException):
+        with session.transaction() as con:
+            con.execute("INSERT INTO t VALUES (1)")
+            con.execute("SELECT * FROM missing_table")
+
+    assert rows(session) == []
+
+
+def test_transaction_on_connection_rolls_back_when_error_is_caught_by_caller(session):
+    # Stages catch and log their own errors inside the writer block
+    with session.writer() as con:
+        try:
+            with transaction(con):
+                con.execute("INSERT INTO t VALUES (1)")
+                con.execute("SELECT * FROM missing_table")
+        except duckdb.Error:
+            pass
+        assert con.execute("SELECT 1").fetchone() == (1,)
+
+    assert rows(session) == []
+
+
+def test_writer_rolls_back_open_transaction_on_error(session):
+    with pytest.raises(duckdb.CatalogException):
+        with session.writer() as con:
+            con.begin()
+            con.execute("INSERT INTO t VALUES (1)")
+            con.execute("SELECT * FROM missing_table")
+
+    assert rows(session) == []
@@ -0,0 +1,150 @@
+import sys
+from pathlib import Path
+
+import pytest
+from kafka.future import Future
+from kafka.producer.future import RecordMetadata
+
+# Add src/ingest to sys.path; the ingest modules import each other flat
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT / "src" / "ingest"))
+
+from producer_opensky import publish_snapshot
+from state_codec import BASE_FIELD, DeltaDecoder, DeltaEncoder, decode_state, encode_state
+
+
+def make_state(icao24: str, snapshot_ts: int, **fields) -> dict:
+    state = {
+        "icao24": icao24,
+        "callsign": "SWR123",
+        "latitude": 47.4,
+        "longitude": 8.5,
+        "baro_altitude": 10000.0,
+        "snapshot_ts": snapshot_ts,
+    }
+    state.update(fields)
+    return state
+
+
+def send(encoder: DeltaEncoder, decoder: DeltaDecoder, state: dict, encoding: str = "json"):
+    """One record through the wire encoding, the way producer and consumer see it."""
+    message = encoder.encode(dict(state))
+    return message, decoder.decode(decode_state(encode_state(message, encoding)))
+
+
+@pytest.mark.parametrize("encoding", ["json", "msgpack"])
+def test_delta_round_trip(encoding):
+    if encoding == "msgpack":
+        pytest.importorskip("msgpack")
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    states = [make_state("4b1814", 1000 + 10 * i, latitude=47.4 + i / 100) for i in range(5)]
+
+    for i, state in enumerate(states):
+        message, decoded = send(encoder, decoder, state, encoding)
+        assert decoded == state
+        if i:
+            # Only what changed, plus the key and the base it applies to
+            assert message == {"icao24": "4b1814", "latitude": state["latitude"],
+                               "snapshot_ts": state["snapshot_ts"], BASE_FIELD: states[i - 1]["snapshot_ts"]}
+
+
+def test_keyframe_every_n_snapshots():
+    encoder = DeltaEncoder(keyframe_snapshots=4)
+
+    keyframes = [BASE_FIELD not in encoder.encode(make_state("4b1814", 1000 + 10 * i)) for i in range(9)]
+
+    assert keyframes == [True, False, False, False, True, False, False, False, True]
+
+
+def test_encoder_lru_evicts_oldest_aircraft():
+    encoder = DeltaEncoder(max_aircraft=2)
+    for icao24 in ("a", "b", "c"):
+        encoder.encode(make_state(icao24, 1000))
+
+    # "a" was evicted and starts over with a keyframe; "c" is still tracked
+    assert BASE_FIELD not in encoder.encode(make_state("a", 1010))
+    assert BASE_FIELD in encoder.encode(make_state("c", 1010))
+
+
+def test_decoder_drops_delta_without_base_until_keyframe():
+    encoder = DeltaEncoder(keyframe_snapshots=3)
+    decoder = DeltaDecoder(max_aircraft=1)
+    encoder.encode(make_state("4b1814", 1000))
+    # The consumer missed the keyframe (restart, rebalance, or LRU eviction)
+    delta = encoder.encode(make_state("4b1814", 1010))
+    assert decoder.decode(delta) is None
+    assert decoder.missing_base == 1
+
+    encoder.encode(make_state("4b1814", 1020))
+    keyframe = encoder.encode(make_state("4b1814", 1030))
+    assert decoder.decode(keyframe, position=7) == make_state("4b1814", 1030)
+    assert decoder.keyframe_position("4b1814") == 7
+
+
+def test_decoder_lru_evicts_oldest_aircraft():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder(max_aircraft=1)
+    for icao24 in ("a", "b"):
+        decoder.decode(encoder.encode(make_state(icao24, 1000)))
+
+    assert decoder.decode(encoder.encode(make_state("a", 1010, latitude=48.0))) is None
+    assert decoder.decode(encoder.encode(make_state("b", 1010, latitude=48.0)))["latitude"] == 48.0
+
+
+def test_decode_state_detects_json_by_leading_brace():
+    pytest.importorskip("msgpack")
+    state = make_state("4b1814", 1000)
+
+    assert encode_state(state, "json")[:1] == b"{"
+    assert decode_state(encode_state(state, "json")) == state
+    assert encode_state(state, "msgpack")[:1] != b"{"
+    assert decode_state(encode_state(state, "msgpack")) == state
+
+
+def test_invalidate_forces_keyframe():
+    encoder = DeltaEncoder()
+    encoder.encode(make_state("4b1814", 1000))
+
+    encoder.invalidate("4b1814")
+
+    assert BASE_FIELD not in encoder.encode(make_state("4b1814", 1010))
+
+
+class FlakyProducer:
+    """Producer whose sends for the given icao24 values fail once delivery is attempted."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+        self._futures = []
+
+    def send(self, topic, key=None, value=None):
+        future = Future()
+        self._futures.append((future, key, value))
+        return future
+
+    def flush(self):
+        for future, key, value in self._futures:
+            if key in self.failing:
+                future.failure(RuntimeError("delivery failed"))
+            else:
+                self.sent.append(value)
+                future.success(RecordMetadata("t", 0, None, 0, 0, None, 0, 1, 0))
+        self._futures = []
+
+
+def test_failed_send_makes_next_record_a_keyframe():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    producer = FlakyProducer()
+    publish_snapshot(producer, [make_state("4b1814", 0)], 1000, encoder)
+
+    producer.failing = {"4b1814"}
+    stats = publish_snapshot(producer, [make_state("4b1814", 0, latitude=47.5)], 1010, encoder)
+    assert stats["failed"] == 1
+
+    producer.failing = set()
+    publish_snapshot(producer, [make_state("4b1814", 0, latitude=47.6)], 1020, encoder)
+
+    decoded = [decoder.decode(dict(value)) for value in producer.sent]
+    assert BASE_FIELD not in producer.sent[-1]
+    assert decoded[-1] == make_state("4b1814", 1020, latitude=47.6)
+    assert decoder.missing_base == 0
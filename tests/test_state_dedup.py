@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+# Add project root to sys.path to allow importing from src
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.streaming.state_dedup import StaleStateFilter
+
+WINDOW_MS = 180_000
+
+
+def make_event(snapshot_ts: int, icao24: str = "4b1814", time_position: int = 1000, last_contact: int = 1001) -> dict:
+    return {"icao24": icao24, "time_position": time_position, "last_contact": last_contact,
+            "snapshot_ts": snapshot_ts}
+
+
+def test_repeated_state_in_a_window_is_suppressed():
+    stale_filter = StaleStateFilter(WINDOW_MS)
+
+    assert stale_filter.is_new(make_event(1800))
+    assert not stale_filter.is_new(make_event(1810))
+    assert stale_filter.is_new(make_event(1820, last_contact=1815))
+    assert (stale_filter.seen, stale_filter.suppressed) == (3, 1)
+
+
+def test_first_state_of_each_window_is_kept():
+    # A parked aircraft repeats the same state in every poll
+    stale_filter = StaleStateFilter(WINDOW_MS)
+
+    kept = [stale_filter.is_new(make_event(ts)) for ts in (1800, 1970, 1980, 1990, 2160)]
+
+    # Windows [1800, 1980) and [1980, 2160) and [2160, 2340)
+    assert kept == [True, False, True, False, True]
+
+
+def test_duplicate_across_window_boundary_is_kept():
+    stale_filter = StaleStateFilter(WINDOW_MS)
+
+    assert stale_filter.is_new(make_event(1979))
+    assert stale_filter.is_new(make_event(1980))
+    assert not stale_filter.is_new(make_event(1981))
+
+
+def test_aircraft_are_tracked_separately_and_evicted_least_recent_first():
+    stale_filter = StaleStateFilter(WINDOW_MS, max_aircraft=2)
+    for icao24 in ("a", "b", "c"):
+        assert stale_filter.is_new(make_event(1800, icao24))
+
+    # "a" fell out of the LRU and passes once more; "c" is still tracked
+    assert stale_filter.is_new(make_event(1810, "a"))
+    assert not stale_filter.is_new(make_event(1810, "c"))
+
+
+def test_records_without_key_or_timestamps_are_kept():
+    stale_filter = StaleStateFilter(WINDOW_MS)
+    no_stamps = make_event(1800, time_position=None, last_contact=None)
+
+    assert stale_filter.is_new(no_stamps)
+    assert stale_filter.is_new(no_stamps)
+    assert stale_filter.is_new({"time_position": 1000, "last_contact": 1001, "snapshot_ts": 1800})
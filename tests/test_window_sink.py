@@ -0,0 +1,117 @@
+import io
+import sys
+from pathlib import Path
+
+import boto3
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from moto import mock_aws
+
+# Add project root to sys.path to allow importing from src
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.streaming.window_sink import (
+    MULTIPART_CHUNK_SIZE,
+    BackgroundUploader,
+    FileSink,
+    S3Sink,
+    frame_to_parquet_bytes,
+)
+
+BUCKET = "test-windows"
+KEY = "processed/date=2026/01/01/window_raw_20260101T000300_p0.parquet"
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def make_frame(rows: int = 100) -> pd.DataFrame:
+    return pd.DataFrame({
+        "icao24": [f"{i:06x}" for i in range(rows)],
+        "latitude": [i / 10 for i in range(rows)],
+        "snapshot_ts": list(range(rows)),
+    })
+
+
+def read_object(client, key: str) -> bytes:
+    return client.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def test_s3_sink_put_object(s3_client):
+    df = make_frame()
+    data = frame_to_parquet_bytes(df)
+
+    S3Sink(s3_client, BUCKET).put(KEY, data)
+
+    body = read_object(s3_client, KEY)
+    assert body == data.to_pybytes()
+    pd.testing.assert_frame_equal(pq.read_table(io.BytesIO(body)).to_pandas(), df)
+
+
+def test_s3_sink_multipart_upload(s3_client):
+    # Two full parts and a short last one
+    payload = bytes(range(256)) * (2 * MULTIPART_CHUNK_SIZE // 256 + 100)
+    sink = S3Sink(s3_client, BUCKET, multipart_threshold=MULTIPART_CHUNK_SIZE)
+
+    sink.put(KEY, memoryview(payload))
+
+    assert read_object(s3_client, KEY) == payload
+    head = s3_client.head_object(Bucket=BUCKET, Key=KEY)
+    assert head["ETag"].strip('"').endswith("-3")
+    assert s3_client.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+
+
+def test_file_sink_writes_through_rename(tmp_path):
+    data = frame_to_parquet_bytes(make_frame())
+
+    FileSink(tmp_path).put(KEY, data)
+
+    path = tmp_path / KEY
+    assert path.read_bytes() == data.to_pybytes()
+    assert not path.with_suffix(path.suffix + ".tmp").exists()
+
+
+def test_uploader_writes_and_announces(s3_client):
+    uploaded = []
+    uploader = BackgroundUploader(S3Sink(s3_client, BUCKET),
+                                  on_uploaded=lambda key, rows, size: uploaded.append((key, rows)))
+
+    assert uploader.submit(KEY, make_frame(10)).result() is True
+    uploader.close()
+
+    assert uploaded == [(KEY, 10)]
+    assert read_object(s3_client, KEY)
+
+
+def test_uploader_keeps_window_when_upload_gives_up(tmp_path):
+    class FailingSink(FileSink):
+        def put(self, key, data):
+            raise OSError("bucket unavailable")
+
+    uploader = BackgroundUploader(FailingSink(tmp_path / "sink"), retries=1, backoff_seconds=0,
+                                  fallback=FileSink(tmp_path / "failed"))
+
+    assert uploader.submit(KEY, make_frame(10)).result() is False
+    uploader.close()
+
+    assert uploader.failed == 1
+    assert len(pq.read_table(tmp_path / "failed" / KEY)) == 10
+
+
+def test_uploader_keeps_frame_that_cannot_be_encoded(tmp_path):
+    df = pd.DataFrame({"mixed": [1, "a", 2.5]})
+    uploader = BackgroundUploader(FileSink(tmp_path / "sink"), fallback=FileSink(tmp_path / "failed"))
+
+    assert uploader.submit(KEY, df).result() is False
+    uploader.close()
+
+    assert uploader.failed == 1
+    assert not (tmp_path / "sink" / KEY).exists()
+    pd.testing.assert_frame_equal(pd.read_pickle(tmp_path / "failed" / (KEY + ".pkl")), df)
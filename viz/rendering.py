@@ -0,0 +1,192 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_ROOT = SCRIPT_DIR.parent
+
+IMAGES_DIR = Path(os.environ.get("VIZ_IMAGES_DIR", PROJECT_ROOT / "images"))
+
+# Point clouds above this size are thinned before plotting
+MAX_PLOT_POINTS = int(os.environ.get("VIZ_MAX_POINTS", "20000"))
+DENSITY_BINS = 200
+
+# Figures render on a small shared pool, so analysis and viz draw side by side
+RENDER_WORKERS = int(os.environ.get("VIZ_RENDER_WORKERS", "2"))
+
+# Input hash of every written image; an image is only redrawn when it changes
+HASH_FILE = Path(os.environ.get("VIZ_HASH_FILE", IMAGES_DIR / ".render_hashes.json"))
+
+_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+_hash_lock = threading.Lock()
+_kaleido_lock = threading.Lock()
+_kaleido_started = None
+
+
+def frame_hash(df: pd.DataFrame) -> str:
+    """Content hash of a frame (values and column names, not the index)."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update("\0".join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int = MAX_PLOT_POINTS,
+               keep=None, bins: int = DENSITY_BINS, seed: int = 42) -> pd.DataFrame:
+    """
+    Density-aware subset of at most `max_points` rows (plus every kept row).
+
+    Points are binned on a `bins` x `bins` grid over (x, y) and each cell
+    keeps at most the same number of random points, so dense clusters are
+    thinned while sparse regions and outliers stay fully drawn. Rows where
+    `keep` is true (e.g. anomalies) are always included.
+    """
+    keep = np.zeros(len(df), dtype=bool) if keep is None else np.asarray(keep, dtype=bool)
+    rest = np.flatnonzero(~keep)
+    budget = max_points - int(keep.sum())
+    if len(rest) <= budget:
+        return df
+    if budget <= 0:
+        return df[keep]
+
+    xs = df[x].to_numpy(dtype=np.float64)[rest]
+    ys = df[y].to_numpy(dtype=np.float64)[rest]
+    valid = np.isfinite(xs) & np.isfinite(ys)
+    rest, xs, ys = rest[valid], xs[valid], ys[valid]
+
+    def bin_index(values):
+        low, high = values.min(), values.max()
+        span = high - low if high > low else 1.0
+        return np.minimum(((values - low) / span * bins).astype(np.int64), bins - 1)
+
+    cells = bin_index(xs) * bins + bin_index(ys)
+    rng = np.random.default_rng(seed)
+    # Random order within each cell; rank = position inside the cell
+    order = np.lexsort((rng.random(len(cells)), cells))
+    _, starts, counts = np.unique(cells[order], return_index=True, return_counts=True)
+    rank = np.arange(len(order)) - np.repeat(starts, counts)
+
+    # Largest per-cell cap that fits the budget
+    low, high = 0, int(counts.max())
+    while low < high:
+        cap = (low + high + 1) // 2
+        if np.minimum(counts, cap).sum() <= budget:
+            low = cap
+        else:
+            high = cap - 1
+    chosen = order[rank < low]
+    # Spend what is left of the budget on a random part of the next layer
+    spare = budget - len(chosen)
+    if spare > 0:
+        layer = order[rank == low]
+        chosen = np.concatenate([chosen, rng.choice(layer, size=min(spare, len(layer)), replace=False)])
+
+    mask = keep.copy()
+    mask[rest[chosen]] = True
+    return df[mask]
+
+
+def _load_hashes() -> dict:
+    try:
+        return json.loads(HASH_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_hash(path: Path, digest: str) -> None:
+    hashes = _load_hashes()
+    hashes[str(path)] = digest
+    HASH_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = HASH_FILE.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(hashes, indent=1, sort_keys=True))
+    os.replace(tmp_path, HASH_FILE)
+
+
+def start_kaleido() -> bool:
+    """
+    Start the process-wide kaleido server once, so every plotly export reuses
+    the same Chromium instead of launching a new one per image.
+    """
+    global _kaleido_started
+    with _kaleido_lock:
+        if _kaleido_started is None:
+            try:
+                import kaleido
+                from choreographer.browsers.chromium import Chromium
+
+                # Without a browser the server thread dies on startup but still
+                # reports itself running, and every export would block on it
+                if not (os.environ.get("BROWSER_PATH") or Chromium.find_browser(skip_local=False)):
+                    raise RuntimeError("Chrome not found (run kaleido_get_chrome to install it)")
+                kaleido.start_sync_server(silence_warnings=True)
+                atexit.register(kaleido.stop_sync_server, silence_warnings=True)
+                _kaleido_started = True
+                logger.info("Started persistent kaleido renderer")
+            except Exception as e:
+                # plotly falls back to a one-off renderer per image
+                logger.warning(f"Could not start persistent kaleido renderer: {e}")
+                _kaleido_started = False
+        return _kaleido_started
+
+
+def write_plotly(fig, path) -> None:
+    """Export a plotly figure through the persistent kaleido renderer."""
+    start_kaleido()
+    fig.write_image(str(path))
+
+
+def render(path, draw, df: pd.DataFrame) -> bool:
+    """
+    Call `draw(df, path)` unless `path` was already drawn from identical input.
+
+    Returns True when the image was (re)written.
+    """
+    path = Path(path)
+    digest = frame_hash(df)
+    with _hash_lock:
+        unchanged = path.exists() and _load_hashes().get(str(path)) == digest
+    if unchanged:
+        logger.info(f"Input unchanged, keeping {path}")
+        return False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    draw(df, path)
+    with _hash_lock:
+        _save_hash(path, digest)
+    logger.info(f"Plot saved to {path}")
+    return True
+
+
+def _render_logged(path, draw, df) -> bool:
+    try:
+        return render(path, draw, df)
+    except Exception as e:
+        logger.error(f"Failed to render {path}: {e}")
+        return False
+
+
+def submit_render(path, draw, df: pd.DataFrame) -> Future:
+    """Render on the shared pool; failures are logged, not raised."""
+    return _pool.submit(_render_logged, path, draw, df)
+
+
+def render_all(jobs, raise_errors: bool = False) -> list:
+    """
+    Render several (path, draw, df) jobs in parallel and wait for all of them.
+
+    Failures are logged; with `raise_errors` the first one is raised once
+    every job has finished.
+    """
+    target = render if raise_errors else _render_logged
+    futures = [_pool.submit(target, *job) for job in jobs]
+    wait(futures)
+    return [future.result() for future in futures]
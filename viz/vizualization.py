@@ -1,10 +1,10 @@
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import plotly.express as px
 import seaborn as sns
+import numpy as np
 import pandas as pd
 import logging
 import sys
-import os
-import duckdb
 from pathlib import Path
 
 # Setup paths and imports
@@ -13,6 +13,8 @@ PROJECT_ROOT = SCRIPT_DIR.parent
 sys.path.append(str(PROJECT_ROOT))
 
 from src.Db_work.analysis import create_df_for_window, get_latest_window
+from src.Db_work.session import get_session
+from viz.rendering import IMAGES_DIR, downsample, render_all, write_plotly
 
 # Setup logging
 logging.basicConfig(
@@ -22,13 +24,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-DB_FILE = str(PROJECT_ROOT / "air_ops.duckdb")
-IMAGES_DIR = PROJECT_ROOT / "images"
-
-def load_data():
-    logger.info(f"Connecting to database: {DB_FILE}")
+def load_data(window=None):
+    """DataFrame of the latest window, or of `window` = (window_end, Arrow table) if given."""
+    if window is not None:
+        return window[1].select(["velocity", "geo_altitude", "Description"]).to_pandas()
+    session = get_session(read_only=True)
+    logger.info(f"Connecting to database: {session.db_file}")
     try:
-        with duckdb.connect(DB_FILE, read_only=True) as con:
+        with session.reader() as con:
             latest_window = get_latest_window(con)
             
             if latest_window is None:
@@ -41,27 +44,11 @@ def load_data():
         logger.error(f"Failed to load data: {e}")
         return pd.DataFrame()
 
-def generate_scatter_plot(df):
-    """
-    Altitude vs. Velocity Scatter Plot     
-    Shows the performance profile of different aircraft categories.
-    """
-    logger.info("Generating Altitude vs. Velocity Scatter Plot...")
-    
-    # Filter for the top 4 most common descriptions to keep the plot clean
-    if 'Description' not in df.columns:
-        logger.warning("[Skipping] 'Description' column not found for scatter plot grouping. Ensure column names are correct.")
-        return
+def draw_scatter_plot(plot_df, output_path):
+    # A standalone Figure (no pyplot state), so it can be drawn on any thread
+    fig = Figure(figsize=(10, 7))
+    ax = fig.subplots()
 
-    top_n_desc = df['Description'].value_counts().nlargest(4).index.tolist()
-    plot_df = df[df['Description'].isin(top_n_desc)].copy() # Use a copy for plotting
-    
-    if plot_df.empty:
-        logger.warning("Not enough data with filtered descriptions to create the scatter plot.")
-        return
-
-    plt.figure(figsize=(10, 7))
-    
     # Use seaborn scatterplot for better aesthetics and automatic legend
     sns.scatterplot(
         data=plot_df, 
@@ -70,32 +57,92 @@ def generate_scatter_plot(df):
         hue='Description', 
         palette='viridis', 
         s=50, # size of points
-        alpha=0.6 # transparency
+        alpha=0.6, # transparency
+        ax=ax
     )
 
-    plt.title('Aircraft Performance Envelope: Altitude vs. Velocity', fontsize=16)
-    plt.xlabel('Ground Velocity (knots)', fontsize=12)
-    plt.ylabel('Geometric Altitude (meters)', fontsize=12)
+    ax.set_title('Aircraft Performance Envelope: Altitude vs. Velocity', fontsize=16)
+    ax.set_xlabel('Ground Velocity (knots)', fontsize=12)
+    ax.set_ylabel('Geometric Altitude (meters)', fontsize=12)
     
     # Add context lines
-    plt.axhline(10000, color='gray', linestyle='--', alpha=0.5, label='Typical Jet Cruise Alt')
-    plt.axvline(250, color='gray', linestyle=':', alpha=0.5, label='Regional Cruise Speed')
+    ax.axhline(10000, color='gray', linestyle='--', alpha=0.5, label='Typical Jet Cruise Alt')
+    ax.axvline(250, color='gray', linestyle=':', alpha=0.5, label='Regional Cruise Speed')
 
     # Improve legend placement
-    plt.legend(title='Aircraft Type', bbox_to_anchor=(1.05, 1), loc=2)
-    plt.tight_layout(rect=[0, 0, 0.85, 1])
+    ax.legend(title='Aircraft Type', bbox_to_anchor=(1.05, 1), loc=2)
+    fig.tight_layout(rect=[0, 0, 0.85, 1])
     
-    # Save plot
-    os.makedirs(IMAGES_DIR, exist_ok=True)
-    output_path = IMAGES_DIR / "altitude_velocity_scatter.png"
-    plt.savefig(output_path)
-    logger.info(f"Plot saved to {output_path}")
-    plt.close()
-
-def main():
-    df = load_data()
+    fig.savefig(output_path)
+
+def scatter_plot_job(df):
+    """
+    Altitude vs. Velocity Scatter Plot     
+    Shows the performance profile of different aircraft categories.
+
+    Returns a (path, draw, data) render job, or None when there is nothing to plot.
+    """
+    logger.info("Preparing Altitude vs. Velocity Scatter Plot...")
+    
+    # Filter for the top 4 most common descriptions to keep the plot clean
+    if 'Description' not in df.columns:
+        logger.warning("[Skipping] 'Description' column not found for scatter plot grouping. Ensure column names are correct.")
+        return None
+
+    top_n_desc = df['Description'].value_counts().nlargest(4).index.tolist()
+    plot_df = df.loc[df['Description'].isin(top_n_desc), ['velocity', 'geo_altitude', 'Description']]
+    
+    if plot_df.empty:
+        logger.warning("Not enough data with filtered descriptions to create the scatter plot.")
+        return None
+
+    # Thin dense parts of the envelope; sparse edges are kept
+    sampled = downsample(plot_df.reset_index(drop=True), 'velocity', 'geo_altitude')
+    if len(sampled) < len(plot_df):
+        logger.info(f"Plotting {len(sampled)} of {len(plot_df)} points")
+    return IMAGES_DIR / "altitude_velocity_scatter.png", draw_scatter_plot, sampled
+
+def draw_anomaly_map(plot_df, output_path):
+    fig = px.scatter_geo(plot_df, lat="latitude", lon="longitude", 
+                        color="is_anomaly", 
+                        color_discrete_map={"Normal": "blue", "Anomaly": "red"},
+                        projection="natural earth",
+                        title="Flight Anomaly Detection")
+    write_plotly(fig, output_path)
+
+def anomaly_map_job(scored):
+    """
+    Flight map with the anomalies found by analysis highlighted.
+    `scored` is the frame returned by src/Db_work/analysis.py (anomaly: -1/1).
+
+    Returns a (path, draw, data) render job, or None when there is nothing to plot.
+    """
+    if scored is None or scored.empty:
+        return None
+
+    # Every anomaly is drawn, normal flights are thinned where they are dense
+    is_anomaly = (scored["anomaly"] == -1).to_numpy()
+    plot_df = scored[["latitude", "longitude"]].reset_index(drop=True)
+    plot_df["is_anomaly"] = np.where(is_anomaly, "Anomaly", "Normal")
+    plot_df = downsample(plot_df, "longitude", "latitude", keep=is_anomaly)
+    logger.info(f"Preparing anomaly plot ({len(plot_df)} of {len(scored)} points)...")
+    return IMAGES_DIR / "anomaly_detection.png", draw_anomaly_map, plot_df
+
+def render_anomaly_map(scored):
+    """Render the anomaly map of analysis results."""
+    jobs = [job for job in [anomaly_map_job(scored)] if job is not None]
+    render_all(jobs)
+
+def main(window=None, scored=None, raise_errors=False):
+    """
+    Plot the latest window (or `window`), plus the anomaly map when `scored` is given.
+    Failed plots are logged, and raised with `raise_errors`.
+    """
+    jobs = [anomaly_map_job(scored)]
+    df = load_data(window)
     if not df.empty:
-        generate_scatter_plot(df)
+        jobs.append(scatter_plot_job(df))
+    render_all([job for job in jobs if job is not None], raise_errors=raise_errors)
 
 if __name__ == "__main__":
     main()